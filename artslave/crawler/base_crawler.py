@@ -1,22 +1,102 @@
+import logging
+import sys
 import requests
 import time
 import random
-from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 from datetime import datetime, timedelta
 import re
-from config import CRAWL_DELAY, MAX_RETRIES, TIMEOUT, SUBMISSION_TYPES
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from urllib.parse import urlparse
+from config import (
+    CRAWL_DELAY, MAX_RETRIES, TIMEOUT, SUBMISSION_TYPES, PAGE_CACHE_ENABLED, STRUCTURED_DATA_ENABLED,
+    CHECKPOINT_INTERVAL_SECONDS, CHECKPOINT_MAX_AGE_HOURS, JOB_TIME_BUDGET_SECONDS, JOB_REQUEST_BUDGET,
+    TRACE_SAMPLE_RATE, ARCHIVE_ENABLED, SNAPSHOT_ENABLED
+)
 from database import DatabaseManager
+from page_cache import PageExtractionCache
+from page_archive import PageArchive
+from source_snapshot import SourceSnapshot
+from structured_data import extract_structured_items
+from submission_record import SubmissionRecord, intern_type, make_item_keys
+import metrics
+from logging_setup import log_context
+from tracing import Tracer, NOOP_SPAN, SPAN_KIND_CLIENT
+
+logger = logging.getLogger(__name__)
+
+class CrawlCancelled(Exception):
+    """爬取被取消或超出预算，reason 为 cancelled / time_budget / request_budget"""
+
+    MESSAGES = {
+        'cancelled': '爬取已取消',
+        'time_budget': '超出时间预算',
+        'request_budget': '超出请求数预算',
+    }
+
+    def __init__(self, reason='cancelled'):
+        super().__init__(self.MESSAGES.get(reason, reason))
+        self.reason = reason
+
 
 class BaseCrawler:
+    # 解析逻辑版本，修改提取规则后递增，使旧的页面缓存失效
+    PARSER_VERSION = '2'
+
     def __init__(self, name, base_url):
         self.name = name
         self.base_url = base_url
         self.session = requests.Session()
         self.ua = UserAgent()
         self.db = DatabaseManager()
+        self.writer = self.db.create_batch_writer()
         self.items_found = 0
         self.items_added = 0
+        self.pages_crawled = 0
+        self.bytes_fetched = 0
+        self.items_reported = 0  # 已计入 crawler_items_found_total 的条数
+        # 本次运行中抓取失败的页面、保存失败的条目和写入失败的行，任何一项不为 0 时快照不判断下架
+        self.pages_failed = 0
+        self.items_failed = 0
+        self.write_failures = 0
+        # 设置为字典后按阶段累计耗时 {阶段: (秒, 次数)}，由 profile 命令启用
+        self.phase_timings = None
+        # 本次运行的追踪（run() 开始时按任务创建，未采样时片段为空操作）
+        self.tracer = None
+        
+        # 由 attach_job 关联任务记录（CrawlJob），进度心跳写入该任务；
+        # resume_state 为断点续爬时上次中断的进度
+        self.job = None
+        self.job_id = None
+        self.resume_state = None
+        self.last_checkpoint = 0.0
+        
+        # 由守护进程设置：进度回调 progress_callback(event, data) 和取消标志（threading.Event）
+        self.progress_callback = None
+        self.cancel_event = None
+
+        # 数据源配置（data_sources.config），用于选择器和缓存失效判断
+        self.source_config = self.db.get_data_source_config(name)
+        self.page_cache = None
+        if PAGE_CACHE_ENABLED:
+            self.page_cache = PageExtractionCache(
+                self.db, name, self.PARSER_VERSION, self.source_config
+            )
+        
+        # 原始页面归档：响应内容按哈希去重后压缩保存，供离线重新提取
+        self.archive = None
+        if ARCHIVE_ENABLED and self.source_config.get('archive', True):
+            self.archive = PageArchive(self.db, name, crawler=self.class_path())
+        
+        # 数据源快照（run() 开始时载入），只写入与上次爬取相比新增或变化的条目
+        self.snapshot = None
+        
+        # 任务预算：运行时间（秒）和请求次数，0 表示不限；data_sources.config 可按数据源覆盖
+        self.time_budget = self.source_config.get('time_budget_seconds', JOB_TIME_BUDGET_SECONDS)
+        self.request_budget = self.source_config.get('request_budget', JOB_REQUEST_BUDGET)
+        self.deadline = None
+        self.requests_made = 0
         
         # 设置请求头
         self.session.headers.update({
@@ -27,24 +107,124 @@ class BaseCrawler:
             'Connection': 'keep-alive',
         })
     
-    def make_request(self, url, retries=0):
-        """发送HTTP请求"""
-        try:
-            # 随机延迟
-            time.sleep(CRAWL_DELAY + random.uniform(0, 1))
-            
-            response = self.session.get(url, timeout=TIMEOUT)
-            response.raise_for_status()
-            return response
+    @classmethod
+    def class_path(cls):
+        """爬虫类的导入路径（模块:类名），记录在归档页面中，离线重新提取时据此加载爬虫类"""
+        module = cls.__module__
+        if module == '__main__':
+            # 直接运行爬虫脚本时按文件名记录模块
+            module = Path(sys.modules[module].__file__).stem
+        return f"{module}:{cls.__qualname__}"
+    
+    @contextmanager
+    def phase(self, name):
+        """统计一个处理阶段（fetch / parse / clean / classify / write）的耗时，并记录为追踪片段"""
+        with self.span(name):
+            if self.phase_timings is None:
+                yield
+                return
             
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                total, count = self.phase_timings.get(name, (0.0, 0))
+                self.phase_timings[name] = (total + time.perf_counter() - start, count + 1)
+    
+    def span(self, name, attributes=None, kind=None):
+        """记录追踪片段（没有追踪时为空操作），as 得到的片段可以设置属性"""
+        if self.tracer is None:
+            return nullcontext(NOOP_SPAN)
+        if kind is None:
+            return self.tracer.span(name, attributes)
+        return self.tracer.span(name, attributes, kind)
+    
+    def archive_response(self, url, response):
+        """归档响应内容（归档失败只记录日志，不影响爬取）"""
+        try:
+            with self.phase('archive'):
+                self.archive.store(
+                    url, response.content,
+                    content_type=response.headers.get('Content-Type'),
+                    encoding=response.encoding,
+                    job_id=self.job_id
+                )
         except Exception as e:
-            if retries < MAX_RETRIES:
-                print(f"请求失败，重试 {retries + 1}/{MAX_RETRIES}: {e}")
-                time.sleep(2 ** retries)  # 指数退避
-                return self.make_request(url, retries + 1)
-            else:
-                print(f"请求最终失败: {e}")
-                return None
+            logger.warning(f"页面归档失败: {url}: {e}")
+    
+    def time_remaining(self):
+        """剩余的时间预算（秒），不限时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+    
+    def pause(self, seconds):
+        """等待指定秒数，不超过剩余时间预算，收到取消请求时立即返回"""
+        remaining = self.time_remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if self.cancel_event is not None:
+            self.cancel_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def make_request(self, url, retries=0):
+        """发送HTTP请求（每次尝试都计入请求数预算，超时时间不超过剩余时间预算）"""
+        host = urlparse(url).netloc or 'unknown'
+        # 同一请求的各次重试共用一个请求ID，便于在日志中串起来
+        request_id = f"{self.job_id or self.name}-{self.requests_made + 1}"
+        with log_context(request_id=request_id), \
+                self.span('http.request', {'url.full': url, 'server.address': host, 'request.id': request_id},
+                          SPAN_KIND_CLIENT) as span:
+            while True:
+                self.check_cancelled(before_request=True)
+                self.requests_made += 1
+                try:
+                    # 随机延迟
+                    with self.phase('delay'):
+                        self.pause(CRAWL_DELAY + random.uniform(0, 1))
+                    
+                    timeout = TIMEOUT
+                    remaining = self.time_remaining()
+                    if remaining is not None:
+                        timeout = max(min(TIMEOUT, remaining), 1)
+                    
+                    start = time.perf_counter()
+                    try:
+                        with self.phase('fetch'):
+                            response = self.session.get(url, timeout=timeout)
+                            response.raise_for_status()
+                    except Exception:
+                        metrics.REQUESTS.inc(host=host, outcome='error')
+                        raise
+                    finally:
+                        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, host=host)
+                    
+                    metrics.REQUESTS.inc(host=host, outcome='ok')
+                    metrics.RESPONSE_BYTES.inc(len(response.content), host=host)
+                    self.bytes_fetched += len(response.content)
+                    if self.archive is not None:
+                        self.archive_response(url, response)
+                    span.set_attribute('http.response.status_code', response.status_code)
+                    span.set_attribute('http.response.body.size', len(response.content))
+                    span.set_attribute('http.request.resend_count', retries)
+                    # 连接建立到收到响应头的耗时，fetch 片段减去它约为下载响应体的耗时
+                    span.set_attribute('http.time_to_headers_ms', round(response.elapsed.total_seconds() * 1000, 1))
+                    return response
+                    
+                except CrawlCancelled:
+                    raise
+                except Exception as e:
+                    if retries >= MAX_RETRIES:
+                        logger.warning(f"请求最终失败: {url}: {e}")
+                        span.set_attribute('http.request.resend_count', retries)
+                        span.set_error(f"{type(e).__name__}: {e}")
+                        return None
+                    metrics.REQUEST_RETRIES.inc(host=host)
+                    logger.info(f"请求失败，重试 {retries + 1}/{MAX_RETRIES}: {e}")
+                    with self.span('backoff'):
+                        self.pause(2 ** retries)  # 指数退避
+                    retries += 1
     
     def parse_date(self, date_str):
         """解析日期字符串"""
@@ -128,59 +308,294 @@ class BaseCrawler:
         
         return 'OTHER'
     
-    def save_submission_info(self, data):
-        """保存投稿信息到数据库"""
+    def build_record(self, data):
+        """清洗原始数据并构建投稿信息记录"""
+        with self.phase('clean'):
+            with self.span('parse_date'):
+                deadline = self.parse_date(data.get('deadline'))
+            contact = data.get('contact', '')
+            record = SubmissionRecord(
+                title=self.clean_text(data.get('title', '')),
+                description=self.clean_text(data.get('description', '')),
+                type=data.get('type', 'OTHER'),
+                organizer=self.clean_text(data.get('organizer', '')),
+                deadline=deadline,
+                location=self.clean_text(data.get('location', '')),
+                country=self.clean_text(data.get('country', '')),
+                website=data.get('website', ''),
+                email=self.extract_email(contact),
+                phone=self.extract_phone(contact),
+                fee=data.get('fee'),
+                prize=self.clean_text(data.get('prize', '')),
+                requirements=data.get('requirements'),
+                tags=data.get('tags')
+            )
+        
+        # 如果没有指定类型，自动判断
+        if record.type == 'OTHER':
+            with self.phase('classify'):
+                record.type = intern_type(self.categorize_submission_type(record.title, record.description))
+        
+        return record
+    
+    def check_cancelled(self, before_request=False):
+        """
+        收到取消请求（守护进程的取消标志或 crawl_jobs.cancel_requested）或超出预算时抛出 CrawlCancelled，
+        在每次请求、抓取页面和保存每条数据前检查；请求数预算只在发出请求前（before_request）检查，
+        已抓取页面中的条目照常保存
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise CrawlCancelled('cancelled')
+        if self.job is not None and self.job.poll_cancel():
+            raise CrawlCancelled('cancelled')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise CrawlCancelled('time_budget')
+        if before_request and self.request_budget and self.requests_made >= self.request_budget:
+            raise CrawlCancelled('request_budget')
+    
+    def progress_counters(self):
+        return {
+            'items_found': self.items_found,
+            'items_added': self.items_added,
+            'pages_crawled': self.pages_crawled,
+            'bytes_fetched': self.bytes_fetched,
+        }
+    
+    def record_items_found(self):
+        """将新发现的条数计入指标"""
+        if self.items_found > self.items_reported:
+            metrics.ITEMS_FOUND.inc(self.items_found - self.items_reported, source=self.name)
+            self.items_reported = self.items_found
+    
+    def report_progress(self, event, **data):
+        """上报进度事件：发现条数指标、任务心跳（合并写入数据库）和守护进程的进度回调"""
+        self.record_items_found()
+        if self.job is not None:
+            self.job.heartbeat(**self.progress_counters())
+        if self.progress_callback is not None:
+            data.setdefault('items_found', self.items_found)
+            data.setdefault('items_added', self.items_added)
+            self.progress_callback(event, data)
+    
+    def save_record(self, record):
+        """将投稿信息记录加入批量写入缓冲，缓冲满时写入数据库"""
+        self.check_cancelled()
+        if self.snapshot is not None and record.item_key and self.snapshot.observe(record) is None:
+            # 与上次爬取相同，不需要写入
+            return True
+        self.writer.add(record)
+        if self.writer.is_full():
+            self.flush_records()
+        return True
+    
+    def flush_records(self):
+        """写入缓冲中的投稿信息，全部写入成功时返回 True"""
+        pending = self.writer.pending
+        if not pending:
+            return True
+        
+        start = time.perf_counter()
+        with self.phase('write'):
+            written = self.writer.flush()
+        metrics.DB_FLUSH_LATENCY.observe(time.perf_counter() - start, source=self.name)
+        metrics.ITEMS_ADDED.inc(written, source=self.name)
+        self.items_added += written
+        self.write_failures += pending - written
+        failed_keys = self.writer.take_failed_keys()
+        if self.snapshot is not None and failed_keys:
+            # 写入失败的条目不记入快照，其余条目照常比较
+            self.snapshot.discard(failed_keys)
+        logger.info(f"批量保存: {written}/{pending} 条")
+        self.report_progress('flush', written=written)
+        return written == pending
+    
+    def save_submission_info(self, data, item_key=None):
+        """保存投稿信息到数据库，item_key 相同的已有记录会被更新"""
         try:
-            # 数据验证和清理
-            cleaned_data = {
-                'title': self.clean_text(data.get('title', '')),
-                'description': self.clean_text(data.get('description', '')),
-                'type': data.get('type', 'OTHER'),
-                'organizer': self.clean_text(data.get('organizer', '')),
-                'deadline': self.parse_date(data.get('deadline')),
-                'location': self.clean_text(data.get('location', '')),
-                'website': data.get('website', ''),
-                'email': self.extract_email(data.get('contact', '')),
-                'phone': self.extract_phone(data.get('contact', '')),
-                'fee': data.get('fee'),
-                'prize': self.clean_text(data.get('prize', '')),
-                'requirements': data.get('requirements', {}),
-                'tags': data.get('tags', [])
-            }
+            with self.span('item'):
+                record = self.build_record(data)
+                record.item_key = item_key
+                return self.save_record(record)
+        except CrawlCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"保存失败: {e}")
+            self.items_failed += 1
+            return False
+    
+    def attach_job(self, job):
+        """关联爬虫任务记录（CrawlJob），并载入同一数据源在有效期内的检查点"""
+        self.job = job
+        self.job_id = job.id
+        self.db.ensure_checkpoint_columns()
+        self.resume_state = self.db.take_crawl_checkpoint(job.id, CHECKPOINT_MAX_AGE_HOURS)
+        if self.resume_state:
+            logger.info(f"从检查点继续: {self.resume_state}")
+        return self.resume_state
+    
+    def checkpoint(self, state, force=False):
+        """
+        记录爬取进度（当前页、待抓取位置等可 JSON 序列化的状态），
+        写入前先保存缓冲中的条目，续爬时不会丢失；按 CHECKPOINT_INTERVAL_SECONDS 节流
+        """
+        if not self.job_id:
+            return False
+        
+        now = time.monotonic()
+        if not force and now - self.last_checkpoint < CHECKPOINT_INTERVAL_SECONDS:
+            return False
+        
+        self.flush_records()
+        self.last_checkpoint = now
+        return bool(self.db.save_crawl_checkpoint(self.job_id, state))
+    
+    def crawl_paginated(self, page_url, max_pages, start_page=1):
+        """
+        逐页抓取分页列表（page_url 中用 {page} 表示页码），遇到空页停止；
+        每页完成后记录检查点，中断后的下一次运行从未完成的页继续
+        """
+        page = start_page
+        state = self.resume_state or {}
+        if state.get('page_url') == page_url:
+            page = state.get('next_page', start_page)
+        
+        while page <= max_pages:
+            items = self.crawl_page(page_url.format(page=page))
+            page += 1
+            self.checkpoint({'page_url': page_url, 'next_page': page})
+            if not items:
+                break
+    
+    def extract_items(self, html, url):
+        """从页面内容中提取投稿信息列表，使用 crawl_page 的子类需要实现"""
+        raise NotImplementedError("子类必须实现 extract_items 方法")
+    
+    def extract_page(self, html, url):
+        """提取页面中的投稿信息：优先使用 schema.org 结构化数据，失败时回退到选择器提取"""
+        with self.phase('parse'):
+            if STRUCTURED_DATA_ENABLED and self.source_config.get('structured_data', True):
+                items = extract_structured_items(html, url)
+                if items:
+                    return items
             
-            # 如果没有指定类型，自动判断
-            if cleaned_data['type'] == 'OTHER':
-                cleaned_data['type'] = self.categorize_submission_type(
-                    cleaned_data['title'], 
-                    cleaned_data['description']
-                )
+            return self.extract_items(html, url)
+    
+    def crawl_page(self, url):
+        """抓取页面并保存提取到的投稿信息，页面内容与上次相同时跳过解析和保存"""
+        with self.span('page', {'url.full': url}) as span:
+            self.check_cancelled()
+            response = self.make_request(url)
+            if response is None:
+                span.set_error('请求失败')
+                self.pages_failed += 1
+                return []
+            
+            self.pages_crawled += 1
+            content_hash = None
+            if self.page_cache:
+                content_hash, cached_items = self.page_cache.lookup(response.content)
+                metrics.PAGE_CACHE_LOOKUPS.inc(source=self.name, result='miss' if cached_items is None else 'hit')
+                span.set_attribute('page.cached', cached_items is not None)
+                if cached_items is not None:
+                    self.items_found += len(cached_items)
+                    if self.snapshot is not None:
+                        self.snapshot.keep(make_item_keys(self.name, cached_items))
+                    logger.debug(f"页面未变化，跳过解析: {url}")
+                    self.report_progress('page', url=url, items=len(cached_items), cached=True)
+                    return cached_items
+            
+            items = self.extract_page(response.text, url)
+            span.set_attribute('page.items', len(items))
+            saved_all = True
+            item_keys = make_item_keys(self.name, items)
+            for item, item_key in zip(items, item_keys):
+                self.items_found += 1
+                if not self.save_submission_info(item, item_key):
+                    saved_all = False
+            if not self.flush_records():
+                saved_all = False
             
-            result = self.db.insert_submission_info(cleaned_data)
-            if result:
-                self.items_added += 1
-                print(f"保存成功: {cleaned_data['title']}")
+            # 只缓存完整保存成功的页面，失败的条目下次还会重试
+            if self.page_cache and saved_all:
+                self.page_cache.store(content_hash, items)
             
+            self.report_progress('page', url=url, items=len(items))
+            return items
+    
+    def commit_snapshot(self, completed):
+        """
+        保存本次运行的快照；只有从头开始、完整结束且没有抓取或清洗失败的运行才把未再出现的条目标记为失效。
+        写入失败的条目已在 flush_records 中从快照移除，不影响其余条目的保存和下架判断
+        """
+        complete = (completed and not self.resume_state
+                    and not self.pages_failed and not self.items_failed)
+        try:
+            self.snapshot.commit(complete)
         except Exception as e:
-            print(f"保存失败: {e}")
+            logger.error(f"快照保存失败: {e}")
+            return
+        logger.info(self.snapshot.summary() + ('' if complete else '（运行不完整，未判断下架）'))
     
     def crawl(self):
         """主要爬取方法，需要在子类中实现"""
         raise NotImplementedError("子类必须实现 crawl 方法")
     
     def run(self):
-        """运行爬虫"""
-        print(f"开始爬取: {self.name}")
+        """运行爬虫，整个运行记录为追踪的根片段，结束时写入追踪文件"""
+        sample_rate = self.source_config.get('trace_sample_rate', TRACE_SAMPLE_RATE)
+        self.tracer = Tracer.for_job(self.job_id, sample_rate, resource={'crawler.name': self.name})
+        try:
+            with self.span('crawl', {'crawl.job_id': self.job_id or '', 'crawl.source': self.name}) as span:
+                self._run(span)
+        finally:
+            try:
+                self.tracer.export()
+            except OSError as e:
+                logger.warning(f"追踪写入失败: {e}")
+    
+    def _run(self, span):
+        logger.info(f"开始爬取: {self.name}")
         start_time = datetime.now()
+        if self.time_budget:
+            self.deadline = time.monotonic() + self.time_budget
+        if SNAPSHOT_ENABLED and self.source_config.get('snapshot', True):
+            self.snapshot = SourceSnapshot(self.db, self.name)
         
+        completed = False
         try:
             self.crawl()
-            print(f"爬取完成: 发现 {self.items_found} 条，新增 {self.items_added} 条")
+            self.flush_records()
+            completed = True
+            if self.job_id:
+                # 完整结束，下一次运行从头开始
+                self.db.clear_crawl_checkpoint(self.job_id)
+            logger.info(f"爬取完成: 发现 {self.items_found} 条，新增 {self.items_added} 条")
+            if self.page_cache and self.page_cache.hits:
+                logger.info(f"页面缓存命中 {self.page_cache.hits} 次，命中率 {self.page_cache.hit_rate():.0%}")
+            
+        except CrawlCancelled as e:
+            # 缓冲中的条目在 finally 中写入，检查点保留，下一次运行从中断处继续
+            logger.warning(f"爬取中止: {e}")
+            raise
             
         except Exception as e:
-            print(f"爬取失败: {e}")
+            logger.error(f"爬取失败: {e}")
+            span.set_error(f"{type(e).__name__}: {e}")
         
         finally:
+            if self.writer.pending:
+                self.flush_records()
+            self.record_items_found()
+            if self.snapshot is not None:
+                self.commit_snapshot(completed)
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
-            print(f"耗时: {duration:.2f} 秒")
+            logger.info(f"耗时: {duration:.2f} 秒")
+            if self.archive is not None:
+                if self.archive.stored or self.archive.deduplicated:
+                    logger.info(f"页面归档: 新增 {self.archive.stored} 个（{self.archive.raw_bytes} → "
+                                f"{self.archive.stored_bytes} 字节），重复 {self.archive.deduplicated} 个")
+                self.archive.close()
+            for name, value in self.progress_counters().items():
+                span.set_attribute(f"crawl.{name}", value)
             self.db.close()
@@ -0,0 +1,208 @@
+"""
+批量匹配
+为新投稿信息和用户资料（个人资料 + 作品集）构建哈希 TF-IDF 稀疏向量，按块做矩阵乘法得到余弦相似度，
+每个用户保留分数最高的 MATCH_TOP_K 个候选写入 Web 端数据库的 ai_matches（reasons.source 为 tfidf）。
+逐对调用 LLM 的匹配分析之后只需处理这份预筛选的短名单。
+
+- 文本切分：拉丁字母和数字按单词，中文按相邻两字（bigram）
+- 特征按 crc32 哈希到 MATCH_HASH_FEATURES 维，不需要维护词表；词频取 1 + log(tf)，IDF 由用户资料和本次的投稿信息统计
+- 只处理上次匹配之后新增的投稿信息（submission_infos 的行号，记录在爬虫数据库的 export_watermarks 中），
+  full=True 时重新计算全部有效投稿信息
+"""
+
+import json
+import logging
+import re
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from config import (
+    MATCH_DB_PATH, MATCH_TOP_K, MATCH_MIN_SCORE, MATCH_HASH_FEATURES, MATCH_CHUNK_SIZE, MATCH_CONSUMER
+)
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}|[\u3400-\u9fff]+')
+REASON_TERMS = 5  # 写入 reasons 的共同词数
+
+
+def _require_numpy():
+    """numpy 和 scipy 为可选依赖，只有批量匹配需要"""
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise RuntimeError("批量匹配需要安装 numpy 和 scipy（pip install numpy scipy）") from None
+    return numpy, sparse
+
+
+def tokenize(texts):
+    """切分文本字段列表：单词转小写，中文连续片段取相邻两字"""
+    tokens = []
+    for text in texts:
+        for token in TOKEN_RE.findall(str(text).lower()):
+            if token[0] < '\u3400' or len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+@lru_cache(maxsize=65536)
+def feature_index(token, n_features=MATCH_HASH_FEATURES):
+    return zlib.crc32(token.encode('utf-8')) % n_features
+
+
+class HashedTfidf:
+    """哈希 TF-IDF：count_matrix 得到词频矩阵，fit 统计文档频率，transform 得到行归一化的 TF-IDF 矩阵"""
+
+    def __init__(self, n_features=MATCH_HASH_FEATURES):
+        self.np, self.sparse = _require_numpy()
+        self.n_features = n_features
+        self.df = self.np.zeros(n_features, dtype=self.np.int64)
+        self.documents = 0
+        self.idf = None
+
+    def count_matrix(self, docs):
+        """文档（词列表）-> CSR 词频矩阵，每行的特征不重复"""
+        np = self.np
+        indptr = [0]
+        indices = []
+        data = []
+        for tokens in docs:
+            counts = Counter(feature_index(token, self.n_features) for token in tokens)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        return self.sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(docs), self.n_features)
+        )
+
+    def fit(self, counts):
+        """累计文档频率（可以分块多次调用）"""
+        self.df += self.np.bincount(counts.indices, minlength=self.n_features)
+        self.documents += counts.shape[0]
+        self.idf = None
+
+    def transform(self, counts):
+        np = self.np
+        if self.idf is None:
+            self.idf = (np.log((1 + self.documents) / (1 + self.df)) + 1).astype(np.float32)
+        matrix = counts.copy()
+        matrix.data = (1 + np.log(matrix.data)) * self.idf[matrix.indices]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return self.sparse.diags(1 / norms) @ matrix
+
+    def weight(self, token):
+        return float(self.idf[feature_index(token, self.n_features)])
+
+
+def merge_top_k(np, current, users, submissions, scores, top_k):
+    """合并候选 (用户, 投稿信息, 分数) 数组，每个用户保留分数最高的 top_k 个"""
+    users = np.concatenate([current[0], users])
+    submissions = np.concatenate([current[1], submissions])
+    scores = np.concatenate([current[2], scores])
+    if not len(users):
+        return users, submissions, scores
+
+    order = np.lexsort((-scores, users))
+    users, submissions, scores = users[order], submissions[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    rank = np.arange(len(users)) - np.repeat(starts, np.diff(np.r_[starts, len(users)]))
+    keep = rank < top_k
+    return users[keep], submissions[keep], scores[keep]
+
+
+def match_submissions(match_db, state_db, full=False, top_k=MATCH_TOP_K, min_score=MATCH_MIN_SCORE,
+                      chunk_size=MATCH_CHUNK_SIZE, consumer=MATCH_CONSUMER):
+    """
+    为新投稿信息计算候选匹配并写入 ai_matches，返回统计 {users, submissions, matches, seconds}；
+    match_db 为 Web 端数据库，state_db 为记录匹配进度的爬虫数据库
+    """
+    start = time.perf_counter()
+    vectorizer = HashedTfidf()
+    np = vectorizer.np
+    stats = {'users': 0, 'submissions': 0, 'matches': 0, 'seconds': 0.0}
+
+    state_db.ensure_export_tables()
+    after = 0
+    if not full:
+        watermark = state_db.get_export_watermark(consumer)
+        if watermark and watermark['last_id']:
+            after = int(watermark['last_id'])
+
+    profiles = match_db.get_match_profiles()
+    user_ids = [user_id for user_id, _ in profiles]
+    user_tokens = [tokenize(texts) for _, texts in profiles]
+    stats['users'] = len(user_ids)
+    if not user_ids:
+        logger.info("没有用户资料，跳过匹配")
+        return stats
+
+    # 第一遍：统计文档频率，并确定本次处理的行号范围（运行中新增的行留到下一次）
+    user_counts = vectorizer.count_matrix(user_tokens)
+    vectorizer.fit(user_counts)
+    last_rowid = after
+    for chunk in match_db.iter_match_submissions(after, chunk_size):
+        vectorizer.fit(vectorizer.count_matrix([tokenize(texts) for _, _, texts in chunk]))
+        last_rowid = chunk[-1][0]
+    if last_rowid == after:
+        logger.info("没有新的投稿信息需要匹配")
+        return stats
+
+    # 第二遍：按块与全部用户相乘（投稿信息 x 用户），合并每个用户的候选
+    users_matrix = vectorizer.transform(user_counts).T.tocsr()
+    user_sets = [set(tokens) for tokens in user_tokens]
+    empty = np.array([], dtype=np.int64)
+    best = (empty, empty, np.array([], dtype=np.float32))
+    submission_ids = []
+    terms = {}
+    for chunk in match_db.iter_match_submissions(after, chunk_size):
+        chunk = [row for row in chunk if row[0] <= last_rowid]
+        if not chunk:
+            break
+        offset = len(submission_ids)
+        submission_ids.extend(submission_id for _, submission_id, _ in chunk)
+        chunk_tokens = [tokenize(texts) for _, _, texts in chunk]
+
+        scores = (vectorizer.transform(vectorizer.count_matrix(chunk_tokens)) @ users_matrix).tocoo()
+        mask = scores.data >= min_score
+        best = merge_top_k(np, best, scores.col[mask].astype(np.int64), scores.row[mask].astype(np.int64) + offset,
+                           scores.data[mask].astype(np.float32), top_k)
+
+        # 为本块中进入候选的匹配记录共同词（供 LLM 分析参考）
+        for user, submission in zip(*best[:2]):
+            if submission >= offset and (user, submission) not in terms:
+                shared = user_sets[user].intersection(chunk_tokens[submission - offset])
+                terms[(user, submission)] = sorted(shared, key=vectorizer.weight, reverse=True)[:REASON_TERMS]
+        stats['submissions'] += len(chunk)
+        logger.debug(f"已匹配 {stats['submissions']} 条投稿信息")
+
+    matches = [
+        (user_ids[user], submission_ids[submission], round(float(score), 4),
+         json.dumps({'source': 'tfidf', 'terms': terms.get((user, submission), [])}, ensure_ascii=False))
+        for user, submission, score in zip(*best)
+    ]
+    stats['matches'] = match_db.upsert_ai_matches(matches)
+    state_db.save_export_watermark(consumer, None, str(last_rowid), stats['submissions'])
+    stats['seconds'] = time.perf_counter() - start
+    logger.info(f"匹配完成: {stats['submissions']} 条投稿信息 x {stats['users']} 个用户，"
+                f"写入 {stats['matches']} 个候选，耗时 {stats['seconds']:.2f} 秒")
+    return stats
+
+
+def run_matcher(state_db, full=False, match_db_path=MATCH_DB_PATH, **options):
+    """打开 Web 端数据库运行批量匹配"""
+    if not Path(match_db_path).exists():
+        raise RuntimeError(f"找不到 Web 端数据库: {match_db_path}（可通过 MATCH_DB_PATH 指定）")
+    match_db = DatabaseManager(match_db_path)
+    try:
+        return match_submissions(match_db, state_db, full=full, **options)
+    finally:
+        match_db.close()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+ArtSlave 爬虫性能基准测试
+微基准：clean_text、parse_date、categorize_submission_type、insert_submission_info 等热点函数
+宏基准：关闭所有延迟，基于本地 fixtures 语料运行完整爬取流程
+启动基准：crawler_manager.py list / stats 的命令行启动耗时，另有绝对目标（TARGETS）
+结果保存为 JSON，可与基线比较，超过阈值即判定为性能回退（退出码 1）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+CRAWLER_DIR = BENCH_DIR.parent
+FIXTURES_DIR = BENCH_DIR / 'fixtures'
+RESULTS_DIR = BENCH_DIR / 'results'
+BASELINE_PATH = BENCH_DIR / 'baseline.json'
+
+# 基准测试写入临时数据库，必须在导入爬虫模块之前设置
+os.environ.setdefault(
+    'SQLITE_DB_PATH',
+    str(Path(tempfile.mkdtemp(prefix='artslave-bench-')) / 'bench.db')
+)
+sys.path.insert(0, str(CRAWLER_DIR))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from base_crawler import BaseCrawler  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from demo_crawler import DemoCrawler  # noqa: E402
+from submission_record import SubmissionRecord  # noqa: E402
+
+# 与 data/artslave.db 中的表结构一致，去掉 CHECK / NOT NULL 约束以免干扰计时
+BENCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY, title TEXT, type TEXT, organizer TEXT, location TEXT,
+    country TEXT, deadline DATE, event_date DATE, fee REAL, prize TEXT,
+    years_running INTEGER DEFAULT 1, description TEXT, website TEXT, email TEXT,
+    phone TEXT, tags TEXT, requirements TEXT, is_gold BOOLEAN DEFAULT FALSE,
+    is_featured BOOLEAN DEFAULT FALSE, is_active BOOLEAN DEFAULT TRUE, rating REAL,
+    applicants INTEGER, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS data_sources (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL UNIQUE, url TEXT NOT NULL, type TEXT NOT NULL,
+    config TEXT, is_active BOOLEAN DEFAULT TRUE, last_crawled DATETIME,
+    items_found INTEGER DEFAULT 0, status TEXT DEFAULT 'idle',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    id TEXT PRIMARY KEY, data_source_name TEXT NOT NULL, status TEXT NOT NULL,
+    started_at DATETIME NOT NULL, completed_at DATETIME, items_found INTEGER DEFAULT 0,
+    items_added INTEGER DEFAULT 0, error_message TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+SAMPLE_TEXT = "  2025年国际当代艺术展 —— International   Contemporary Art Exhibition!!  <Open Call> ★ 欢迎投稿  "
+SAMPLE_DATES = ['2025-12-31', 'March 5, 2025', '2025年3月5日', 'next spring']
+SAMPLE_TITLES = [
+    ('青年艺术家驻地项目', '为期3个月的艺术家驻地项目'),
+    ('Emerging Painters Prize', 'An international competition for painters'),
+    ('Untitled open call', 'Send us your best work'),
+]
+
+BENCHMARKS = {}
+
+# 绝对目标（秒/次）：与基线无关，超过即判定失败
+TARGETS = {
+    'cli_startup_list': 0.25,
+    'cli_startup_stats': 0.25,
+}
+
+
+def benchmark(name, kind='micro'):
+    """注册基准测试；被装饰函数返回 (无参可调用对象, 每次调用处理的操作数)"""
+    def decorator(func):
+        BENCHMARKS[name] = (kind, func)
+        return func
+    return decorator
+
+
+class FixtureResponse:
+    """模拟 requests.Response，内容来自本地 fixture 文件"""
+
+    def __init__(self, path):
+        self.url = path.name
+        self.status_code = 200
+        self.content = path.read_bytes()
+        self.text = self.content.decode('utf-8')
+
+
+class FixtureCrawler(BaseCrawler):
+    """基于本地 fixtures 的爬虫，不访问网络、没有请求延迟"""
+
+    def __init__(self, pages, use_cache=False):
+        super().__init__("基准测试数据源", "file://fixtures")
+        # 各基准共用同一数据源名，关闭快照比较，每次重复都完整经过写入路径，基准之间也不会互相触发下架
+        self.source_config = dict(self.source_config, snapshot=False)
+        self.pages = pages
+        if not use_cache:
+            self.page_cache = None
+
+    def make_request(self, url, retries=0):
+        with self.phase('fetch'):
+            return FixtureResponse(FIXTURES_DIR / url)
+
+    def crawl(self):
+        for page in self.pages:
+            self.crawl_page(page)
+
+    def extract_items(self, html, url):
+        soup = BeautifulSoup(html, 'html.parser')
+        items = []
+        for node in soup.select('.festival'):
+            description = node.select_one('.festival-description').get_text()
+            items.append({
+                'title': node.select_one('.festival-title').get_text(),
+                'deadline': node.select_one('.deadline-date').get_text(),
+                'description': description,
+                'website': node.select_one('.festival-link')['href'],
+                'contact': description,
+            })
+        return items
+
+
+def prepare_database():
+    """在临时数据库中创建基准测试所需的表"""
+    db = DatabaseManager()
+    db.connection.executescript(BENCH_SCHEMA)
+    db.close()
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽爬虫的控制台输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def run_crawl(crawler):
+    with quiet():
+        crawler.run()
+    return crawler.items_found
+
+
+# ---------------------------------------------------------------- 微基准
+
+@benchmark('clean_text')
+def bench_clean_text(crawler):
+    return (lambda: crawler.clean_text(SAMPLE_TEXT)), 1
+
+
+@benchmark('parse_date')
+def bench_parse_date(crawler):
+    def op():
+        for value in SAMPLE_DATES:
+            crawler.parse_date(value)
+    return op, len(SAMPLE_DATES)
+
+
+@benchmark('categorize_submission_type')
+def bench_categorize(crawler):
+    def op():
+        for title, description in SAMPLE_TITLES:
+            crawler.categorize_submission_type(title, description)
+    return op, len(SAMPLE_TITLES)
+
+
+@benchmark('build_record')
+def bench_build_record(crawler):
+    item = {
+        'title': SAMPLE_TEXT,
+        'description': SAMPLE_TEXT,
+        'deadline': '2025-12-31',
+        'contact': 'info@artfoundation.org, +86-10-12345678',
+        'tags': ['当代艺术', '国际展览'],
+    }
+    return (lambda: crawler.build_record(item)), 1
+
+
+@benchmark('insert_submission_info')
+def bench_insert(crawler):
+    data = {'title': '基准测试条目', 'type': 'EXHIBITION', 'organizer': 'bench', 'tags': ['a', 'b']}
+
+    def op():
+        with quiet():
+            crawler.db.insert_submission_info(data)
+    return op, 1
+
+
+@benchmark('batch_write_100')
+def bench_batch_write(crawler):
+    records = [SubmissionRecord(title=f'批量条目 {i}', type='GRANT', tags=('a', 'b')) for i in range(100)]
+    writer = crawler.db.create_batch_writer(batch_size=len(records))
+
+    def op():
+        for record in records:
+            writer.add(record)
+        writer.flush()
+    return op, len(records)
+
+
+# ---------------------------------------------------------------- 宏基准
+
+@benchmark('crawl_listing_selectors', kind='macro')
+def bench_crawl_listing(_):
+    def op():
+        return run_crawl(FixtureCrawler(['listing.html'] * 5))
+    return op, None
+
+
+@benchmark('crawl_jsonld_fast_path', kind='macro')
+def bench_crawl_jsonld(_):
+    def op():
+        return run_crawl(FixtureCrawler(['jsonld_events.html'] * 5))
+    return op, None
+
+
+@benchmark('crawl_microdata_fast_path', kind='macro')
+def bench_crawl_microdata(_):
+    def op():
+        return run_crawl(FixtureCrawler(['microdata_events.html'] * 5))
+    return op, None
+
+
+@benchmark('crawl_page_cache_hit', kind='macro')
+def bench_crawl_cached(_):
+    pages = ['listing.html', 'jsonld_events.html', 'microdata_events.html']
+    run_crawl(FixtureCrawler(pages, use_cache=True))  # 预热缓存
+
+    def op():
+        return run_crawl(FixtureCrawler(pages * 3, use_cache=True))
+    return op, None
+
+
+@benchmark('demo_crawl_no_delay', kind='macro')
+def bench_demo(_):
+    def op():
+        random.seed(42)
+        with quiet():
+            crawler = DemoCrawler()
+        crawler.ITEM_DELAY = 0
+        return run_crawl(crawler)
+    return op, None
+
+
+def cli_startup(action):
+    """以子进程运行 crawler_manager.py，测量命令行启动到退出的耗时"""
+    command = [sys.executable, str(CRAWLER_DIR / 'crawler_manager.py'), action]
+
+    def op():
+        subprocess.run(command, check=True, capture_output=True, cwd=tempfile.gettempdir())
+    return op, None
+
+
+@benchmark('cli_startup_list', kind='startup')
+def bench_cli_list(_):
+    return cli_startup('list')
+
+
+@benchmark('cli_startup_stats', kind='startup')
+def bench_cli_stats(_):
+    return cli_startup('stats')
+
+
+# ---------------------------------------------------------------- 执行与比较
+
+def measure(kind, op, ops, repeat):
+    """返回每个操作的耗时样本（秒）"""
+    if kind == 'micro':
+        timer = timeit.Timer(op)
+        number, _ = timer.autorange()
+        return [elapsed / (number * ops) for elapsed in timer.repeat(repeat=repeat, number=number)]
+
+    samples = []
+    op()  # 预热
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = op()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed / max(items or 1, 1))
+    return samples
+
+
+def run_benchmarks(selected=None, repeat=5):
+    """执行基准测试，返回结果字典"""
+    prepare_database()
+    with quiet():
+        crawler = FixtureCrawler([])
+
+    results = {}
+    for name, (kind, setup) in BENCHMARKS.items():
+        if selected and name not in selected:
+            continue
+        op, ops = setup(crawler)
+        samples = measure(kind, op, ops or 1, max(repeat // 2, 2) if kind == 'macro' else repeat)
+        median = statistics.median(samples)
+        results[name] = {
+            'kind': kind,
+            'median': median,
+            'min': min(samples),
+            'ops_per_sec': 1 / median if median else None,
+            'samples': len(samples),
+        }
+        unit = '条' if kind == 'macro' else '次'
+        print(f"  {name:<30} {median * 1e6:>12.2f} µs/{unit}  ({results[name]['ops_per_sec']:.0f}/s)")
+
+    crawler.db.close()
+    return results
+
+
+def compare(results, baseline, default_threshold, thresholds):
+    """与基线比较，返回回退列表"""
+    regressions = []
+    print(f"\n{'基准':<30}{'基线(µs)':>12}{'当前(µs)':>12}{'变化':>10}  阈值")
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        threshold = thresholds.get(name, default_threshold)
+        change = current['median'] / base['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  ✗ 回退'
+            regressions.append(name)
+        print(f"{name:<30}{base['median'] * 1e6:>12.2f}{current['median'] * 1e6:>12.2f}{change:>+10.1%}  {threshold:.0%}{flag}")
+    return regressions
+
+
+def check_targets(results):
+    """检查绝对目标，返回超出目标的基准列表"""
+    failures = []
+    for name, target in TARGETS.items():
+        if name not in results:
+            continue
+        median = results[name]['median']
+        ok = median <= target
+        print(f"  {name:<30} {median * 1000:>8.1f} ms  目标 ≤ {target * 1000:.0f} ms  {'✓' if ok else '✗ 超出目标'}")
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ArtSlave 爬虫性能基准测试')
+    parser.add_argument('--only', nargs='*', help='只运行指定的基准')
+    parser.add_argument('--repeat', type=int, default=5, help='每个基准的重复次数')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='基线结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.2, help='默认回退阈值（相对基线的变慢比例）')
+    parser.add_argument('--thresholds', help='按基准名称配置阈值的 JSON 文件')
+    parser.add_argument('--output', help='结果输出文件（默认 results/latest.json）')
+    args = parser.parse_args()
+
+    print("运行爬虫基准测试...")
+    results = run_benchmarks(args.only, args.repeat)
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / 'latest.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n结果已保存: {output}")
+
+    print("\n绝对目标:")
+    missed = check_targets(results)
+    if missed:
+        print(f"\n✗ {len(missed)} 项超出目标: {', '.join(missed)}")
+        return 1
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"基线已更新: {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print("未找到基线文件，使用 --save-baseline 生成")
+        return 0
+
+    thresholds = {}
+    if args.thresholds:
+        thresholds = json.loads(Path(args.thresholds).read_text(encoding='utf-8'))
+
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    regressions = compare(results, baseline, args.threshold, thresholds)
+    if regressions:
+        print(f"\n✗ 发现 {len(regressions)} 项性能回退: {', '.join(regressions)}")
+        return 1
+
+    print("\n✓ 未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
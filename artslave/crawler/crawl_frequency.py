@@ -0,0 +1,73 @@
+"""
+自适应爬取频率
+根据 crawl_jobs 历史估计数据源的变化率，在配置的上下限之间调整爬取间隔
+"""
+
+import math
+from datetime import datetime
+
+from config import (
+    ADAPTIVE_MIN_HOURS,
+    ADAPTIVE_MAX_HOURS,
+    ADAPTIVE_MIN_HISTORY,
+    ADAPTIVE_TARGET_CHANGE_PROBABILITY,
+)
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def job_changed(job):
+    """一次爬取是否观察到变化：有新增条目即视为变化（页面缓存命中时新增为 0）"""
+    return (job.get('items_added') or 0) > 0
+
+
+def estimate_change_rate(jobs):
+    """
+    估计数据源每小时的变化率 λ（假设变化服从泊松过程）
+    jobs 为按开始时间倒序的已完成任务；使用 Cho & Garcia-Molina 的改进估计量
+    λ = -ln((X + 0.5) / (n + 0.5)) / I，其中 X 为未变化的次数，I 为平均爬取间隔
+    历史不足时返回 None
+    """
+    timed = [(job, _parse_time(job.get('started_at'))) for job in jobs]
+    timed = [(job, started) for job, started in timed if started is not None]
+    if len(timed) < ADAPTIVE_MIN_HISTORY:
+        return None
+
+    # 每次观察对应与上一次爬取之间的间隔，最早的一次没有间隔可用
+    intervals = []
+    unchanged = 0
+    for (job, started), (_, previous) in zip(timed, timed[1:]):
+        hours = (started - previous).total_seconds() / 3600
+        if hours <= 0:
+            continue
+        intervals.append(hours)
+        if not job_changed(job):
+            unchanged += 1
+
+    if not intervals:
+        return None
+
+    observations = len(intervals)
+    mean_interval = sum(intervals) / observations
+    return -math.log((unchanged + 0.5) / (observations + 0.5)) / mean_interval
+
+
+def adapt_interval(change_rate, base_hours, min_hours=ADAPTIVE_MIN_HOURS, max_hours=ADAPTIVE_MAX_HOURS):
+    """
+    根据变化率计算新的爬取间隔（小时）：使每次爬取观察到变化的概率约为目标值
+    P(变化) = 1 - exp(-λ·I)  =>  I = -ln(1 - P) / λ
+    """
+    if change_rate is None:
+        return min(max(base_hours, min_hours), max_hours)
+    if change_rate <= 0:
+        return max_hours
+
+    interval = -math.log(1 - ADAPTIVE_TARGET_CHANGE_PROBABILITY) / change_rate
+    return min(max(interval, min_hours), max_hours)
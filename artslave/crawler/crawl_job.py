@@ -0,0 +1,104 @@
+"""
+爬虫任务生命周期
+一次运行只对应一条 crawl_jobs 记录：创建（或沿用已认领的任务）、运行中的进度心跳、结束状态，
+进度心跳在内存中合并，最多每 JOB_PROGRESS_INTERVAL_SECONDS 秒写入一次数据库
+"""
+
+import logging
+import time
+
+from config import JOB_PROGRESS_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('items_found', 'items_added', 'pages_crawled', 'bytes_fetched')
+
+
+class CrawlJob:
+    """crawl_jobs 中的一条任务记录"""
+
+    def __init__(self, db, job_id, flush_interval=JOB_PROGRESS_INTERVAL_SECONDS, lease_owner=None):
+        self.db = db
+        self.id = job_id
+        # 分布式模式下认领该任务的节点，结束状态只在仍持有租约时写入
+        self.lease_owner = lease_owner
+        self.flush_interval = flush_interval
+        self.counters = dict.fromkeys(COUNTER_FIELDS, 0)
+        self.dirty = False
+        self.last_write = time.monotonic()
+        self.last_poll = self.last_write
+        self.writes = 0
+        # 其他进程（如 crawler_manager.py cancel）写入的取消请求，随心跳读取
+        self.cancel_requested = False
+        self.db.ensure_job_progress_columns()
+
+    @classmethod
+    def create(cls, db, data_source_name, **kwargs):
+        """新建任务，直接以运行中状态写入"""
+        job_id = db.create_crawl_job(data_source_name, status='running')
+        if not job_id:
+            raise RuntimeError(f"无法创建爬虫任务: {data_source_name}")
+        job = cls(db, job_id, **kwargs)
+        job.writes += 1
+        return job
+
+    @classmethod
+    def attach(cls, db, job_id, **kwargs):
+        """沿用已有任务（如分布式模式下已认领的任务），并标记为运行中（保留已记录的进度）"""
+        job = cls(db, job_id, **kwargs)
+        db.mark_crawl_job_running(job_id)
+        job.writes += 1
+        return job
+
+    def heartbeat(self, force=False, **counters):
+        """记录进度（计数为累计值），距离上次写入不足 flush_interval 时只更新内存"""
+        for field, value in counters.items():
+            if field in self.counters and value is not None and value != self.counters[field]:
+                self.counters[field] = value
+                self.dirty = True
+
+        now = time.monotonic()
+        if self.dirty and (force or now - self.last_write >= self.flush_interval):
+            self.flush()
+        self.poll_cancel(force)
+
+    def poll_cancel(self, force=False):
+        """读取取消请求（最多每 flush_interval 秒查询一次），返回是否已请求取消"""
+        now = time.monotonic()
+        if not self.cancel_requested and (force or now - self.last_poll >= self.flush_interval):
+            self.last_poll = now
+            self.cancel_requested = self.db.is_crawl_job_cancel_requested(self.id)
+        return self.cancel_requested
+
+    def flush(self):
+        """立即写入合并后的进度"""
+        if not self.dirty:
+            return
+        self.db.update_crawl_job_progress(self.id, **self.counters)
+        self.dirty = False
+        self.last_write = time.monotonic()
+        self.writes += 1
+
+    def complete(self, **counters):
+        self.finish('completed', **counters)
+
+    def fail(self, error_message, **counters):
+        self.finish('failed', error_message=error_message, **counters)
+
+    def partial(self, reason, **counters):
+        """因取消或超出预算提前结束：已抓取的数据已保存，任务标记为部分完成"""
+        self.finish('completed', error_message=reason, is_partial=True, **counters)
+
+    def finish(self, status, error_message=None, is_partial=False, **counters):
+        """写入结束状态和最终进度（一次 UPDATE）"""
+        for field, value in counters.items():
+            if field in self.counters and value is not None:
+                self.counters[field] = value
+        written = self.db.finish_crawl_job(
+            self.id, status, error_message=error_message, is_partial=is_partial,
+            lease_owner=self.lease_owner, **self.counters
+        )
+        if self.lease_owner is not None and written == 0:
+            logger.warning(f"任务 {self.id} 的租约已不属于本节点，结束状态未写入")
+        self.dirty = False
+        self.writes += 1
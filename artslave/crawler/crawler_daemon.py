@@ -0,0 +1,343 @@
+"""
+爬虫守护进程
+常驻运行 crawler_manager，通过本地 HTTP 端口提供 JSON 协议，
+Web API 不再为每个请求启动新的 Python 进程
+
+协议（POST /，请求体为 JSON）:
+    {"action": "list"}                          可用爬虫
+    {"action": "stats"}                         今日统计
+    {"action": "run", "crawler": "demo"}        异步启动，立即返回 run_id
+    {"action": "status"}                        所有运行记录；带 "run_id" 时返回单个
+    {"action": "cancel", "run_id": "..."}       取消运行（也可用 "crawler" 或 crawl_jobs 的 "job_id" 指定）
+    {"action": "changes", "cursor": 0}          序号大于 cursor 的投稿信息变更事件（可带 "limit"）
+
+GET /events?run_id=...  以 NDJSON 流式返回运行的进度事件，运行结束后关闭连接
+GET /health             存活检查
+GET /metrics            Prometheus 文本格式的指标
+"""
+
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from config import DAEMON_HOST, DAEMON_PORT, DAEMON_MAX_RUNS, DAEMON_RUN_HISTORY, CHANGE_FEED_BATCH_SIZE
+from crawler_manager import CrawlerManager, describe_crawlers
+from database import DatabaseManager
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'partial', 'failed', 'cancelled')
+
+
+class CrawlRun:
+    """一次爬虫运行及其进度事件"""
+
+    def __init__(self, crawler_name):
+        self.id = uuid.uuid4().hex[:12]
+        self.crawler_name = crawler_name
+        self.status = 'queued'
+        self.job_id = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.progress = {}
+        self.events = []
+        self.cancel_event = threading.Event()
+        self.condition = threading.Condition()
+
+    def add_event(self, event, data=None):
+        with self.condition:
+            self.events.append({
+                'seq': len(self.events),
+                'event': event,
+                'time': datetime.now().isoformat(),
+                'data': data or {}
+            })
+            self.condition.notify_all()
+
+    def to_dict(self):
+        return {
+            'run_id': self.id,
+            'crawler': self.crawler_name,
+            'status': self.status,
+            'job_id': self.job_id,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'progress': self.progress,
+        }
+
+
+class CrawlerDaemon:
+    """管理运行记录并在线程池中执行爬虫"""
+
+    def __init__(self, max_runs=DAEMON_MAX_RUNS):
+        self.executor = ThreadPoolExecutor(max_workers=max_runs, thread_name_prefix='crawl-run')
+        self.runs = OrderedDict()
+        self.lock = threading.Lock()
+        metrics.DAEMON_ACTIVE_RUNS.set_function(lambda: len(self.active_runs()))
+
+    def list_crawlers(self):
+        running = {run.crawler_name for run in self.active_runs()}
+        return [
+            dict(crawler, status='running' if crawler['name'] in running else 'idle')
+            for crawler in describe_crawlers()
+        ]
+
+    def get_stats(self):
+        # 每个请求在独立线程中处理，SQLite 连接不能跨线程共享
+        db = DatabaseManager()
+        try:
+            return db.get_today_crawl_stats()
+        finally:
+            db.close()
+
+    def active_runs(self):
+        with self.lock:
+            return [run for run in self.runs.values() if run.status not in FINISHED_STATUSES]
+
+    def get_run(self, run_id):
+        with self.lock:
+            return self.runs.get(run_id)
+
+    def start_run(self, crawler_name):
+        """提交一次运行；爬虫不存在或已在运行时返回 (None, 错误信息)"""
+        if crawler_name not in {crawler['name'] for crawler in describe_crawlers()}:
+            return None, f"爬虫 '{crawler_name}' 不存在"
+
+        # 检查和登记在同一把锁内完成，同时到达的两个请求不会都启动运行
+        with self.lock:
+            if any(run.crawler_name == crawler_name and run.status not in FINISHED_STATUSES
+                   for run in self.runs.values()):
+                return None, f"爬虫 {crawler_name} 已在运行中"
+            run = CrawlRun(crawler_name)
+            self.runs[run.id] = run
+            # 只保留最近的已结束记录
+            finished = [key for key, item in self.runs.items() if item.status in FINISHED_STATUSES]
+            for key in finished[:max(len(finished) - DAEMON_RUN_HISTORY, 0)]:
+                del self.runs[key]
+
+        run.add_event('queued', {'crawler': crawler_name})
+        self.executor.submit(self.execute_run, run)
+        return run, None
+
+    def execute_run(self, run):
+        if run.cancel_event.is_set():
+            self.finish_run(run, 'cancelled')
+            return
+
+        def on_progress(event, data):
+            if event == 'started':
+                run.job_id = data.get('job_id')
+            run.progress = {key: data[key] for key in ('items_found', 'items_added') if key in data} or run.progress
+            run.add_event(event, data)
+
+        run.status = 'running'
+        manager = CrawlerManager()
+        try:
+            outcome = manager.run_crawler(run.crawler_name, progress=on_progress, cancel_event=run.cancel_event)
+        except Exception as e:
+            logger.error(f"运行 {run.id} 异常: {e}")
+            outcome = 'failed'
+        finally:
+            manager.close()
+
+        # 超出预算提前结束的运行为 partial，收到取消请求的为 cancelled
+        if run.cancel_event.is_set():
+            self.finish_run(run, 'cancelled')
+        else:
+            self.finish_run(run, outcome)
+
+    def finish_run(self, run, status):
+        # 状态和结束事件一起更新，事件流不会在最后一条事件之前结束
+        with run.condition:
+            run.status = status
+            run.finished_at = datetime.now().isoformat()
+            run.add_event(status, run.progress)
+        metrics.DAEMON_RUNS.inc(result=status)
+
+    def cancel(self, run_id=None, crawler_name=None):
+        """请求取消运行，爬虫在下一个检查点停止；返回被取消的运行列表"""
+        runs = [
+            run for run in self.active_runs()
+            if run.id == run_id or (run_id is None and run.crawler_name == crawler_name)
+        ]
+        for run in runs:
+            run.cancel_event.set()
+            run.add_event('cancel_requested')
+        return runs
+
+    def cancel_job(self, job_id):
+        """按任务ID取消：本进程中的运行直接通知，其他进程中的任务通过 crawl_jobs.cancel_requested 通知"""
+        runs = [run for run in self.active_runs() if run.job_id == job_id]
+        for run in runs:
+            run.cancel_event.set()
+            run.add_event('cancel_requested')
+
+        db = DatabaseManager()
+        try:
+            requested = db.request_crawl_job_cancel(job_id)
+        finally:
+            db.close()
+
+        if not runs and not requested:
+            return 404, {'error': '任务不存在或已结束'}
+        return 200, {'success': True, 'cancelled': [run.id for run in runs], 'job_id': job_id}
+
+    def handle(self, request):
+        """处理一条 JSON 协议请求，返回 (HTTP 状态码, 响应体)"""
+        action = request.get('action')
+
+        if action == 'list':
+            return 200, {'crawlers': self.list_crawlers()}
+
+        if action == 'stats':
+            return 200, {'stats': self.get_stats()}
+
+        if action == 'run':
+            run, error = self.start_run(request.get('crawler'))
+            if run is None:
+                return 409, {'error': error}
+            return 202, {'success': True, 'status': 'started', 'run': run.to_dict()}
+
+        if action == 'status':
+            if request.get('run_id'):
+                run = self.get_run(request['run_id'])
+                if run is None:
+                    return 404, {'error': '运行记录不存在'}
+                return 200, {'run': run.to_dict()}
+            with self.lock:
+                runs = [run.to_dict() for run in self.runs.values()]
+            return 200, {'runs': runs}
+
+        if action == 'cancel':
+            if request.get('job_id'):
+                return self.cancel_job(request['job_id'])
+            runs = self.cancel(request.get('run_id'), request.get('crawler'))
+            if not runs:
+                return 404, {'error': '没有正在运行的匹配任务'}
+            return 200, {'success': True, 'cancelled': [run.id for run in runs]}
+
+        if action == 'changes':
+            db = DatabaseManager()
+            try:
+                return 200, db.get_changes_after(request.get('cursor', 0), request.get('limit', CHANGE_FEED_BATCH_SIZE))
+            except (TypeError, ValueError):
+                return 400, {'error': 'cursor 和 limit 必须为整数'}
+            finally:
+                db.close()
+
+        return 400, {'error': '无效的操作'}
+
+    def shutdown(self):
+        for run in self.active_runs():
+            run.cancel_event.set()
+        self.executor.shutdown(wait=True)
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    daemon = None  # 由 serve() 设置
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': '请求体不是有效的 JSON'})
+            return
+
+        try:
+            status, body = self.daemon.handle(request)
+        except Exception as e:
+            logger.error(f"处理请求失败: {e}")
+            status, body = 500, {'error': str(e)}
+        self.send_json(status, body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self.send_json(200, {'ok': True, 'active_runs': len(self.daemon.active_runs())})
+        elif url.path == '/metrics':
+            payload = metrics.REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', metrics.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif url.path == '/events':
+            self.stream_events(parse_qs(url.query).get('run_id', [None])[0])
+        else:
+            self.send_json(404, {'error': '未知路径'})
+
+    def stream_events(self, run_id):
+        """逐行输出运行的进度事件（包括已发生的），运行结束后关闭连接"""
+        run = self.daemon.get_run(run_id) if run_id else None
+        if run is None:
+            self.send_json(404, {'error': '运行记录不存在'})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        sent = 0
+        try:
+            while True:
+                with run.condition:
+                    while sent >= len(run.events) and run.status not in FINISHED_STATUSES:
+                        run.condition.wait(timeout=15)
+                        if sent >= len(run.events):
+                            break
+                    pending = run.events[sent:]
+                    finished = run.status in FINISHED_STATUSES
+
+                if not pending and not finished:
+                    # 长时间没有事件时发送心跳，及时发现客户端断开
+                    pending = [{'event': 'heartbeat', 'time': datetime.now().isoformat()}]
+                else:
+                    sent += len(pending)
+
+                for event in pending:
+                    self.wfile.write(json.dumps(event, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+                if finished and sent >= len(run.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def serve(host=DAEMON_HOST, port=DAEMON_PORT, max_runs=DAEMON_MAX_RUNS):
+    """启动守护进程并阻塞运行，Ctrl+C 退出"""
+    daemon = CrawlerDaemon(max_runs)
+    DaemonRequestHandler.daemon = daemon
+    server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.daemon_threads = True
+
+    logger.info(f"爬虫守护进程已启动: http://{host}:{port}")
+    print(f"爬虫守护进程已启动: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止守护进程...")
+    finally:
+        server.server_close()
+        daemon.shutdown()
+        logger.info("爬虫守护进程已停止")
@@ -10,78 +10,107 @@ import argparse
 import logging
 import traceback
 from datetime import datetime
-from database import DatabaseManager
-from demo_crawler import DemoCrawler
-
-# 配置详细日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('crawler_detailed.log'),
-        logging.StreamHandler()
-    ]
+from config import (
+    DAEMON_HOST, DAEMON_PORT, EXPORT_DIR, CHANGE_FEED_BATCH_SIZE, CHANGE_FEED_RETENTION_DAYS, REEXTRACT_CHECKPOINT
 )
+from database import DatabaseManager
+from crawler_registry import registry
+from crawl_job import CrawlJob
+from logging_setup import setup_logging, log_context, bind_log_context
 
 logger = logging.getLogger(__name__)
 
+
+def describe_crawlers():
+    """可用爬虫的名称和描述（只读取元数据，不导入爬虫模块）"""
+    return registry.describe()
+
+
 class CrawlerManager:
     def __init__(self):
-        self.db = DatabaseManager()
-        self.crawlers = {
-            'demo': DemoCrawler,
-            # 可以在这里添加更多爬虫类
-        }
+        # 爬虫类在第一次运行时才导入，数据库在第一次使用时才连接
+        self.crawlers = registry
+        self._db = None
+    
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+    
+    def close(self):
+        """关闭数据库连接（未连接时不做任何事）"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
     
     def list_crawlers(self):
         """列出所有可用的爬虫"""
         print("可用的爬虫:")
-        for name, crawler_class in self.crawlers.items():
-            print(f"  - {name}: {crawler_class.__doc__ or '无描述'}")
+        for crawler in describe_crawlers():
+            print(f"  - {crawler['name']}: {crawler['description']}")
+    
+    def run_crawler(self, crawler_name, data_source_name=None, job_id=None, progress=None, cancel_event=None,
+                    lease_owner=None):
+        """运行指定的爬虫，data_source_name 用于任务记录（默认为爬虫名称）；
+        传入 job_id 时沿用已认领的任务记录，不再新建，lease_owner 为认领该任务的节点；
+        progress(event, data) 接收进度事件，cancel_event 被设置时爬虫在下一个检查点停止。
+        返回运行结果：completed、partial（被取消或超出预算提前结束，已抓取的数据已保存）或 failed"""
+        with log_context(source=data_source_name or crawler_name, job_id=job_id):
+            return self._run_crawler(crawler_name, data_source_name, job_id, progress, cancel_event, lease_owner)
     
-    def run_crawler(self, crawler_name):
-        """运行指定的爬虫"""
+    def _run_crawler(self, crawler_name, data_source_name, job_id, progress, cancel_event, lease_owner):
         job_start_time = datetime.now()
         logger.info(f"开始运行爬虫: {crawler_name}")
 
         if crawler_name not in self.crawlers:
             error_msg = f"爬虫 '{crawler_name}' 不存在"
             logger.error(error_msg)
-            print(f"错误: {error_msg}")
-            return False
+            if job_id:
+                self.db.update_crawl_job(job_id, 'failed', error_message=error_msg)
+            return 'failed'
 
-        try:
-            # 创建爬虫任务记录
-            job_id = self.db.create_crawl_job()
-            logger.info(f"创建爬虫任务: {job_id}")
-            print(f"创建爬虫任务: {job_id}")
+        # 爬虫依赖（requests 等）只在运行时导入
+        from base_crawler import CrawlCancelled
 
-            # 更新任务状态为运行中
-            self.db.update_crawl_job(job_id, 'running')
-            logger.info(f"任务 {job_id} 状态更新为运行中")
+        job = None
+        crawler = None
+        try:
+            # 一次运行只对应一条任务记录：沿用已认领的任务，或新建一条运行中的任务
+            if job_id is None:
+                job = CrawlJob.create(self.db, data_source_name or crawler_name)
+                bind_log_context(job_id=job.id)
+                logger.info(f"创建爬虫任务: {job.id}")
+            else:
+                job = CrawlJob.attach(self.db, job_id, lease_owner=lease_owner)
+                logger.info(f"任务 {job_id} 状态更新为运行中")
 
             # 实例化并运行爬虫
             crawler_class = self.crawlers[crawler_name]
             crawler = crawler_class()
+            crawler.attach_job(job)
+            crawler.progress_callback = progress
+            crawler.cancel_event = cancel_event
             logger.info(f"初始化爬虫 {crawler_name} 成功")
+            if progress:
+                progress('started', {'job_id': job.id})
 
             crawler.run()
             execution_time = (datetime.now() - job_start_time).total_seconds()
 
             # 更新任务状态为完成
-            items_found = getattr(crawler, 'items_found', 0)
-            items_added = getattr(crawler, 'items_added', 0)
-
-            self.db.update_crawl_job(
-                job_id,
-                'completed',
-                items_found=items_found,
-                items_added=items_added
-            )
-
-            logger.info(f"爬虫任务 {job_id} 完成: 发现 {items_found} 条数据，添加 {items_added} 条数据，耗时 {execution_time:.2f} 秒")
-            print(f"爬虫任务完成: {job_id}")
-            return True
+            job.complete(**crawler.progress_counters())
+            counters = job.counters
+
+            logger.info(f"爬虫任务 {job.id} 完成: 发现 {counters['items_found']} 条数据，添加 {counters['items_added']} 条数据，"
+                        f"{counters['pages_crawled']} 个页面，耗时 {execution_time:.2f} 秒")
+            return 'completed'
+
+        except CrawlCancelled as e:
+            # 缓冲中的条目已在 crawler.run 中写入，任务标记为部分完成
+            logger.warning(f"爬虫任务 {job.id} 提前结束（{e}），已保存的数据保留")
+            job.partial(str(e), **crawler.progress_counters())
+            return 'partial'
 
         except Exception as e:
             execution_time = (datetime.now() - job_start_time).total_seconds()
@@ -90,11 +119,19 @@ class CrawlerManager:
             logger.error(f"错误详情: {e}")
             logger.debug(f"完整错误堆栈:\n{error_details}")
 
-            print(f"爬虫运行失败: {e}")
-            if 'job_id' in locals():
-                self.db.update_crawl_job(job_id, 'failed', error_message=str(e))
-                logger.info(f"任务 {job_id} 状态更新为失败")
-            return False
+            if job is not None:
+                counters = crawler.progress_counters() if crawler is not None else {}
+                job.fail(str(e), **counters)
+                logger.info(f"任务 {job.id} 状态更新为失败")
+            return 'failed'
+    
+    def match_submissions(self, full=False):
+        """为新投稿信息（full 时为全部有效投稿信息）计算候选匹配，写入 ai_matches"""
+        from batch_matcher import run_matcher
+        stats = run_matcher(self.db, full=full)
+        print(f"匹配 {stats['submissions']} 条投稿信息 x {stats['users']} 个用户，"
+              f"写入 {stats['matches']} 个候选，耗时 {stats['seconds']:.2f} 秒")
+        return stats
     
     def run_all_crawlers(self):
         """运行所有爬虫"""
@@ -106,28 +143,22 @@ class CrawlerManager:
             print(f"运行爬虫: {crawler_name}")
             print(f"{'='*50}")
             
-            if self.run_crawler(crawler_name):
-                success_count += 1
-            else:
+            outcome = self.run_crawler(crawler_name)
+            if outcome == 'failed':
                 print(f"爬虫 {crawler_name} 运行失败")
+            else:
+                success_count += 1
+                if outcome == 'partial':
+                    print(f"爬虫 {crawler_name} 提前结束，已抓取的数据已保存")
         
         print(f"\n总结: {success_count}/{len(self.crawlers)} 个爬虫运行成功")
     
-    def get_crawl_stats(self):
-        """获取爬虫统计信息"""
-        query = """
-        SELECT 
-            status,
-            COUNT(*) as count,
-            SUM(items_found) as total_found,
-            SUM(items_added) as total_added
-        FROM crawl_jobs 
-        WHERE created_at >= CURRENT_DATE
-        GROUP BY status;
-        """
-        
-        results = self.db.execute_query(query)
-        if results:
+    def get_crawl_stats(self, as_json=False):
+        """获取爬虫统计信息；as_json 时输出与守护进程 stats 相同结构的 JSON（{"stats": [...]}）"""
+        results = self.db.get_today_crawl_stats() or []
+        if as_json:
+            print(json.dumps({'stats': results}, ensure_ascii=False))
+        elif results:
             print("今日爬虫统计:")
             for row in results:
                 print(f"  {row['status']}: {row['count']} 次任务, "
@@ -136,6 +167,53 @@ class CrawlerManager:
         else:
             print("今日暂无爬虫任务")
     
+    def cancel_job(self, job_id):
+        """请求取消运行中的任务（可以在其他进程或节点上运行），爬虫在下一个检查点保存数据后结束"""
+        if self.db.request_crawl_job_cancel(job_id):
+            logger.info(f"已请求取消任务 {job_id}")
+            print(f"已请求取消任务 {job_id}，爬虫将在保存已抓取的数据后结束")
+            return True
+        print(f"任务 {job_id} 不存在或已结束")
+        return False
+    
+    def profile_crawler(self, crawler_name, output_dir='profiles', interval=0.005):
+        """在分析器下运行指定爬虫，输出阶段耗时、热点和内存分配"""
+        if crawler_name not in self.crawlers:
+            print(f"错误: 爬虫 '{crawler_name}' 不存在")
+            return None
+        
+        from profiler import profile_crawler
+        logger.info(f"开始分析爬虫: {crawler_name}")
+        return profile_crawler(self.crawlers[crawler_name], output_dir=output_dir, interval=interval)
+    
+    def export_submissions(self, output_dir, fmt='jsonl', incremental=False, consumer='default'):
+        """导出投稿信息（流式分块写出），增量模式只导出上次导出之后更新的行"""
+        from exporter import export_submissions
+        stats = export_submissions(self.db, output_dir, fmt=fmt, incremental=incremental, consumer=consumer)
+        if stats['path'] is None:
+            print("没有需要导出的新数据")
+        else:
+            print(f"已导出 {stats['rows']} 行到 {stats['path']}（{stats['bytes'] / 1024:.1f} KB，耗时 {stats['seconds']:.2f} 秒）")
+        return stats
+    
+    def reextract(self, sources=None, crawler_name=None, since=None, until=None, workers=None,
+                  checkpoint=REEXTRACT_CHECKPOINT):
+        """用当前的提取和清洗逻辑重新处理归档页面（多进程），可限定数据源、爬虫和抓取时间范围"""
+        crawlers = None
+        if crawler_name:
+            if crawler_name not in self.crawlers:
+                print(f"错误: 爬虫 '{crawler_name}' 不存在")
+                return None
+            spec = self.crawlers.specs[crawler_name]
+            crawlers = [f"{spec.module}:{spec.class_name}"]
+        
+        from reextract import reextract
+        stats = reextract(self.db, sources=sources, crawlers=crawlers, since=since, until=until,
+                          workers=workers, checkpoint_path=checkpoint)
+        print(f"重新提取 {stats['pages']} 个页面，{stats['items']} 条投稿信息，写入 {stats['written']} 条，"
+              f"失败 {stats['errors']} 个页面，耗时 {stats['seconds']:.2f} 秒（{stats['pages_per_second']:.1f} 页/秒）")
+        return stats
+    
     def cleanup_old_jobs(self, days=7):
         """清理旧的爬虫任务记录"""
         query = """
@@ -145,17 +223,68 @@ class CrawlerManager:
         
         result = self.db.execute_query(query, (days,))
         print(f"清理了 {days} 天前的爬虫任务记录")
+        
+        pruned = self.db.prune_submission_changes(CHANGE_FEED_RETENTION_DAYS)
+        print(f"清理了 {pruned or 0} 条 {CHANGE_FEED_RETENTION_DAYS} 天前的变更事件")
+    
+    def show_changes(self, cursor=0, limit=CHANGE_FEED_BATCH_SIZE):
+        """输出序号大于 cursor 的变更事件，以及下次轮询使用的序号"""
+        result = self.db.get_changes_after(cursor, limit)
+        if result['truncated']:
+            print(f"警告: 序号 {cursor} 之后的部分事件已被清理，需要重新全量同步")
+        for change in result['changes']:
+            print(f"{change['seq']:>10}  {change['op']:<10} {change['submission_id']}  v{change['version']}  {change['changed_at']}")
+        print(f"下次轮询: --after {result['cursor']}{'（还有更多事件）' if result['has_more'] else ''}")
+        return result
 
 def main():
     parser = argparse.ArgumentParser(description='ArtSlave 爬虫管理器')
-    parser.add_argument('action', choices=['list', 'run', 'run-all', 'stats', 'cleanup'], 
+    parser.add_argument('action', choices=['list', 'run', 'run-all', 'stats', 'cleanup', 'profile', 'daemon', 'cancel', 'export', 'changes', 'reextract', 'match'], 
                        help='要执行的操作')
-    parser.add_argument('--crawler', '-c', help='要运行的爬虫名称 (用于 run 操作)')
+    parser.add_argument('--crawler', '-c', help='要运行的爬虫名称 (用于 run / profile 操作；reextract 操作只处理该爬虫抓取的页面)')
+    parser.add_argument('--job', '-j', help='要取消的任务ID (用于 cancel 操作)')
     parser.add_argument('--days', '-d', type=int, default=7, 
                        help='清理多少天前的记录 (用于 cleanup 操作)')
+    parser.add_argument('--output', '-o',
+                       help='输出目录 (用于 profile 操作，默认 profiles；export 操作，默认 EXPORT_DIR)')
+    parser.add_argument('--interval', type=float, default=0.005,
+                       help='调用栈采样间隔秒数 (用于 profile 操作)')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl',
+                       help='导出格式：gzip 压缩的 JSON Lines 或 Parquet (用于 export 操作)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='只导出上次导出之后新增或更新的数据 (用于 export 操作)')
+    parser.add_argument('--consumer', default='default',
+                       help='下游使用方名称，各自记录增量导出水位 (用于 export 操作)')
+    parser.add_argument('--after', type=int, default=0,
+                       help='只输出序号大于该值的变更事件 (用于 changes 操作)')
+    parser.add_argument('--limit', type=int, default=CHANGE_FEED_BATCH_SIZE,
+                       help='最多输出的变更事件数 (用于 changes 操作)')
+    parser.add_argument('--source', action='append',
+                       help='只处理该数据源的页面，可重复指定 (用于 reextract 操作)')
+    parser.add_argument('--since', help='只处理最近抓取时间不早于该时间的页面，如 2024-01-01 (用于 reextract 操作)')
+    parser.add_argument('--until', help='只处理最近抓取时间早于该时间的页面 (用于 reextract 操作)')
+    parser.add_argument('--workers', type=int,
+                       help='并行进程数，默认 CPU 核数 (用于 reextract 操作)')
+    parser.add_argument('--checkpoint', default=REEXTRACT_CHECKPOINT,
+                       help='检查点文件，中断后以相同条件重新运行时从检查点继续 (用于 reextract 操作)')
+    parser.add_argument('--full', action='store_true',
+                       help='重新计算全部有效投稿信息，而不只是上次之后新增的 (用于 match 操作)')
+    parser.add_argument('--json', action='store_true',
+                       help='以 JSON 输出，结构与守护进程的 stats 响应相同 (用于 stats 操作)')
+    parser.add_argument('--host', default=DAEMON_HOST, help='监听地址 (用于 daemon 操作)')
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help='监听端口 (用于 daemon 操作)')
     
     args = parser.parse_args()
     
+    # list / stats 只读元数据和统计，不需要日志文件
+    if args.action not in ('list', 'stats'):
+        setup_logging('crawler_detailed.log')
+    
+    if args.action == 'daemon':
+        from crawler_daemon import serve
+        serve(args.host, args.port)
+        return
+    
     manager = CrawlerManager()
     
     try:
@@ -172,11 +301,38 @@ def main():
             manager.run_all_crawlers()
             
         elif args.action == 'stats':
-            manager.get_crawl_stats()
+            manager.get_crawl_stats(args.json)
             
         elif args.action == 'cleanup':
             manager.cleanup_old_jobs(args.days)
             
+        elif args.action == 'cancel':
+            if not args.job:
+                print("错误: 请指定要取消的任务ID (--job)")
+                sys.exit(1)
+            if not manager.cancel_job(args.job):
+                sys.exit(1)
+            
+        elif args.action == 'profile':
+            if not args.crawler:
+                print("错误: 请指定要分析的爬虫名称 (--crawler)")
+                sys.exit(1)
+            manager.profile_crawler(args.crawler, args.output or 'profiles', args.interval)
+            
+        elif args.action == 'changes':
+            manager.show_changes(args.after, args.limit)
+            
+        elif args.action == 'reextract':
+            if manager.reextract(args.source, args.crawler, args.since, args.until, args.workers,
+                                 args.checkpoint) is None:
+                sys.exit(1)
+            
+        elif args.action == 'match':
+            manager.match_submissions(args.full)
+            
+        elif args.action == 'export':
+            manager.export_submissions(args.output or EXPORT_DIR, args.format, args.incremental, args.consumer)
+            
     except KeyboardInterrupt:
         print("\n操作被用户中断")
         sys.exit(1)
@@ -184,7 +340,7 @@ def main():
         print(f"发生错误: {e}")
         sys.exit(1)
     finally:
-        manager.db.close()
+        manager.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,129 @@
+"""
+爬虫注册表
+只读取元数据来发现爬虫，不导入爬虫模块（及其依赖的 requests / bs4 / fake_useragent），
+list / stats 等命令因此可以快速启动；爬虫类在第一次运行时才导入
+
+发现来源：
+1. 爬虫目录下的 *_crawler.py：通过语法树找到继承 BaseCrawler 的类，
+   注册名取类属性 NAME，没有时取文件名去掉 _crawler 后缀，描述取类文档字符串
+2. 已安装包声明的 entry points（分组 artslave.crawlers），例如
+   [project.entry-points."artslave.crawlers"]
+   my_site = "my_package.my_site:MySiteCrawler"
+"""
+
+import ast
+import importlib
+from collections.abc import Mapping
+from pathlib import Path
+
+ENTRY_POINT_GROUP = 'artslave.crawlers'
+CRAWLER_DIR = Path(__file__).resolve().parent
+BASE_CLASS_NAME = 'BaseCrawler'
+
+
+class CrawlerSpec:
+    """爬虫的元数据，load() 时才导入爬虫类"""
+
+    __slots__ = ('name', 'module', 'class_name', 'description', '_class')
+
+    def __init__(self, name, module, class_name, description=''):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.description = description
+        self._class = None
+
+    def load(self):
+        if self._class is None:
+            self._class = getattr(importlib.import_module(self.module), self.class_name)
+        return self._class
+
+
+def _base_names(node):
+    for base in node.bases:
+        if isinstance(base, ast.Name):
+            yield base.id
+        elif isinstance(base, ast.Attribute):
+            yield base.attr
+
+
+def _literal_name(node):
+    """类体中 NAME = '...' 的取值"""
+    for statement in node.body:
+        if (isinstance(statement, ast.Assign)
+                and any(isinstance(target, ast.Name) and target.id == 'NAME' for target in statement.targets)
+                and isinstance(statement.value, ast.Constant)
+                and isinstance(statement.value.value, str)):
+            return statement.value.value
+    return None
+
+
+def scan_directory(directory=CRAWLER_DIR):
+    """扫描目录中的 *_crawler.py，返回 CrawlerSpec 列表（不导入模块）"""
+    specs = []
+    for path in sorted(Path(directory).glob('*_crawler.py')):
+        if path.stem == 'base_crawler':
+            continue
+        try:
+            tree = ast.parse(path.read_text(encoding='utf-8'), filename=str(path))
+        except (OSError, SyntaxError) as e:
+            print(f"跳过无法解析的爬虫模块 {path.name}: {e}")
+            continue
+
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and BASE_CLASS_NAME in _base_names(node):
+                name = _literal_name(node) or path.stem[:-len('_crawler')]
+                specs.append(CrawlerSpec(name, path.stem, node.name, ast.get_docstring(node) or ''))
+    return specs
+
+
+def scan_entry_points(group=ENTRY_POINT_GROUP):
+    """读取已安装包声明的爬虫 entry points（不导入模块）"""
+    from importlib import metadata
+
+    specs = []
+    for entry_point in metadata.entry_points(group=group):
+        module, _, class_name = entry_point.value.partition(':')
+        specs.append(CrawlerSpec(entry_point.name, module.strip(), class_name.strip(), entry_point.value))
+    return specs
+
+
+class CrawlerRegistry(Mapping):
+    """爬虫名称到爬虫类的映射，取值时才导入对应模块"""
+
+    def __init__(self, directory=CRAWLER_DIR, group=ENTRY_POINT_GROUP):
+        self.directory = directory
+        self.group = group
+        self._specs = None
+
+    @property
+    def specs(self):
+        if self._specs is None:
+            specs = {}
+            # 目录中的爬虫优先，entry points 不覆盖同名爬虫
+            for spec in scan_directory(self.directory) + scan_entry_points(self.group):
+                specs.setdefault(spec.name, spec)
+            self._specs = specs
+        return self._specs
+
+    def describe(self):
+        """爬虫名称和描述（不导入爬虫模块）"""
+        return [
+            {'name': spec.name, 'description': spec.description or '无描述'}
+            for spec in self.specs.values()
+        ]
+
+    def __getitem__(self, name):
+        return self.specs[name].load()
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
+
+
+registry = CrawlerRegistry()
@@ -1,28 +1,39 @@
+import logging
 import sqlite3
 import json
-from datetime import datetime
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
+from config import (
+    SUBMISSION_BATCH_SIZE, SQLITE_DB_PATH, SQLITE_BUSY_TIMEOUT,
+    CHANGE_FEED_ENABLED, CHANGE_FEED_BATCH_SIZE, CHANGE_FEED_RETENTION_DAYS
+)
+from submission_record import SubmissionRecord, SUBMISSION_ROW_COLUMNS, SUBMISSION_ITEM_COLUMNS
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SQLITE_DB_PATH
         self.connection = None
+        self._last_submission_id = 0
+        self._change_feed_ready = False
+        self._submission_columns_ready = False
         self.connect()
 
     def connect(self):
         """连接 SQLite 数据库"""
         try:
             # 确保数据目录存在
-            data_dir = Path(__file__).parent.parent / 'data'
-            data_dir.mkdir(exist_ok=True)
-
-            # SQLite 数据库文件路径
-            db_path = data_dir / 'artslave.db'
+            db_path = Path(self.db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
 
-            self.connection = sqlite3.connect(str(db_path))
+            self.connection = sqlite3.connect(str(db_path), timeout=SQLITE_BUSY_TIMEOUT)
             self.connection.row_factory = sqlite3.Row  # 使结果可以像字典一样访问
-            print(f"✓ SQLite 数据库连接成功: {db_path}")
+            logger.debug(f"SQLite 数据库连接成功: {db_path}")
         except Exception as e:
-            print(f"✗ 数据库连接失败: {e}")
+            logger.error(f"数据库连接失败: {e}")
             self.connection = None
 
     def close(self):
@@ -30,6 +41,15 @@ class DatabaseManager:
         if self.connection:
             self.connection.close()
 
+    def ensure_columns(self, table, columns):
+        """为已有表补充缺失的列（轻量迁移，列已存在时跳过）"""
+        cursor = self.connection.execute(f"PRAGMA table_info({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        self.connection.commit()
+
     def execute_query(self, query, params=None):
         """执行查询"""
         try:
@@ -48,58 +68,313 @@ class DatabaseManager:
                 return cursor.rowcount
 
         except Exception as e:
-            print(f"查询执行失败: {e}")
+            logger.warning(f"查询执行失败: {e}")
             self.connection.rollback()
             return None
     
-    def insert_submission_info(self, data):
-        """插入投稿信息"""
-        # 生成唯一ID
-        submission_id = str(int(datetime.now().timestamp() * 1000))
+    def next_submission_id(self):
+        """生成投稿信息ID（毫秒时间戳，同一毫秒内递增，避免批量写入时互相覆盖）"""
+        candidate = int(datetime.now().timestamp() * 1000)
+        self._last_submission_id = max(candidate, self._last_submission_id + 1)
+        return str(self._last_submission_id)
 
-        query = """
-        INSERT OR REPLACE INTO submissions (
-            id, title, description, type, organizer, deadline,
-            location, website, email, phone, fee, prize,
-            requirements, tags, is_active, created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    def insert_submission_rows(self, rows, columns=SUBMISSION_ROW_COLUMNS, failed_rows=None):
+        """批量写入 submissions 行元组（列顺序见 columns，默认 SUBMISSION_ROW_COLUMNS），返回写入条数；
+        传入列表 failed_rows 时，写入失败的行追加到其中"""
+        if not rows:
+            return 0
+
+        query = f"""
+        INSERT OR REPLACE INTO submissions ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
         """
 
+        self.ensure_submission_columns()
+        if 'item_key' in columns:
+            rows = self.match_item_keys(rows, columns)
+
+        id_index = columns.index('id')
+        try:
+            with self.connection:
+                self.write_submission_rows(query, rows, id_index)
+            return len(rows)
+        except Exception as e:
+            logger.warning(f"批量写入失败，逐条重试: {e}")
+
+        written = 0
+        for row in rows:
+            try:
+                with self.connection:
+                    self.write_submission_rows(query, [row], id_index)
+                written += 1
+            except Exception as e:
+                logger.warning(f"查询执行失败: {e}")
+                if failed_rows is not None:
+                    failed_rows.append(row)
+        return written
+
+    def ensure_submission_columns(self):
+        """为 submissions 补充 version（变更版本号）和 item_key（条目稳定标识）列"""
+        if self._submission_columns_ready:
+            return
+        self.ensure_columns('submissions', {'version': 'INTEGER DEFAULT 1', 'item_key': 'TEXT'})
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_submissions_item_key ON submissions(item_key)")
+        self.connection.commit()
+        self._submission_columns_ready = True
+
+    def match_item_keys(self, rows, columns):
+        """
+        item_key 与已有记录相同的行改用已有记录的ID和创建时间（写入即为更新），
+        同一批中 item_key 相同的行只保留最后一行
+        """
+        id_index, key_index, created_index = columns.index('id'), columns.index('item_key'), columns.index('created_at')
+        keys = list(dict.fromkeys(row[key_index] for row in rows if row[key_index]))
+        if not keys:
+            return rows
+
+        existing = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            cursor = self.connection.execute(
+                f"SELECT item_key, id, created_at FROM submissions WHERE item_key IN ({', '.join('?' * len(chunk))}) "
+                "ORDER BY created_at",
+                chunk
+            )
+            for row in cursor.fetchall():
+                existing.setdefault(row['item_key'], (row['id'], row['created_at']))
+
+        matched = []
+        positions = {}
+        for row in rows:
+            key = row[key_index]
+            if not key:
+                matched.append(row)
+                continue
+            if key in existing:
+                submission_id, created_at = existing[key]
+                row = list(row)
+                row[id_index] = submission_id
+                row[created_index] = created_at
+                row = tuple(row)
+            else:
+                existing[key] = (row[id_index], row[created_index])
+            if key in positions:
+                # 同一批中重复的条目只保留最后一次
+                matched[positions[key]] = row
+            else:
+                positions[key] = len(matched)
+                matched.append(row)
+        return matched
+
+    def write_submission_rows(self, query, rows, id_index=0):
+        """在调用方的事务中写入行，并在同一事务中追加变更事件（insert / update）"""
+        if not CHANGE_FEED_ENABLED:
+            self.connection.executemany(query, rows)
+            return
+
+        self.ensure_change_feed_table()
+        ids = [row[id_index] for row in rows]
+        versions = self.get_submission_versions(ids)
+        self.connection.executemany(query, rows)
+
+        # REPLACE 会把 version 重置为默认值 1，已有的行需要写回递增后的版本
+        updated = [(versions[submission_id] + 1, submission_id) for submission_id in ids if submission_id in versions]
+        if updated:
+            self.connection.executemany("UPDATE submissions SET version = ? WHERE id = ?", updated)
+
         now = datetime.now().isoformat()
-        params = (
-            submission_id,
-            data.get('title'),
-            data.get('description'),
-            data.get('type', 'OTHER'),
-            data.get('organizer'),
-            data.get('deadline'),
-            data.get('location'),
-            data.get('website'),
-            data.get('email'),
-            data.get('phone'),
-            data.get('fee'),
-            data.get('prize'),
-            json.dumps(data.get('requirements', {})),
-            json.dumps(data.get('tags', [])),
-            True,
-            now,
-            now
+        self.connection.executemany(
+            "INSERT INTO submission_changes (submission_id, op, version, changed_at) VALUES (?, ?, ?, ?)",
+            [
+                (submission_id, 'update', versions[submission_id] + 1, now) if submission_id in versions
+                else (submission_id, 'insert', 1, now)
+                for submission_id in ids
+            ]
         )
 
-        result = self.execute_query(query, params)
-        return submission_id if result else None
+    def get_submission_versions(self, ids):
+        """已存在的投稿信息的当前版本 {id: version}"""
+        versions = {}
+        ids = list(dict.fromkeys(ids))
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor = self.connection.execute(
+                f"SELECT id, version FROM submissions WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            versions.update((row['id'], row['version'] or 1) for row in cursor.fetchall())
+        return versions
+
+    def ensure_change_feed_table(self):
+        """创建变更事件表（seq 单调递增，清理旧事件后也不会复用）"""
+        if self._change_feed_ready:
+            return
+        self.ensure_submission_columns()
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS submission_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            submission_id TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'deactivate')),
+            version INTEGER NOT NULL,
+            changed_at DATETIME NOT NULL
+        );
+        """)
+        self._change_feed_ready = True
+
+    def deactivate_submissions(self, ids):
+        """将投稿信息标记为失效，并在同一事务中追加 deactivate 事件；返回实际失效的条数"""
+        if not ids:
+            return 0
+        self.ensure_change_feed_table()
+        now = datetime.now().isoformat()
+        ids = list(dict.fromkeys(ids))
+        deactivated = 0
+        with self.connection:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor = self.connection.execute(
+                    f"SELECT id, version FROM submissions WHERE is_active AND id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                targets = [(row['id'], (row['version'] or 1) + 1) for row in cursor.fetchall()]
+                if not targets:
+                    continue
+                self.connection.executemany(
+                    "UPDATE submissions SET is_active = FALSE, version = ?, updated_at = ? WHERE id = ?",
+                    [(version, now, submission_id) for submission_id, version in targets]
+                )
+                self.connection.executemany(
+                    "INSERT INTO submission_changes (submission_id, op, version, changed_at) "
+                    "VALUES (?, 'deactivate', ?, ?)",
+                    [(submission_id, version, now) for submission_id, version in targets]
+                )
+                deactivated += len(targets)
+        return deactivated
+
+    def ensure_snapshot_table(self):
+        """创建数据源快照表：每个数据源上次爬取看到的条目及其内容指纹"""
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS source_snapshots (
+            source_name TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            fingerprint INTEGER NOT NULL,
+            seen_at DATETIME NOT NULL,
+            PRIMARY KEY (source_name, item_key)
+        ) WITHOUT ROWID;
+        """)
+
+    def get_source_snapshot(self, source_name):
+        """数据源的快照 {item_key: 指纹}"""
+        cursor = self.connection.execute(
+            "SELECT item_key, fingerprint FROM source_snapshots WHERE source_name = ?", (source_name,)
+        )
+        return {row['item_key']: row['fingerprint'] for row in cursor.fetchall()}
+
+    def save_source_snapshot(self, source_name, changed, removed, now):
+        """在一个事务中更新快照：changed 为 (item_key, 指纹) 列表，removed 为要删除的 item_key 列表"""
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO source_snapshots (source_name, item_key, fingerprint, seen_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(source_name, item_key) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    seen_at = excluded.seen_at
+                """,
+                [(source_name, key, fingerprint, now) for key, fingerprint in changed]
+            )
+            self.connection.executemany(
+                "DELETE FROM source_snapshots WHERE source_name = ? AND item_key = ?",
+                [(source_name, key) for key in removed]
+            )
+
+    def get_submission_ids_by_item_keys(self, keys):
+        """item_key 对应的投稿信息ID"""
+        self.ensure_submission_columns()
+        ids = []
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            cursor = self.connection.execute(
+                f"SELECT id FROM submissions WHERE item_key IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            ids.extend(row['id'] for row in cursor.fetchall())
+        return ids
+
+    def get_changes_after(self, cursor=0, limit=CHANGE_FEED_BATCH_SIZE):
+        """
+        读取序号大于 cursor 的变更事件（按序号的范围扫描），返回
+        {changes, cursor（下次轮询使用）, has_more, truncated}；
+        truncated 为 True 表示 cursor 之后的部分事件已被清理，使用方需要重新全量同步
+        """
+        self.ensure_change_feed_table()
+        cursor = int(cursor or 0)
+        limit = max(1, min(int(limit), CHANGE_FEED_BATCH_SIZE))
+        rows = self.connection.execute(
+            "SELECT seq, submission_id, op, version, changed_at FROM submission_changes "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (cursor, limit + 1)
+        ).fetchall()
+        changes = [dict(row) for row in rows[:limit]]
+
+        first = self.connection.execute("SELECT MIN(seq) FROM submission_changes").fetchone()[0]
+        if first is None:
+            last = self.connection.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'submission_changes'"
+            ).fetchone()
+            first = (last[0] if last else 0) + 1
+
+        return {
+            'changes': changes,
+            'cursor': changes[-1]['seq'] if changes else cursor,
+            'has_more': len(rows) > limit,
+            'truncated': cursor + 1 < first,
+        }
+
+    def prune_submission_changes(self, retention_days=CHANGE_FEED_RETENTION_DAYS):
+        """删除超过保留期的变更事件（序号与时间同序，只扫描被删除的部分），返回删除条数"""
+        self.ensure_change_feed_table()
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        query = """
+        DELETE FROM submission_changes WHERE seq < COALESCE(
+            (SELECT seq FROM submission_changes WHERE changed_at >= ? ORDER BY seq LIMIT 1),
+            (SELECT MAX(seq) + 1 FROM submission_changes)
+        )
+        """
+        return self.execute_query(query, (cutoff,))
+
+    @contextmanager
+    def bulk_load(self):
+        """大批量导入期间关闭当前连接的同步写盘（断电时可能丢失导入中的数据），结束后恢复"""
+        synchronous = self.connection.execute("PRAGMA synchronous").fetchone()[0]
+        self.connection.execute("PRAGMA synchronous = OFF")
+        try:
+            yield
+        finally:
+            self.connection.execute(f"PRAGMA synchronous = {int(synchronous)}")
+
+    def delete_submissions_by_id_prefix(self, prefix):
+        """删除ID以指定前缀开头的投稿信息（如合成数据），返回删除条数"""
+        return self.execute_query(
+            "DELETE FROM submissions WHERE id >= ? AND id < ?", (prefix, prefix + '\uffff')
+        )
+
+    def insert_submission_info(self, data):
+        """插入投稿信息"""
+        submission_id = self.next_submission_id()
+        record = SubmissionRecord.from_dict(data)
+        row = record.to_row(submission_id, datetime.now().isoformat())
+        return submission_id if self.insert_submission_rows([row]) else None
     
-    def create_crawl_job(self, data_source_name="演示爬虫"):
-        """创建爬虫任务记录"""
-        job_id = str(int(datetime.now().timestamp() * 1000))
+    def create_crawl_job(self, data_source_name="演示爬虫", status='pending'):
+        """创建爬虫任务记录（ID 与任务队列相同使用 uuid，多个工作线程或进程同时创建也不会冲突）"""
+        job_id = uuid.uuid4().hex
 
         query = """
         INSERT INTO crawl_jobs (id, data_source_name, status, started_at, created_at)
-        VALUES (?, ?, 'pending', ?, ?)
+        VALUES (?, ?, ?, ?, ?)
         """
 
         now = datetime.now().isoformat()
-        params = (job_id, data_source_name, now, now)
+        params = (job_id, data_source_name, status, now, now)
 
         result = self.execute_query(query, params)
         return job_id if result else None
@@ -124,11 +399,225 @@ class DatabaseManager:
 
         return self.execute_query(query, params)
     
+    def mark_crawl_job_running(self, job_id):
+        """将已有任务标记为运行中，不改动已记录的进度"""
+        query = "UPDATE crawl_jobs SET status = 'running', updated_at = ? WHERE id = ?"
+        return self.execute_query(query, (datetime.now().isoformat(), job_id))
+
+    def ensure_job_progress_columns(self):
+        """为 crawl_jobs 表补充运行进度列"""
+        self.ensure_columns('crawl_jobs', {
+            'pages_crawled': 'INTEGER DEFAULT 0',
+            'bytes_fetched': 'INTEGER DEFAULT 0',
+            'progress_at': 'DATETIME',
+            'is_partial': 'BOOLEAN DEFAULT FALSE',
+            'cancel_requested': 'BOOLEAN DEFAULT FALSE',
+        })
+
+    def update_crawl_job_progress(self, job_id, items_found=0, items_added=0, pages_crawled=0, bytes_fetched=0):
+        """写入运行中任务的进度"""
+        query = """
+        UPDATE crawl_jobs SET
+            items_found = ?,
+            items_added = ?,
+            pages_crawled = ?,
+            bytes_fetched = ?,
+            progress_at = ?,
+            updated_at = ?
+        WHERE id = ?
+        """
+        now = datetime.now().isoformat()
+        params = (items_found, items_added, pages_crawled, bytes_fetched, now, now, job_id)
+        return self.execute_query(query, params)
+
+    def finish_crawl_job(self, job_id, status, items_found=0, items_added=0, pages_crawled=0,
+                         bytes_fetched=0, error_message=None, is_partial=False, lease_owner=None):
+        """写入任务的结束状态和最终进度；is_partial 表示因取消或超出预算提前结束；
+        传入 lease_owner 时只有仍持有租约的节点可以写入（租约过期后任务可能已被其他节点重新认领）"""
+        query = """
+        UPDATE crawl_jobs SET
+            status = ?,
+            is_partial = ?,
+            items_found = ?,
+            items_added = ?,
+            pages_crawled = ?,
+            bytes_fetched = ?,
+            error_message = ?,
+            progress_at = ?,
+            completed_at = ?,
+            updated_at = ?
+        WHERE id = ?
+        """
+        now = datetime.now().isoformat()
+        params = (
+            status, is_partial, items_found, items_added, pages_crawled, bytes_fetched,
+            error_message, now, now, now, job_id
+        )
+        if lease_owner is not None:
+            query += " AND lease_owner = ?"
+            params += (lease_owner,)
+        return self.execute_query(query, params)
+
+    def request_crawl_job_cancel(self, job_id):
+        """请求取消运行中的任务，执行该任务的进程在下一次进度心跳时读取；返回是否找到运行中的任务"""
+        self.ensure_job_progress_columns()
+        query = """
+        UPDATE crawl_jobs SET cancel_requested = TRUE, updated_at = ?
+        WHERE id = ? AND status IN ('pending', 'running')
+        """
+        return self.execute_query(query, (datetime.now().isoformat(), job_id)) == 1
+
+    def is_crawl_job_cancel_requested(self, job_id):
+        rows = self.execute_query("SELECT cancel_requested FROM crawl_jobs WHERE id = ?", (job_id,))
+        return bool(rows and rows[0]['cancel_requested'])
+
+    def ensure_job_queue_columns(self):
+        """为 crawl_jobs 表补充租约相关列和索引"""
+        self.ensure_columns('crawl_jobs', {
+            'data_source_id': 'TEXT',
+            'crawler_name': 'TEXT',
+            'lease_owner': 'TEXT',
+            'lease_expires_at': 'DATETIME',
+            'heartbeat_at': 'DATETIME',
+            'attempts': 'INTEGER DEFAULT 0',
+        })
+        self.connection.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_crawl_jobs_claim ON crawl_jobs (status, lease_expires_at);
+        CREATE INDEX IF NOT EXISTS idx_crawl_jobs_source ON crawl_jobs (data_source_id, status);
+        """)
+
+    def ensure_checkpoint_columns(self):
+        """为 crawl_jobs 表补充断点续爬的检查点列"""
+        self.ensure_columns('crawl_jobs', {
+            'checkpoint': 'TEXT',
+            'checkpoint_at': 'DATETIME',
+        })
+
+    def save_crawl_checkpoint(self, job_id, state):
+        """保存任务的爬取进度"""
+        query = "UPDATE crawl_jobs SET checkpoint = ?, checkpoint_at = ?, updated_at = ? WHERE id = ?"
+        now = datetime.now().isoformat()
+        return self.execute_query(query, (json.dumps(state, ensure_ascii=False), now, now, job_id))
+
+    def clear_crawl_checkpoint(self, job_id):
+        """爬取完整结束后清除检查点"""
+        query = "UPDATE crawl_jobs SET checkpoint = NULL, checkpoint_at = NULL WHERE id = ?"
+        return self.execute_query(query, (job_id,))
+
+    def take_crawl_checkpoint(self, job_id, max_age_hours):
+        """
+        查找同一数据源最新的未完成检查点（包括本任务被重新认领前留下的），
+        找到后转移到当前任务，避免被多次续爬；没有可用检查点时返回 None
+        """
+        since = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+        rows = self.execute_query("""
+        SELECT c.id, c.checkpoint FROM crawl_jobs c
+        JOIN crawl_jobs j ON j.id = ?
+        WHERE c.data_source_name = j.data_source_name
+          AND c.checkpoint IS NOT NULL
+          AND c.checkpoint_at >= ?
+        ORDER BY c.checkpoint_at DESC
+        LIMIT 1
+        """, (job_id, since))
+        if not rows:
+            return None
+
+        try:
+            state = json.loads(rows[0]['checkpoint'])
+        except (TypeError, ValueError):
+            return None
+
+        if rows[0]['id'] != job_id:
+            self.clear_crawl_checkpoint(rows[0]['id'])
+            self.save_crawl_checkpoint(job_id, state)
+        return state
+
+    def get_today_crawl_stats(self):
+        """按状态汇总今日的爬虫任务"""
+        query = """
+        SELECT 
+            status,
+            COUNT(*) as count,
+            SUM(items_found) as total_found,
+            SUM(items_added) as total_added
+        FROM crawl_jobs 
+        WHERE created_at >= CURRENT_DATE
+        GROUP BY status;
+        """
+        return self.execute_query(query) or []
+
+    def get_recent_crawl_jobs(self, data_source_name, limit=20):
+        """获取数据源最近完整完成的爬虫任务（按开始时间倒序，不含部分完成的任务）"""
+        self.ensure_job_progress_columns()
+        query = """
+        SELECT id, items_found, items_added, started_at, completed_at
+        FROM crawl_jobs
+        WHERE data_source_name = ? AND status = 'completed' AND NOT COALESCE(is_partial, FALSE)
+        ORDER BY started_at DESC
+        LIMIT ?
+        """
+        return self.execute_query(query, (data_source_name, limit)) or []
+
     def get_data_sources(self):
         """获取所有数据源"""
         query = "SELECT * FROM data_sources WHERE is_active = 1"
         return self.execute_query(query)
 
+    def ensure_scheduler_columns(self):
+        """为 data_sources 表补充调度器状态列"""
+        self.ensure_columns('data_sources', {
+            'crawler_name': "TEXT DEFAULT 'demo'",
+            'crawl_frequency': 'REAL DEFAULT 24',
+            'current_frequency': 'REAL',
+            'next_due_at': 'DATETIME',
+            'failure_streak': 'INTEGER DEFAULT 0',
+        })
+
+    def seed_data_sources(self, sources):
+        """data_sources 表为空时写入内置数据源，返回写入的条数；
+        表中已有数据源时不做任何事，用户删除的内置数据源不会被重新创建"""
+        query = """
+        INSERT OR IGNORE INTO data_sources (
+            id, name, url, type, is_active, crawler_name, crawl_frequency, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (source['id'], source['name'], source['url'], source['type'], source['is_active'],
+             source['crawler_name'], source['crawl_frequency'], now, now)
+            for source in sources
+        ]
+        with self.connection:
+            if self.connection.execute("SELECT 1 FROM data_sources LIMIT 1").fetchone():
+                return 0
+            self.connection.executemany(query, rows)
+        return len(rows)
+
+    def get_scheduler_sources(self):
+        """获取全部数据源及其调度状态（包括未启用的）"""
+        return self.execute_query("SELECT * FROM data_sources ORDER BY id") or []
+
+    def save_scheduler_states(self, states):
+        """批量保存数据源调度状态，status 为 None 时保留原状态"""
+        query = """
+        UPDATE data_sources SET
+            last_crawled = ?,
+            next_due_at = ?,
+            failure_streak = ?,
+            current_frequency = ?,
+            status = COALESCE(?, status),
+            updated_at = ?
+        WHERE id = ?
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (state['last_crawled'], state['next_due_at'], state['failure_streak'],
+             state['current_frequency'], state['status'], now, state['id'])
+            for state in states
+        ]
+        with self.connection:
+            self.connection.executemany(query, rows)
+
     def update_data_source_last_crawled(self, source_id):
         """更新数据源最后爬取时间"""
         query = """
@@ -142,3 +631,391 @@ class DatabaseManager:
         params = (now, now, source_id)
 
         return self.execute_query(query, params)
+
+
+    def create_batch_writer(self, batch_size=SUBMISSION_BATCH_SIZE, id_prefix=''):
+        """创建投稿信息批量写入器，id_prefix 加在新分配的投稿信息ID之前"""
+        return SubmissionBatchWriter(self, batch_size, id_prefix)
+
+    def get_data_source_config(self, name):
+        """按名称获取数据源的爬虫配置（JSON 解析后的字典）"""
+        rows = self.execute_query("SELECT config FROM data_sources WHERE name = ?", (name,))
+        if not rows or not rows[0]['config']:
+            return {}
+        try:
+            return json.loads(rows[0]['config'])
+        except (TypeError, ValueError):
+            return {}
+
+    def ensure_export_tables(self):
+        """创建导出水位表，以及按 (updated_at, id) 顺序流式读取所需的索引"""
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            consumer TEXT PRIMARY KEY,
+            updated_at TEXT,
+            last_id TEXT,
+            rows_exported INTEGER DEFAULT 0,
+            exported_at DATETIME
+        );
+        CREATE INDEX IF NOT EXISTS idx_submissions_updated_at_id ON submissions(updated_at, id);
+        """)
+
+    def get_export_watermark(self, consumer):
+        """获取导出水位（上次导出的最后一行的 updated_at 和 id），没有时返回 None"""
+        rows = self.execute_query(
+            "SELECT updated_at, last_id, rows_exported, exported_at FROM export_watermarks WHERE consumer = ?",
+            (consumer,)
+        )
+        return rows[0] if rows else None
+
+    def save_export_watermark(self, consumer, updated_at, last_id, rows_exported):
+        query = """
+        INSERT INTO export_watermarks (consumer, updated_at, last_id, rows_exported, exported_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(consumer) DO UPDATE SET
+            updated_at = excluded.updated_at,
+            last_id = excluded.last_id,
+            rows_exported = excluded.rows_exported,
+            exported_at = excluded.exported_at
+        """
+        return self.execute_query(query, (consumer, updated_at, last_id, rows_exported, datetime.now().isoformat()))
+
+    def get_table_columns(self, table):
+        cursor = self.connection.execute(f"PRAGMA table_info({table})")
+        return [row['name'] for row in cursor.fetchall()]
+
+    def iter_submission_chunks(self, columns, after=None, chunk_size=1000):
+        """
+        按 (updated_at, id) 顺序分块读取 submissions，每块为行元组列表，内存占用与表大小无关；
+        after 为 (updated_at, id) 时只读取其后的行（增量导出）。columns 须包含 updated_at 和 id
+        """
+        query = f"SELECT {', '.join(columns)} FROM submissions"
+        params = ()
+        if after is not None:
+            query += " WHERE (updated_at, id) > (?, ?)"
+            params = tuple(after)
+        query += " ORDER BY updated_at, id"
+
+        cursor = self.connection.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def ensure_archive_tables(self):
+        """创建原始页面归档的索引表：内容块（按哈希去重）、页面抓取记录和每个主机的压缩字典"""
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS archive_blobs (
+            content_hash TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            raw_size INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            dict_id INTEGER,
+            created_at DATETIME NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS archive_pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_name TEXT NOT NULL,
+            host TEXT NOT NULL,
+            url TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            content_type TEXT,
+            encoding TEXT,
+            job_id TEXT,
+            first_seen_at DATETIME NOT NULL,
+            last_seen_at DATETIME NOT NULL,
+            fetch_count INTEGER DEFAULT 1,
+            UNIQUE (source_name, url, content_hash)
+        );
+        CREATE INDEX IF NOT EXISTS idx_archive_pages_source_seen ON archive_pages(source_name, last_seen_at);
+        CREATE INDEX IF NOT EXISTS idx_archive_pages_host ON archive_pages(host, id);
+        CREATE TABLE IF NOT EXISTS archive_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            host TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            sample_count INTEGER NOT NULL,
+            created_at DATETIME NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_archive_dictionaries_host ON archive_dictionaries(host, codec, id);
+        """)
+        # 抓取页面的爬虫类（模块:类名），离线重新提取时据此选择提取逻辑
+        self.ensure_columns('archive_pages', {'crawler': 'TEXT'})
+
+    def get_archive_blob(self, content_hash):
+        rows = self.execute_query("SELECT * FROM archive_blobs WHERE content_hash = ?", (content_hash,))
+        return rows[0] if rows else None
+
+    def add_archive_blob(self, content_hash, segment, offset, length, raw_size, codec, dict_id=None):
+        """记录内容块位置；同一哈希已存在时保留先写入的位置"""
+        query = """
+        INSERT OR IGNORE INTO archive_blobs (content_hash, segment, offset, length, raw_size, codec, dict_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        return self.execute_query(
+            query, (content_hash, segment, offset, length, raw_size, codec, dict_id, datetime.now().isoformat())
+        )
+
+    def record_archive_page(self, source_name, host, url, content_hash, content_type=None, encoding=None, job_id=None,
+                            crawler=None):
+        """记录一次页面抓取；同一页面内容未变化时只更新最近抓取时间、次数和爬虫类"""
+        now = datetime.now().isoformat()
+        query = """
+        INSERT INTO archive_pages (source_name, host, url, content_hash, content_type, encoding, job_id, crawler,
+                                   first_seen_at, last_seen_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_name, url, content_hash) DO UPDATE SET
+            last_seen_at = excluded.last_seen_at,
+            job_id = excluded.job_id,
+            crawler = COALESCE(excluded.crawler, crawler),
+            fetch_count = fetch_count + 1
+        """
+        return self.execute_query(
+            query, (source_name, host, url, content_hash, content_type, encoding, job_id, crawler, now, now)
+        )
+
+    def count_archive_host_pages(self, host):
+        rows = self.execute_query("SELECT COUNT(*) AS count FROM archive_pages WHERE host = ?", (host,))
+        return rows[0]['count'] if rows else 0
+
+    def get_recent_archive_hashes(self, host, limit):
+        """主机最近归档的不同内容哈希（用于训练压缩字典）"""
+        query = """
+        SELECT content_hash FROM archive_pages WHERE host = ?
+        GROUP BY content_hash ORDER BY MAX(id) DESC LIMIT ?
+        """
+        return [row['content_hash'] for row in self.execute_query(query, (host, limit)) or []]
+
+    def get_archive_dictionary(self, host, codec):
+        """主机最新的压缩字典 (id, data)，没有时返回 None"""
+        rows = self.execute_query(
+            "SELECT id, data FROM archive_dictionaries WHERE host = ? AND codec = ? ORDER BY id DESC LIMIT 1",
+            (host, codec)
+        )
+        return (rows[0]['id'], rows[0]['data']) if rows else None
+
+    def get_archive_dictionary_by_id(self, dict_id):
+        rows = self.execute_query("SELECT data FROM archive_dictionaries WHERE id = ?", (dict_id,))
+        return rows[0]['data'] if rows else None
+
+    def add_archive_dictionary(self, host, codec, data, sample_count):
+        cursor = self.connection.execute(
+            "INSERT INTO archive_dictionaries (host, codec, data, sample_count, created_at) VALUES (?, ?, ?, ?, ?)",
+            (host, codec, data, sample_count, datetime.now().isoformat())
+        )
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def get_reextract_pages(self, after_id=0, limit=200, sources=None, crawlers=None, since=None, until=None):
+        """
+        离线重新提取的页面：每个 (数据源, URL) 只取最近抓取到的内容，连同内容块位置，按页面记录ID分页；
+        sources / crawlers 限定数据源名称和爬虫类，since / until 限定最近抓取时间
+        """
+        conditions = ["p.id > ?", """p.last_seen_at = (
+            SELECT MAX(q.last_seen_at) FROM archive_pages q WHERE q.source_name = p.source_name AND q.url = p.url
+        )"""]
+        params = [after_id]
+        if sources:
+            conditions.append(f"p.source_name IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        if crawlers:
+            conditions.append(f"p.crawler IN ({', '.join('?' * len(crawlers))})")
+            params.extend(crawlers)
+        if since:
+            conditions.append("p.last_seen_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("p.last_seen_at < ?")
+            params.append(until)
+
+        query = f"""
+        SELECT p.id, p.source_name, p.url, p.encoding, p.crawler, p.content_hash,
+               b.segment, b.offset, b.length, b.codec, b.dict_id
+        FROM archive_pages p JOIN archive_blobs b ON b.content_hash = p.content_hash
+        WHERE {' AND '.join(conditions)}
+        ORDER BY p.id LIMIT ?
+        """
+        params.append(limit)
+        return self.execute_query(query, tuple(params)) or []
+
+    def get_archive_stats(self):
+        """归档统计：页面记录数、不同内容数、原始字节数和压缩后字节数"""
+        query = """
+        SELECT
+            (SELECT COUNT(*) FROM archive_pages) AS pages,
+            (SELECT COALESCE(SUM(fetch_count), 0) FROM archive_pages) AS fetches,
+            COUNT(*) AS blobs,
+            COALESCE(SUM(raw_size), 0) AS raw_bytes,
+            COALESCE(SUM(length), 0) AS stored_bytes
+        FROM archive_blobs
+        """
+        rows = self.execute_query(query)
+        return rows[0] if rows else {}
+
+    def get_match_profiles(self):
+        """
+        用户资料和作品集（Web 端数据库的 users / portfolios 表），
+        返回 [(用户ID, 资料文本字段列表)]，每个用户的作品集字段附在资料之后
+        """
+        users = {}
+        cursor = self.connection.execute("""
+        SELECT id, userType, experienceLevel, location, languages, artistStatement, artFields,
+               education, exhibitions, awards
+        FROM users
+        """)
+        for row in cursor.fetchall():
+            users[row['id']] = [value for value in tuple(row)[1:] if value]
+
+        cursor = self.connection.execute(
+            'SELECT userId, title, description, medium, tags FROM portfolios ORDER BY userId, "createdAt"'
+        )
+        for row in cursor.fetchall():
+            if row['userId'] in users:
+                users[row['userId']].extend(value for value in tuple(row)[1:] if value)
+        return list(users.items())
+
+    def iter_match_submissions(self, after_rowid=0, chunk_size=1000):
+        """
+        按行号顺序分块读取有效的投稿信息（Web 端数据库的 submission_infos 表），
+        每块为 [(行号, ID, 文本字段列表)]；after_rowid 之后的行为上次匹配后新增的
+        """
+        cursor = self.connection.execute("""
+        SELECT rowid, id, title, description, type, organizer, location, prize, requirements, tags
+        FROM submission_infos
+        WHERE rowid > ? AND "isActive"
+        ORDER BY rowid
+        """, (after_rowid,))
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [(row[0], row[1], [value for value in tuple(row)[2:] if value]) for row in rows]
+        finally:
+            cursor.close()
+
+    def upsert_ai_matches(self, matches):
+        """
+        写入候选匹配 [(用户ID, 投稿信息ID, 分数, 原因 JSON)]，返回实际新增或更新的条数；
+        已有的匹配只在仍是向量预筛选结果时更新分数，LLM 分析写入的结果保留（不计入返回值）
+        """
+        query = """
+        INSERT INTO ai_matches (id, "userId", "submissionInfoId", "matchScore", reasons)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT("userId", "submissionInfoId") DO UPDATE SET
+            "matchScore" = excluded."matchScore",
+            reasons = excluded.reasons
+        WHERE json_extract(ai_matches.reasons, '$.source') = json_extract(excluded.reasons, '$.source')
+        """
+        with self.connection:
+            cursor = self.connection.executemany(
+                query, [(uuid.uuid4().hex, user_id, submission_id, score, reasons)
+                        for user_id, submission_id, score, reasons in matches]
+            )
+        return cursor.rowcount
+
+    def ensure_page_cache_table(self):
+        """创建页面提取结果缓存表"""
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS page_extraction_cache (
+            source_name TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            parser_version TEXT NOT NULL,
+            config_hash TEXT NOT NULL,
+            items TEXT NOT NULL,
+            hit_count INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at DATETIME,
+            PRIMARY KEY (source_name, content_hash)
+        );
+        """)
+
+    def get_page_cache(self, source_name, content_hash):
+        """查询页面提取缓存"""
+        query = """
+        SELECT parser_version, config_hash, items FROM page_extraction_cache
+        WHERE source_name = ? AND content_hash = ?
+        """
+        rows = self.execute_query(query, (source_name, content_hash))
+        return rows[0] if rows else None
+
+    def touch_page_cache(self, source_name, content_hash):
+        """记录一次缓存命中"""
+        query = """
+        UPDATE page_extraction_cache SET
+            hit_count = hit_count + 1,
+            last_hit_at = ?
+        WHERE source_name = ? AND content_hash = ?
+        """
+        return self.execute_query(query, (datetime.now().isoformat(), source_name, content_hash))
+
+    def set_page_cache(self, source_name, content_hash, parser_version, config_hash, items):
+        """写入页面提取缓存"""
+        query = """
+        INSERT OR REPLACE INTO page_extraction_cache (
+            source_name, content_hash, parser_version, config_hash, items, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+        """
+        params = (
+            source_name,
+            content_hash,
+            parser_version,
+            config_hash,
+            json.dumps(items, ensure_ascii=False, default=str),
+            datetime.now().isoformat()
+        )
+        return self.execute_query(query, params)
+
+    def purge_page_cache(self, source_name, parser_version, config_hash):
+        """删除解析版本或选择器配置已变化的缓存条目"""
+        query = """
+        DELETE FROM page_extraction_cache
+        WHERE source_name = ? AND (parser_version != ? OR config_hash != ?)
+        """
+        return self.execute_query(query, (source_name, parser_version, config_hash))
+
+
+class SubmissionBatchWriter:
+    """投稿信息批量写入器 - 缓冲 SubmissionRecord，按批次序列化为行元组写入"""
+
+    def __init__(self, db, batch_size=SUBMISSION_BATCH_SIZE, id_prefix=''):
+        self.db = db
+        self.batch_size = batch_size
+        self.id_prefix = id_prefix
+        self.rows = []
+        # 写入失败的记录的 item_key，由 take_failed_keys 取出
+        self.failed_keys = []
+
+    def add(self, record):
+        """加入一条记录，返回分配的投稿信息ID（item_key 与已有记录相同时，写入时沿用已有记录的ID）"""
+        submission_id = f"{self.id_prefix}{self.db.next_submission_id()}"
+        self.rows.append(record.to_row(submission_id, datetime.now().isoformat()) + (record.item_key,))
+        return submission_id
+
+    @property
+    def pending(self):
+        """缓冲中尚未写入的条数"""
+        return len(self.rows)
+
+    def is_full(self):
+        return len(self.rows) >= self.batch_size
+
+    def flush(self):
+        """写入缓冲中的全部记录，返回成功写入的条数"""
+        rows, self.rows = self.rows, []
+        failed = []
+        written = self.db.insert_submission_rows(rows, SUBMISSION_ITEM_COLUMNS, failed)
+        key_index = SUBMISSION_ITEM_COLUMNS.index('item_key')
+        self.failed_keys.extend(row[key_index] for row in failed if row[key_index])
+        return written
+
+    def take_failed_keys(self):
+        """取出并清空此前写入失败的记录的 item_key"""
+        keys, self.failed_keys = self.failed_keys, []
+        return keys
@@ -1,10 +1,17 @@
 from base_crawler import BaseCrawler
 from datetime import datetime, timedelta
+from logging_setup import setup_logging
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
 class DemoCrawler(BaseCrawler):
     """演示爬虫 - 生成模拟数据"""
     
+    # 每条数据的模拟网络延迟（秒），基准测试中设为 0
+    ITEM_DELAY = 0.5
+    
     def __init__(self):
         super().__init__("演示数据源", "https://demo.example.com")
         
@@ -116,7 +123,7 @@ class DemoCrawler(BaseCrawler):
     
     def crawl(self):
         """模拟爬取过程"""
-        print("开始模拟数据收集...")
+        logger.info("开始模拟数据收集...")
         
         # 随机选择一些数据进行"爬取"
         selected_items = random.sample(self.demo_data, random.randint(3, len(self.demo_data)))
@@ -124,21 +131,24 @@ class DemoCrawler(BaseCrawler):
         for item in selected_items:
             self.items_found += 1
             
-            # 为每个项目生成随机截止日期
-            item_copy = item.copy()
-            item_copy['deadline'] = self.generate_deadline()
+            # 直接构建记录并设置随机截止日期，避免复制模板字典
+            record = self.build_record(item)
+            record.deadline = self.parse_date(self.generate_deadline())
             
             # 模拟网络延迟
-            import time
-            time.sleep(0.5)
+            if self.ITEM_DELAY:
+                with self.phase('fetch'):
+                    self.pause(self.ITEM_DELAY)
             
-            print(f"发现投稿信息: {item_copy['title']}")
+            logger.debug(f"发现投稿信息: {item['title']}")
             
             # 保存到数据库
-            self.save_submission_info(item_copy)
+            self.save_record(record)
+            self.report_progress('item', title=record.title)
         
-        print(f"模拟爬取完成，共处理 {self.items_found} 条数据")
+        logger.info(f"模拟爬取完成，共处理 {self.items_found} 条数据")
 
 if __name__ == "__main__":
+    setup_logging()
     crawler = DemoCrawler()
     crawler.run()
@@ -0,0 +1,183 @@
+"""
+投稿信息导出
+按 (updated_at, id) 顺序分块流式读取 submissions，内存占用与表大小无关，写入 gzip 压缩的 JSON Lines
+或列式 Parquet（需要安装 pyarrow）。增量模式按导出水位（上次导出的最后一行）只导出之后新增或更新的行，
+每个下游使用方（--consumer）各自记录水位；文件先写入临时文件，完成后再改名并推进水位。
+
+注意：水位按 updated_at 的存储文本比较；删除的行不会出现在增量导出中
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import EXPORT_DIR, EXPORT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'parquet')
+EXTENSIONS = {'jsonl': '.jsonl.gz', 'parquet': '.parquet'}
+
+# 以 JSON 文本存储的列，导出时解析为对象
+JSON_COLUMNS = ('tags', 'requirements')
+BOOLEAN_COLUMNS = ('is_gold', 'is_featured', 'is_active')
+FLOAT_COLUMNS = ('fee', 'rating')
+INTEGER_COLUMNS = ('years_running', 'applicants')
+
+
+def _decode_json(value):
+    if value is None or not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _row_to_dict(columns, row):
+    item = dict(zip(columns, row))
+    for column in JSON_COLUMNS:
+        if column in item:
+            item[column] = _decode_json(item[column])
+    for column in BOOLEAN_COLUMNS:
+        if item.get(column) is not None:
+            item[column] = bool(item[column])
+    return item
+
+
+class JsonlWriter:
+    """gzip 压缩的 JSON Lines，每行一条投稿信息"""
+
+    def __init__(self, path, columns):
+        self.columns = columns
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write_chunk(self, rows):
+        columns = self.columns
+        self.file.write(''.join(
+            json.dumps(_row_to_dict(columns, row), ensure_ascii=False, default=str) + '\n' for row in rows
+        ))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Parquet 文件，每块写为一个行组"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("导出 Parquet 需要安装 pyarrow（pip install pyarrow）") from None
+
+        self.pa = pa
+        self.columns = columns
+        fields = []
+        for column in columns:
+            if column in FLOAT_COLUMNS:
+                field_type = pa.float64()
+            elif column in INTEGER_COLUMNS:
+                field_type = pa.int64()
+            elif column in BOOLEAN_COLUMNS:
+                field_type = pa.bool_()
+            elif column == 'tags':
+                field_type = pa.list_(pa.string())
+            else:
+                # requirements 等保留 JSON 文本，日期保留原始文本
+                field_type = pa.string()
+            fields.append(pa.field(column, field_type))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(str(path), self.schema, compression='zstd')
+
+    def write_chunk(self, rows):
+        data = {column: [] for column in self.columns}
+        for row in rows:
+            for column, value in zip(self.columns, row):
+                if column == 'tags':
+                    value = _decode_json(value)
+                    value = [str(tag) for tag in value] if isinstance(value, list) else None
+                elif column in BOOLEAN_COLUMNS and value is not None:
+                    value = bool(value)
+                elif column in FLOAT_COLUMNS and value is not None:
+                    value = float(value)
+                elif column in INTEGER_COLUMNS and value is not None:
+                    value = int(value)
+                elif value is not None and not isinstance(value, str):
+                    value = str(value)
+                data[column].append(value)
+        self.writer.write_table(self.pa.Table.from_pydict(data, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+
+def export_submissions(db, output_dir=EXPORT_DIR, fmt='jsonl', incremental=False, consumer='default',
+                       chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    导出投稿信息，返回统计 {path, rows, bytes, seconds, watermark}；
+    增量模式下没有新数据时不生成文件（path 为 None）
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"不支持的导出格式: {fmt}（可选 {', '.join(FORMATS)}）")
+
+    db.ensure_export_tables()
+    columns = db.get_table_columns('submissions')
+    id_index, updated_index = columns.index('id'), columns.index('updated_at')
+
+    after = None
+    if incremental:
+        watermark = db.get_export_watermark(consumer)
+        if watermark and watermark['last_id'] is not None:
+            after = (watermark['updated_at'] or '', watermark['last_id'])
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    mode = 'incremental' if after else 'full'
+    name = f"submissions-{consumer}-{mode}-{datetime.now():%Y%m%d-%H%M%S}{EXTENSIONS[fmt]}"
+    path = output_dir / name
+    temp_path = output_dir / (name + '.tmp')
+
+    start = time.perf_counter()
+    rows_written = 0
+    last = None
+    writer = None
+    try:
+        for rows in db.iter_submission_chunks(columns, after=after, chunk_size=chunk_size):
+            if writer is None:
+                writer = WRITERS[fmt](temp_path, columns)
+            writer.write_chunk(rows)
+            rows_written += len(rows)
+            last = rows[-1]
+            logger.debug(f"已导出 {rows_written} 行")
+        if writer is not None:
+            writer.close()
+            writer = None
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    stats = {'path': None, 'rows': rows_written, 'bytes': 0, 'seconds': time.perf_counter() - start,
+             'watermark': after}
+    if not rows_written:
+        logger.info(f"没有需要导出的新数据（使用方 {consumer}）")
+        return stats
+
+    os.replace(temp_path, path)
+    # 文件完整写入后才推进水位，失败的导出下次会重新导出同一批行
+    stats['watermark'] = (last[updated_index], last[id_index])
+    db.save_export_watermark(consumer, last[updated_index], last[id_index], rows_written)
+    stats['path'] = str(path)
+    stats['bytes'] = path.stat().st_size
+    logger.info(f"导出 {rows_written} 行到 {path}（{stats['bytes']} 字节，{stats['seconds']:.2f} 秒）")
+    return stats
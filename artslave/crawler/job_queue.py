@@ -0,0 +1,128 @@
+"""
+基于 crawl_jobs 表的分布式任务队列
+到期的爬取任务写入 crawl_jobs（pending），多个调度器/工作进程通过租约原子认领，
+运行期间定时续约（心跳），租约过期的任务可被其他节点重新认领
+
+认领使用比较并交换（CAS）式的条件 UPDATE。目前只支持 SQLite（DatabaseManager 只有 sqlite3 实现）：
+多个进程共享同一个数据库文件即可协作，适合单机多进程（网络文件系统上的 SQLite 锁不可靠，不建议跨主机共享）。
+语句尽量只用各数据库通用的写法（如用 CASE 而不是 SQLite 的双参数 MAX），但占位符为 ?，接入服务器数据库还需要对应的 DatabaseManager 实现
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+
+OPEN_STATUSES = ('pending', 'running')
+
+
+def utc_now():
+    """租约时间统一使用 UTC（ISO 格式字符串可直接按字典序比较）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def default_worker_id():
+    """工作节点标识：主机名:进程号:随机后缀"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class CrawlJobQueue:
+    """crawl_jobs 租约队列"""
+
+    def __init__(self, db, worker_id=None, lease_seconds=JOB_LEASE_SECONDS):
+        self.db = db
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.db.ensure_job_queue_columns()
+
+    def _lease_until(self):
+        return (utc_now() + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    def enqueue(self, source):
+        """为数据源创建待认领任务；该数据源已有未完成且租约有效的任务时返回 None"""
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        query = """
+        INSERT INTO crawl_jobs (
+            id, data_source_name, data_source_id, crawler_name, status, attempts, started_at, created_at, updated_at
+        )
+        SELECT ?, ?, ?, ?, 'pending', 0, ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM crawl_jobs
+            WHERE data_source_id = ?
+              AND (status = 'pending' OR (status = 'running' AND lease_expires_at >= ?))
+        )
+        """
+        params = (
+            job_id, source['name'], source['id'], source['crawler_name'], now, now, now,
+            source['id'], utc_now().isoformat()
+        )
+        return job_id if self.db.execute_query(query, params) else None
+
+    def claim(self, candidates=5):
+        """认领一个待运行（或租约已过期）的任务，返回任务记录；没有可认领任务时返回 None"""
+        now = utc_now().isoformat()
+        rows = self.db.execute_query("""
+        SELECT id FROM crawl_jobs
+        WHERE data_source_id IS NOT NULL
+          AND (status = 'pending' OR (status = 'running' AND lease_expires_at < ?))
+          AND attempts < ?
+        ORDER BY created_at
+        LIMIT ?
+        """, (now, JOB_MAX_ATTEMPTS, candidates)) or []
+
+        for row in rows:
+            # 条件 UPDATE 只会对一个节点成功，失败说明已被其他节点抢先认领
+            claimed = self.db.execute_query("""
+            UPDATE crawl_jobs SET
+                status = 'running',
+                lease_owner = ?,
+                lease_expires_at = ?,
+                heartbeat_at = ?,
+                attempts = attempts + 1,
+                started_at = ?,
+                updated_at = ?
+            WHERE id = ?
+              AND (status = 'pending' OR (status = 'running' AND lease_expires_at < ?))
+            """, (
+                self.worker_id, self._lease_until(), now, datetime.now().isoformat(),
+                datetime.now().isoformat(), row['id'], now
+            ))
+            if claimed == 1:
+                jobs = self.db.execute_query("SELECT * FROM crawl_jobs WHERE id = ?", (row['id'],))
+                return jobs[0] if jobs else None
+        return None
+
+    def heartbeat(self, job_id):
+        """续约；返回 False 表示租约已丢失（已被其他节点重新认领）"""
+        result = self.db.execute_query("""
+        UPDATE crawl_jobs SET lease_expires_at = ?, heartbeat_at = ?
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """, (self._lease_until(), utc_now().isoformat(), job_id, self.worker_id))
+        return result == 1
+
+    def release(self, job_id):
+        """放弃租约，任务回到待认领状态；任务没有运行，认领时计入的尝试次数退回"""
+        return self.db.execute_query("""
+        UPDATE crawl_jobs SET
+            status = 'pending', lease_owner = NULL, lease_expires_at = NULL,
+            attempts = CASE WHEN attempts > 0 THEN attempts - 1 ELSE 0 END, updated_at = ?
+        WHERE id = ? AND lease_owner = ?
+        """, (datetime.now().isoformat(), job_id, self.worker_id))
+
+    def reap_expired(self):
+        """将超过最大尝试次数且租约已过期的任务标记为失败"""
+        now = utc_now().isoformat()
+        return self.db.execute_query("""
+        UPDATE crawl_jobs SET
+            status = 'failed',
+            error_message = '租约过期且超过最大尝试次数',
+            completed_at = ?,
+            updated_at = ?
+        WHERE status IN ('pending', 'running')
+          AND data_source_id IS NOT NULL
+          AND attempts >= ?
+          AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        """, (datetime.now().isoformat(), datetime.now().isoformat(), JOB_MAX_ATTEMPTS, now))
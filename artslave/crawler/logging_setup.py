@@ -0,0 +1,183 @@
+"""
+日志配置
+由命令行入口调用 setup_logging()，导入模块时不配置日志。
+日志记录经 QueueHandler 放入队列，由 QueueListener 在后台线程写文件和控制台，
+爬取线程不做磁盘 I/O；文件为 JSON Lines，带任务、数据源和请求ID；
+同一代码位置的高频日志（逐条、逐请求）按速率限制，超出部分合并为省略计数
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from config import LOG_LEVEL, LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST
+
+CONTEXT_FIELDS = ('job_id', 'source', 'request_id')
+_context = {field: contextvars.ContextVar(field, default=None) for field in CONTEXT_FIELDS}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(**fields):
+    """在当前线程（上下文）内为日志附加任务/数据源/请求ID"""
+    tokens = [(_context[name], _context[name].set(value)) for name, value in fields.items() if name in _context]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def bind_log_context(**fields):
+    """在 log_context 块内更新字段（如任务创建后补充 job_id），块结束时一并恢复"""
+    for name, value in fields.items():
+        if name in _context:
+            _context[name].set(value)
+
+
+class ContextFilter(logging.Filter):
+    """在产生日志的线程中读取上下文，写入记录属性"""
+
+    def filter(self, record):
+        for field, var in _context.items():
+            if not hasattr(record, field):
+                setattr(record, field, var.get())
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """按代码位置（文件:行号）的令牌桶限流，ERROR 及以上不限流"""
+
+    def __init__(self, rate=LOG_RATE_LIMIT_PER_SECOND, burst=LOG_RATE_LIMIT_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or not self.rate:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, suppressed = self.buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[key] = (tokens - 1, now, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """控制台格式：时间 - 模块 - 级别 - 消息 [任务 数据源]"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        context = ' '.join(
+            f"{field}={getattr(record, field)}" for field in ('job_id', 'source')
+            if getattr(record, field, None) is not None
+        )
+        if context:
+            text += f" [{context}]"
+        if getattr(record, 'suppressed', 0):
+            text += f"（此前已省略 {record.suppressed} 条相同位置的日志）"
+        return text
+
+
+class ContextQueueHandler(QueueHandler):
+    """入队前只合并消息参数，不做完整格式化（格式化在监听线程中进行）"""
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_file=None, level=LOG_LEVEL, console=True):
+    """配置根日志：队列 + 后台写入线程（重复调用时忽略）"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        handlers = []
+        if log_file:
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = ContextQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        queue_handler.addFilter(RateLimitFilter())
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
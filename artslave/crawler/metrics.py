@@ -0,0 +1,228 @@
+"""
+进程内指标
+计数器（Counter）、仪表（Gauge）和直方图（Histogram），以 Prometheus 文本格式导出，
+调度器和守护进程在本地 HTTP 端口的 /metrics 上提供，供容量规划和吞吐回退监控使用
+"""
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """指标基类：按标签取值分别记录"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """返回 [(名称后缀, 标签取值, 额外标签, 数值)]"""
+        with self.lock:
+            return [('', key, None, value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """导出时调用 function() 取值（仅用于无标签的仪表，如队列长度）"""
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [('', (), None, self.function())]
+            except Exception:
+                return []
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self.lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+
+        samples = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', key, f'le="{_format_value(bound)}"', cumulative))
+            samples.append(('_sum', key, None, total))
+            samples.append(('_count', key, None, count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# ---------------------------------------------------------------- 爬虫
+REQUESTS = REGISTRY.counter('crawler_requests_total', 'HTTP 请求数（含重试）', ('host', 'outcome'))
+REQUEST_LATENCY = REGISTRY.histogram('crawler_request_duration_seconds', 'HTTP 请求耗时', ('host',))
+RESPONSE_BYTES = REGISTRY.counter('crawler_response_bytes_total', '下载的响应字节数', ('host',))
+REQUEST_RETRIES = REGISTRY.counter('crawler_request_retries_total', '请求失败后的重试次数', ('host',))
+PAGE_CACHE_LOOKUPS = REGISTRY.counter(
+    'crawler_page_cache_lookups_total', '页面提取缓存查询次数（result=hit/miss）', ('source', 'result')
+)
+ITEMS_FOUND = REGISTRY.counter('crawler_items_found_total', '发现的投稿信息条数', ('source',))
+ITEMS_ADDED = REGISTRY.counter('crawler_items_added_total', '写入数据库的投稿信息条数', ('source',))
+DB_FLUSH_LATENCY = REGISTRY.histogram('crawler_db_flush_duration_seconds', '批量写入投稿信息的耗时', ('source',))
+
+# ---------------------------------------------------------------- 调度器
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge('scheduler_queue_depth', '调度堆中等待到期的数据源数')
+SCHEDULER_BLOCKED = REGISTRY.gauge('scheduler_blocked_sources', '因并发上限等待槽位的数据源数')
+SCHEDULER_RUNNING = REGISTRY.gauge('scheduler_running_sources', '正在爬取的数据源数')
+SCHEDULER_LAG = REGISTRY.histogram(
+    'scheduler_dispatch_lag_seconds', '数据源到期到开始爬取的延迟',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+)
+SCHEDULER_RUNS = REGISTRY.counter('scheduler_runs_total', '调度器完成的爬取次数', ('result',))
+SCHEDULER_RUN_DURATION = REGISTRY.histogram(
+    'scheduler_run_duration_seconds', '单次数据源爬取耗时',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+)
+JOB_QUEUE_PENDING = REGISTRY.gauge('job_queue_pending', '分布式模式下 crawl_jobs 中待认领的任务数')
+
+# ---------------------------------------------------------------- 守护进程
+DAEMON_ACTIVE_RUNS = REGISTRY.gauge('daemon_active_runs', '守护进程中排队或运行中的爬虫数')
+DAEMON_RUNS = REGISTRY.counter('daemon_runs_total', '守护进程结束的运行次数', ('result',))
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """在后台线程中提供 /metrics，返回服务器对象（调用 shutdown() 停止）"""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,244 @@
+"""
+原始页面归档
+make_request 拿到的响应内容按 SHA-256 内容寻址：同一内容（跨页面、跨运行）只保存一次，
+压缩后追加写入分段文件（*.pack），位置、编码和每次抓取的页面记录保存在数据库索引中，
+修改提取逻辑后可以离线重新提取，不必重新抓取数据源。
+
+压缩：安装了 zstandard 时使用 zstd，否则使用 zlib；同一主机归档到 ARCHIVE_DICT_SAMPLES 个页面后，
+用最近的页面训练该主机的压缩字典（zlib 为预置字典），之后的页面使用字典压缩，
+同一网站页面间大量重复的模板因此几乎不占空间。
+
+分段文件中每条记录为 头部（魔数、内容摘要、长度）+ 压缩数据，索引丢失时可以据此重建
+"""
+
+import logging
+import os
+import struct
+import time
+import uuid
+import zlib
+from pathlib import Path
+from urllib.parse import urlparse
+
+from config import (
+    ARCHIVE_DIR, ARCHIVE_SEGMENT_SIZE, ARCHIVE_COMPRESSION_LEVEL, ARCHIVE_DICT_SAMPLES, ARCHIVE_DICT_SIZE
+)
+from page_cache import hash_content
+
+logger = logging.getLogger(__name__)
+
+RECORD_MAGIC = b'ASPK'
+RECORD_HEADER = struct.Struct('>4s32sI')  # 魔数、SHA-256 摘要、压缩数据长度
+ZLIB_LEVEL = 6
+ZLIB_DICT_LIMIT = 32 * 1024  # zlib 的窗口大小，预置字典超出部分无效
+READER_CACHE_SIZE = 16
+
+
+def _zstd():
+    """zstandard 为可选依赖"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def default_codec():
+    return 'zstd' if _zstd() is not None else 'zlib'
+
+
+def build_zlib_dictionary(samples, size=ZLIB_DICT_LIMIT):
+    """
+    由样本页面构建 zlib 预置字典：取各页面的开头和结尾（网站模板所在位置），
+    zlib 优先匹配字典末尾，所以字典按样本顺序拼接后保留最后 size 字节
+    """
+    chunk = max(size // (2 * max(len(samples), 1)), 256)
+    parts = []
+    for sample in samples:
+        parts.append(sample[:chunk])
+        parts.append(sample[-chunk:])
+    return b''.join(parts)[-size:]
+
+
+def train_dictionary(codec, samples, size=ARCHIVE_DICT_SIZE):
+    """训练压缩字典，样本不足以训练时返回 None"""
+    if codec == 'zstd':
+        try:
+            return _zstd().train_dictionary(size, samples).as_bytes()
+        except Exception as e:
+            logger.debug(f"zstd 字典训练失败: {e}")
+            return None
+    dictionary = build_zlib_dictionary(samples, min(size, ZLIB_DICT_LIMIT))
+    return dictionary or None
+
+
+def compress(codec, data, dictionary=None, level=ARCHIVE_COMPRESSION_LEVEL):
+    if codec == 'zstd':
+        zstandard = _zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=level, dict_data=dict_data).compress(data)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(ZLIB_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(codec, data, dictionary=None):
+    if codec == 'zstd':
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 压缩的归档需要安装 zstandard（pip install zstandard）")
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+class ArchiveReader:
+    """按内容块位置读取归档内容（缓存打开的分段文件和字典），离线重新提取的工作进程各自使用一个"""
+
+    def __init__(self, db, directory=ARCHIVE_DIR):
+        self.db = db
+        self.directory = Path(directory)
+        self.readers = {}
+        self.dict_by_id = {}
+
+    def read_blob(self, blob):
+        """读取 archive_blobs 行（或包含 segment / offset / length / codec / dict_id 的字典）对应的内容"""
+        reader = self.readers.get(blob['segment'])
+        if reader is None:
+            if len(self.readers) >= READER_CACHE_SIZE:
+                self.readers.pop(next(iter(self.readers))).close()
+            reader = self.readers[blob['segment']] = open(self.directory / blob['segment'], 'rb')
+        reader.seek(blob['offset'])
+        payload = reader.read(blob['length'])
+
+        dictionary = None
+        if blob['dict_id'] is not None:
+            dictionary = self.dict_by_id.get(blob['dict_id'])
+            if dictionary is None:
+                dictionary = self.dict_by_id[blob['dict_id']] = self.db.get_archive_dictionary_by_id(blob['dict_id'])
+        return decompress(blob['codec'], payload, dictionary)
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
+
+class PageArchive:
+    """页面归档（每个爬虫实例一个，使用爬虫的数据库连接，只在爬虫所在线程中使用）"""
+
+    def __init__(self, db, source_name, directory=ARCHIVE_DIR, segment_size=ARCHIVE_SEGMENT_SIZE,
+                 codec=None, level=ARCHIVE_COMPRESSION_LEVEL, crawler=None):
+        self.db = db
+        self.source_name = source_name
+        self.crawler = crawler
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.codec = codec or default_codec()
+        self.level = level
+        self.db.ensure_archive_tables()
+
+        # 当前写入的分段文件（每个实例独占，多个进程/线程同时归档时互不干扰）
+        self.segment_name = None
+        self.segment_file = None
+        self.segment_offset = 0
+
+        self.dictionaries = {}       # 主机 -> (字典ID, 字典数据) 或 None
+        self.host_pages = {}         # 主机 -> 已归档页面数（决定何时训练字典）
+        self.dict_attempted = set()
+        self.reader = ArchiveReader(db, directory)
+        self.known_hashes = set()
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def store(self, url, content, content_type=None, encoding=None, job_id=None):
+        """归档一次抓取的响应内容，返回内容哈希；内容已归档过时只记录抓取"""
+        content_hash = hash_content(content)
+        host = urlparse(url).netloc or 'unknown'
+
+        if content_hash in self.known_hashes or self.db.get_archive_blob(content_hash):
+            self.deduplicated += 1
+        else:
+            self.write_blob(content_hash, content, host)
+        self.known_hashes.add(content_hash)
+
+        self.db.record_archive_page(self.source_name, host, url, content_hash, content_type, encoding, job_id,
+                                    self.crawler)
+        self.maybe_train_dictionary(host)
+        return content_hash
+
+    def write_blob(self, content_hash, content, host):
+        dict_id, dictionary = self.get_dictionary(host) or (None, None)
+        payload = compress(self.codec, content, dictionary, self.level)
+
+        segment_file = self.open_segment(RECORD_HEADER.size + len(payload))
+        segment_file.write(RECORD_HEADER.pack(RECORD_MAGIC, bytes.fromhex(content_hash), len(payload)))
+        offset = self.segment_offset + RECORD_HEADER.size
+        segment_file.write(payload)
+        # 先写数据再写索引：中途失败只会在分段文件中留下无索引的数据
+        segment_file.flush()
+        self.segment_offset = offset + len(payload)
+
+        self.db.add_archive_blob(content_hash, self.segment_name, offset, len(payload), len(content),
+                                 self.codec, dict_id)
+        self.stored += 1
+        self.raw_bytes += len(content)
+        self.stored_bytes += len(payload)
+
+    def open_segment(self, size):
+        """返回可写入 size 字节的分段文件，超出大小上限时换新文件"""
+        if self.segment_file is not None and self.segment_offset + size > self.segment_size and self.segment_offset:
+            self.segment_file.close()
+            self.segment_file = None
+
+        if self.segment_file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.segment_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.pack"
+            self.segment_file = open(self.directory / self.segment_name, 'ab')
+            self.segment_offset = self.segment_file.tell()
+        return self.segment_file
+
+    def get_dictionary(self, host):
+        if host not in self.dictionaries:
+            self.dictionaries[host] = self.db.get_archive_dictionary(host, self.codec)
+        return self.dictionaries[host]
+
+    def maybe_train_dictionary(self, host):
+        """主机还没有字典且已归档足够多的页面时，用最近的页面训练字典（每个实例每个主机最多尝试一次）"""
+        if host in self.dict_attempted or self.get_dictionary(host) is not None:
+            return
+        count = self.host_pages.get(host)
+        # 第一次遇到该主机时以数据库中的页面数为准，之后在内存中计数
+        count = self.db.count_archive_host_pages(host) if count is None else count + 1
+        self.host_pages[host] = count
+        if count < ARCHIVE_DICT_SAMPLES:
+            return
+
+        self.dict_attempted.add(host)
+        hashes = self.db.get_recent_archive_hashes(host, ARCHIVE_DICT_SAMPLES)
+        samples = [sample for sample in map(self.read, hashes) if sample]
+        dictionary = train_dictionary(self.codec, samples)
+        if dictionary is None:
+            return
+        dict_id = self.db.add_archive_dictionary(host, self.codec, dictionary, len(samples))
+        self.dictionaries[host] = (dict_id, dictionary)
+        logger.info(f"已为 {host} 训练压缩字典（{len(samples)} 个样本，{len(dictionary)} 字节）")
+
+    def read(self, content_hash):
+        """读取归档的内容，不存在时返回 None"""
+        blob = self.db.get_archive_blob(content_hash)
+        if blob is None:
+            return None
+
+        if self.segment_file is not None:
+            self.segment_file.flush()
+        return self.reader.read_blob(blob)
+
+    def close(self):
+        if self.segment_file is not None:
+            self.segment_file.close()
+            self.segment_file = None
+        self.reader.close()
@@ -0,0 +1,72 @@
+"""
+页面提取结果缓存
+以页面内容哈希为键缓存提取出的投稿信息，页面未变化时跳过解析和保存
+"""
+
+import hashlib
+import json
+
+
+def hash_content(content):
+    """计算页面内容哈希"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_config(config):
+    """计算数据源选择器配置的哈希，配置变化时缓存自动失效"""
+    payload = json.dumps(config or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class PageExtractionCache:
+    """页面提取结果缓存"""
+
+    def __init__(self, db, source_name, parser_version, source_config=None):
+        self.db = db
+        self.source_name = source_name
+        self.parser_version = str(parser_version)
+        self.config_hash = hash_config(source_config)
+        self.hits = 0
+        self.misses = 0
+
+        self.db.ensure_page_cache_table()
+        # 解析版本或选择器配置变化后，旧条目不会再命中，直接清理
+        self.db.purge_page_cache(self.source_name, self.parser_version, self.config_hash)
+
+    def lookup(self, content):
+        """查询缓存，返回 (内容哈希, 缓存的条目列表或 None)"""
+        content_hash = hash_content(content)
+        entry = self.db.get_page_cache(self.source_name, content_hash)
+
+        if (entry is None
+                or entry['parser_version'] != self.parser_version
+                or entry['config_hash'] != self.config_hash):
+            self.misses += 1
+            return content_hash, None
+
+        try:
+            items = json.loads(entry['items'])
+        except (TypeError, ValueError):
+            self.misses += 1
+            return content_hash, None
+
+        self.hits += 1
+        self.db.touch_page_cache(self.source_name, content_hash)
+        return content_hash, items
+
+    def store(self, content_hash, items):
+        """保存页面的提取结果"""
+        return self.db.set_page_cache(
+            self.source_name,
+            content_hash,
+            self.parser_version,
+            self.config_hash,
+            items
+        )
+
+    def hit_rate(self):
+        """缓存命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,142 @@
+"""
+爬虫热点分析
+在 cProfile 和 tracemalloc 下运行一次爬取，输出各阶段耗时、热点函数、
+内存分配位置，以及可供火焰图工具读取的折叠栈（collapsed stacks）
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+PHASES = ('delay', 'fetch', 'parse', 'clean', 'classify', 'write')
+
+
+class StackSampler(threading.Thread):
+    """定时采样目标线程的调用栈，生成折叠栈统计"""
+
+    def __init__(self, target_thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path):
+        """写出折叠栈文件（每行: 栈;栈;栈 次数），可直接交给 flamegraph.pl / speedscope"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def format_phase_timings(phase_timings, wall_time):
+    """格式化阶段耗时表"""
+    lines = [f"{'阶段':<10}{'耗时(秒)':>12}{'次数':>8}{'占比':>8}"]
+    names = list(PHASES) + sorted(set(phase_timings) - set(PHASES))
+    for name in names:
+        if name not in phase_timings:
+            continue
+        total, count = phase_timings[name]
+        share = total / wall_time if wall_time else 0
+        lines.append(f"{name:<10}{total:>12.3f}{count:>8}{share:>8.1%}")
+    return '\n'.join(lines)
+
+
+def profile_crawler(crawler_class, output_dir='profiles', interval=0.005, top=20):
+    """在分析器下运行爬虫，返回分析摘要并将结果写入 output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"{crawler_class.__name__}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+    crawler = crawler_class()
+    crawler.phase_timings = {}
+
+    sampler = StackSampler(threading.get_ident(), interval)
+    profiler = cProfile.Profile()
+
+    tracemalloc.start(10)
+    sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        crawler.run()
+    finally:
+        profiler.disable()
+        wall_time = time.perf_counter() - start
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # 热点函数
+    profiler.dump_stats(f"{prefix}.prof")
+    stats_stream = io.StringIO()
+    pstats.Stats(profiler, stream=stats_stream).sort_stats('cumulative').print_stats(top)
+
+    # 折叠栈
+    sampler.write_collapsed(f"{prefix}.collapsed")
+
+    # 内存分配位置
+    allocations = [
+        {'location': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:top]
+    ]
+
+    summary = {
+        'crawler': crawler_class.__name__,
+        'wall_time': round(wall_time, 3),
+        'items_found': crawler.items_found,
+        'items_added': crawler.items_added,
+        'phases': {name: {'seconds': round(total, 4), 'count': count}
+                   for name, (total, count) in crawler.phase_timings.items()},
+        'peak_memory_kb': round(peak / 1024, 1),
+        'top_allocations': allocations,
+        'stack_samples': sampler.samples,
+        'files': {
+            'pstats': f"{prefix}.prof",
+            'collapsed': f"{prefix}.collapsed",
+            'summary': f"{prefix}.json",
+        }
+    }
+    with open(f"{prefix}.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\n总耗时: {wall_time:.3f} 秒，峰值内存: {summary['peak_memory_kb']} KB")
+    print("\n各阶段耗时:")
+    print(format_phase_timings(crawler.phase_timings, wall_time))
+    print(f"\n热点函数 (前 {top}):")
+    print(stats_stream.getvalue())
+    print(f"内存分配位置 (前 {top}):")
+    for entry in allocations:
+        print(f"  {entry['location']}: {entry['size_kb']} KB / {entry['count']} 次")
+    print(f"\n分析结果已写入: {prefix}.*  (折叠栈 {sampler.samples} 个采样)")
+
+    return summary
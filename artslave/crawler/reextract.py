@@ -0,0 +1,164 @@
+"""
+离线重新提取
+修改选择器配置或清洗规则后，用当前的提取（extract_page）和清洗（build_record）逻辑处理归档的原始页面，
+不必重新抓取数据源。每个 (数据源, URL) 只处理最近抓取到的内容；页面在进程池中并行解析，
+结果在主进程中按批写入，条目按 item_key 更新已有记录（字段变化作为 update 事件进入变更流）。
+
+每批写入后把处理到的页面记录ID写入检查点文件，中断后用相同的筛选条件再次运行会从检查点继续，
+全部完成后删除检查点
+"""
+
+import importlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from config import ARCHIVE_DIR, REEXTRACT_BATCH_SIZE, REEXTRACT_CHECKPOINT
+from database import DatabaseManager
+from page_archive import ArchiveReader
+from submission_record import make_item_keys
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的状态（由 _init_worker 创建）
+_worker = None
+
+
+class ReextractWorker:
+    """读取归档内容并用爬虫的提取逻辑生成投稿信息记录，每个进程一个，爬虫实例按类缓存"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.db = DatabaseManager()
+        self.reader = ArchiveReader(self.db, archive_dir)
+        self.crawlers = {}
+
+    def get_crawler(self, class_path):
+        crawler = self.crawlers.get(class_path)
+        if crawler is None:
+            module, _, class_name = class_path.partition(':')
+            crawler_class = getattr(importlib.import_module(module), class_name)
+            crawler = self.crawlers[class_path] = crawler_class()
+            # 重新提取不抓取页面，也不再归档
+            crawler.archive = None
+        return crawler
+
+    def process(self, page):
+        """处理一个页面，返回 (页面记录ID, 记录列表, 错误信息)"""
+        try:
+            crawler = self.get_crawler(page['crawler'])
+            content = self.reader.read_blob(page)
+            try:
+                html = content.decode(page['encoding'] or 'utf-8', errors='replace')
+            except LookupError:
+                html = content.decode('utf-8', errors='replace')
+
+            items = crawler.extract_page(html, page['url'])
+            item_keys = make_item_keys(crawler.name, items)
+            records = []
+            for item, item_key in zip(items, item_keys):
+                record = crawler.build_record(item)
+                record.item_key = item_key
+                records.append(record)
+            return page['id'], records, None
+        except Exception as e:
+            return page['id'], [], f"{type(e).__name__}: {e}"
+
+
+def _init_worker(archive_dir):
+    global _worker
+    _worker = ReextractWorker(archive_dir)
+
+
+def _process_page(page):
+    return _worker.process(page)
+
+
+def load_checkpoint(path, filters):
+    """读取检查点，筛选条件与本次相同时返回上次处理到的页面记录ID，否则从头开始"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get('filters') != filters:
+        logger.info("检查点的筛选条件与本次不同，从头开始")
+        return 0
+    return checkpoint.get('last_page_id', 0)
+
+
+def save_checkpoint(path, filters, last_page_id, stats):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'filters': filters, 'last_page_id': last_page_id, 'stats': stats}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def reextract(db, sources=None, crawlers=None, since=None, until=None, workers=None,
+              checkpoint_path=REEXTRACT_CHECKPOINT, batch_size=REEXTRACT_BATCH_SIZE, archive_dir=ARCHIVE_DIR,
+              resume=True):
+    """
+    重新提取归档页面，返回统计 {pages, items, written, errors, skipped, seconds, pages_per_second}；
+    crawlers 为爬虫类路径（模块:类名）列表，workers 为进程数（默认 CPU 核数，1 表示在当前进程中处理）
+    """
+    db.ensure_archive_tables()
+    filters = {'sources': sorted(sources or []), 'crawlers': sorted(crawlers or []), 'since': since, 'until': until}
+    last_page_id = load_checkpoint(checkpoint_path, filters) if resume else 0
+    if last_page_id:
+        logger.info(f"从检查点继续：页面记录 {last_page_id} 之后")
+
+    workers = workers or os.cpu_count() or 1
+    writer = db.create_batch_writer()
+    stats = {'pages': 0, 'items': 0, 'written': 0, 'errors': 0, 'skipped': 0}
+    start = time.perf_counter()
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(archive_dir,))
+    else:
+        _init_worker(archive_dir)
+
+    try:
+        while True:
+            pages = db.get_reextract_pages(last_page_id, batch_size, sources, crawlers, since, until)
+            if not pages:
+                break
+
+            runnable = [page for page in pages if page['crawler']]
+            stats['skipped'] += len(pages) - len(runnable)
+            if executor is not None:
+                results = executor.map(_process_page, runnable, chunksize=max(len(runnable) // (workers * 4), 1))
+            else:
+                results = map(_process_page, runnable)
+            for page_id, records, error in results:
+                stats['pages'] += 1
+                if error:
+                    stats['errors'] += 1
+                    logger.warning(f"页面 {page_id} 重新提取失败: {error}")
+                    continue
+                for record in records:
+                    writer.add(record)
+                stats['items'] += len(records)
+
+            stats['written'] += writer.flush()
+            last_page_id = pages[-1]['id']
+            save_checkpoint(checkpoint_path, filters, last_page_id, stats)
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"已处理 {stats['pages']} 个页面（{stats['pages'] / elapsed:.1f} 页/秒），"
+                        f"写入 {stats['written']} 条")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # 全部完成后删除检查点，下一次运行从头开始
+    Path(checkpoint_path).unlink(missing_ok=True)
+    if stats['skipped']:
+        logger.warning(f"{stats['skipped']} 个页面没有记录爬虫类，已跳过")
+    stats['seconds'] = time.perf_counter() - start
+    stats['pages_per_second'] = stats['pages'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
@@ -6,183 +6,696 @@ ArtSlave 爬虫调度器
 
 import time
 import threading
-import schedule
+import heapq
+import itertools
 import json
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from config import (
+    SCHEDULER_MAX_WORKERS, SCHEDULER_MAX_PER_HOST, SCHEDULER_FAILURE_RETRY_SECONDS,
+    SCHEDULER_MAX_BACKOFF_SECONDS, SCHEDULER_STARTUP_SPREAD_SECONDS, SCHEDULER_STOP_GRACE_SECONDS,
+    JOB_LEASE_SECONDS, JOB_POLL_SECONDS, METRICS_HOST, SCHEDULER_METRICS_PORT,
+    ADAPTIVE_FREQUENCY_ENABLED, ADAPTIVE_MIN_HOURS, ADAPTIVE_MAX_HOURS, ADAPTIVE_HISTORY_SIZE,
+)
+from crawl_frequency import estimate_change_rate, adapt_interval
+from job_queue import CrawlJobQueue, default_worker_id
 from database import DatabaseManager
 from crawler_manager import CrawlerManager
+import metrics
 import logging
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('crawler_scheduler.log'),
-        logging.StreamHandler()
-    ]
-)
+from logging_setup import setup_logging
 
 logger = logging.getLogger(__name__)
 
+# 运行结果（CrawlerManager.run_crawler 的返回值）在日志和指标中的写法
+OUTCOME_LABELS = {'completed': '完成', 'partial': '提前结束', 'failed': '失败'}
+OUTCOME_METRIC_RESULTS = {'completed': 'success', 'partial': 'partial', 'failed': 'failure'}
+
+# 内置数据源：data_sources 表为空时（首次启动）写入，之后以表中的数据源为准
+DEFAULT_DATA_SOURCES = [
+    {
+        'id': '1',
+        'name': 'FilmFreeway 艺术节',
+        'url': 'https://filmfreeway.com/festivals',
+        'type': 'website',
+        'crawler_name': 'demo',  # 对应的爬虫名称
+        'crawl_frequency': 24,  # 小时
+        'is_active': True
+    },
+    {
+        'id': '2',
+        'name': '中国美术馆展览',
+        'url': 'http://www.namoc.org',
+        'type': 'website',
+        'crawler_name': 'demo',
+        'crawl_frequency': 12,  # 小时
+        'is_active': True
+    },
+    {
+        'id': '3',
+        'name': 'Artsy 展览信息',
+        'url': 'https://www.artsy.net',
+        'type': 'api',
+        'crawler_name': 'demo',
+        'crawl_frequency': 6,  # 小时
+        'is_active': False
+    }
+]
+
 class CrawlerScheduler:
     """爬虫调度器 - 负责定时执行爬虫任务"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = SCHEDULER_MAX_WORKERS, max_per_host: int = SCHEDULER_MAX_PER_HOST,
+                 distributed: bool = False, worker_id: Optional[str] = None):
         self.db = DatabaseManager()
         self.crawler_manager = CrawlerManager()
         self.running = False
         self.scheduler_thread = None
         self.data_sources = []
         
+        # 并发控制：全局工作线程数、每个主机的并发数，同一数据源不会同时运行两次
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.executor = None
+        self.cancel_events = {}  # 运行中数据源的取消标志，停止调度器时通知爬虫提前结束
+        self.metrics_server = None
+        self.slot_lock = threading.Lock()
+        self.running_sources = set()
+        self.host_counts = {}
+        
+        # 事件驱动调度：按下次到期时间排序的最小堆，条目为 (到期时间戳, 版本号, 键)
+        # 键为 ('source', 数据源ID) 或 ('task', 任务名)；重新调度时旧条目通过版本号惰性失效
+        self.condition = threading.Condition()
+        self.heap = []
+        self.entry_versions = {}
+        self.version_counter = itertools.count()
+        self.blocked_sources = {}  # 因并发上限暂时无法启动、等待槽位释放的数据源
+        
+        # 分布式模式：到期任务写入 crawl_jobs，由各节点的工作线程按租约认领执行
+        self.distributed = distributed
+        self.worker_id = worker_id or default_worker_id()
+        self.worker_threads = []
+        self.stop_event = threading.Event()
+        
     def load_data_sources(self):
-        """从数据库加载数据源配置"""
+        """从数据库加载数据源配置和调度状态（最后爬取、下次到期、连续失败次数）"""
+        db = DatabaseManager()
         try:
-            # 这里应该从实际的数据源表加载，目前使用模拟数据
-            self.data_sources = [
-                {
-                    'id': '1',
-                    'name': 'FilmFreeway 艺术节',
-                    'url': 'https://filmfreeway.com/festivals',
-                    'type': 'website',
-                    'crawler_name': 'demo',  # 对应的爬虫名称
-                    'crawl_frequency': 24,  # 小时
-                    'is_active': True,
-                    'last_crawled': None
-                },
-                {
-                    'id': '2',
-                    'name': '中国美术馆展览',
-                    'url': 'http://www.namoc.org',
-                    'type': 'website',
-                    'crawler_name': 'demo',
-                    'crawl_frequency': 12,  # 小时
-                    'is_active': True,
-                    'last_crawled': None
-                },
-                {
-                    'id': '3',
-                    'name': 'Artsy 展览信息',
-                    'url': 'https://www.artsy.net',
-                    'type': 'api',
-                    'crawler_name': 'demo',
-                    'crawl_frequency': 6,  # 小时
-                    'is_active': False,
-                    'last_crawled': None
+            db.ensure_scheduler_columns()
+            if db.seed_data_sources(DEFAULT_DATA_SOURCES):
+                logger.info("data_sources 表为空，已写入内置数据源")
+            
+            sources = []
+            for row in db.get_scheduler_sources():
+                config = {}
+                if row.get('config'):
+                    try:
+                        config = json.loads(row['config'])
+                    except (TypeError, ValueError):
+                        logger.warning(f"数据源 {row['name']} 的配置不是有效 JSON")
+                
+                base_frequency = row.get('crawl_frequency') or 24
+                source = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'url': row['url'],
+                    'type': row['type'],
+                    'crawler_name': row.get('crawler_name') or 'demo',
+                    'base_frequency': base_frequency,
+                    'crawl_frequency': row.get('current_frequency') or base_frequency,  # 小时
+                    'is_active': bool(row['is_active']),
+                    'last_crawled': row.get('last_crawled'),
+                    'next_due_at': row.get('next_due_at'),
+                    'failure_streak': row.get('failure_streak') or 0,
                 }
-            ]
+                for key in ('min_frequency', 'max_frequency'):
+                    if key in config:
+                        source[key] = config[key]
+                sources.append(source)
+            
+            self.data_sources = sources
             logger.info(f"加载了 {len(self.data_sources)} 个数据源")
         except Exception as e:
             logger.error(f"加载数据源失败: {e}")
             self.data_sources = []
+        finally:
+            db.close()
     
-    def should_crawl_source(self, source: Dict) -> bool:
-        """判断数据源是否需要爬取"""
-        if not source['is_active']:
-            return False
-            
-        if source['last_crawled'] is None:
-            return True
-            
+    def persist_source_state(self, source: Dict, status: Optional[str] = None):
+        """将数据源的调度状态写回 data_sources 表"""
+        db = DatabaseManager()
         try:
-            last_crawled = datetime.fromisoformat(source['last_crawled'])
-            next_crawl_time = last_crawled + timedelta(hours=source['crawl_frequency'])
-            return datetime.now() >= next_crawl_time
+            db.save_scheduler_states([self.get_state_row(source, status)])
         except Exception as e:
-            logger.error(f"解析最后爬取时间失败: {e}")
-            return True
+            logger.error(f"保存数据源 {source['name']} 调度状态失败: {e}")
+        finally:
+            db.close()
+    
+    def get_state_row(self, source: Dict, status: Optional[str] = None) -> Dict:
+        """数据源调度状态"""
+        return {
+            'id': source['id'],
+            'last_crawled': source.get('last_crawled'),
+            'next_due_at': source.get('next_due_at'),
+            'failure_streak': source.get('failure_streak', 0),
+            'current_frequency': source.get('crawl_frequency'),
+            'status': status,
+        }
     
-    def crawl_source(self, source: Dict):
-        """爬取指定数据源"""
+    def spread_overdue_sources(self):
+        """启动时将已到期的数据源在一个时间窗口内随机错开，避免重启后集中爬取"""
+        overdue = []
+        for source in self.data_sources:
+            due_at = self.get_next_due_time(source)
+            now = datetime.now()
+            if due_at is None or due_at > now:
+                continue
+            
+            window = min(SCHEDULER_STARTUP_SPREAD_SECONDS, source['crawl_frequency'] * 3600)
+            source['next_due_at'] = (now + timedelta(seconds=random.uniform(0, window))).isoformat()
+            overdue.append(source)
+        
+        if not overdue:
+            return
+        
+        db = DatabaseManager()
+        try:
+            db.save_scheduler_states([self.get_state_row(source) for source in overdue])
+        finally:
+            db.close()
+        logger.info(f"{len(overdue)} 个数据源已到期，在 {SCHEDULER_STARTUP_SPREAD_SECONDS} 秒内错开启动")
+    
+    def should_crawl_source(self, source: Dict) -> bool:
+        """判断数据源是否需要爬取"""
+        due_at = self.get_next_due_time(source)
+        return due_at is not None and datetime.now() >= due_at
+    
+    def crawl_source(self, source: Dict, job_id: Optional[str] = None,
+                     cancel_event: Optional[threading.Event] = None):
+        """爬取指定数据源（可在工作线程中调用，使用独立的数据库连接），返回运行结果（completed / partial / failed）；
+        job_id 为分布式模式下已认领的任务，cancel_event 被设置时爬虫保存已抓取的数据后提前结束"""
+        db = DatabaseManager()
+        crawler_manager = CrawlerManager()
         try:
             logger.info(f"开始爬取数据源: {source['name']}")
             
-            # 创建爬虫任务记录
-            job_id = self.db.create_crawl_job(source['name'])
+            # 运行对应的爬虫，任务记录由 run_crawler 统一创建和更新
+            outcome = crawler_manager.run_crawler(
+                source['crawler_name'],
+                data_source_name=source['name'],
+                job_id=job_id,
+                cancel_event=cancel_event,
+                lease_owner=self.worker_id if job_id else None
+            )
             
-            # 更新任务状态为运行中
-            self.db.update_crawl_job(job_id, 'running')
-            
-            # 运行对应的爬虫
-            success = self.crawler_manager.run_crawler(source['crawler_name'])
-            
-            if success:
+            if outcome == 'completed':
                 # 更新数据源最后爬取时间
                 source['last_crawled'] = datetime.now().isoformat()
-                self.update_source_last_crawled(source['id'])
+                self.update_source_last_crawled(source['id'], db)
+                self.adapt_crawl_frequency(source, db)
                 
                 logger.info(f"数据源 {source['name']} 爬取成功")
+            elif outcome == 'partial':
+                # 已抓取的数据已保存，但本次不完整，不据此调整爬取间隔
+                source['last_crawled'] = datetime.now().isoformat()
+                self.update_source_last_crawled(source['id'], db)
+                logger.warning(f"数据源 {source['name']} 爬取提前结束")
             else:
                 logger.error(f"数据源 {source['name']} 爬取失败")
+            return outcome
                 
         except Exception as e:
             logger.error(f"爬取数据源 {source['name']} 时发生错误: {e}")
-            if 'job_id' in locals():
-                self.db.update_crawl_job(job_id, 'failed', error_message=str(e))
+            return 'failed'
+        
+        finally:
+            crawler_manager.close()
+            db.close()
+    
+    def adapt_crawl_frequency(self, source: Dict, db: DatabaseManager):
+        """根据最近任务的变化率调整数据源的爬取间隔（小时）"""
+        if not ADAPTIVE_FREQUENCY_ENABLED:
+            return
+        
+        try:
+            base_frequency = source.setdefault('base_frequency', source['crawl_frequency'])
+            jobs = db.get_recent_crawl_jobs(source['name'], ADAPTIVE_HISTORY_SIZE)
+            change_rate = estimate_change_rate(jobs)
+            interval = adapt_interval(
+                change_rate,
+                base_frequency,
+                source.get('min_frequency', ADAPTIVE_MIN_HOURS),
+                source.get('max_frequency', ADAPTIVE_MAX_HOURS)
+            )
+            if abs(interval - source['crawl_frequency']) >= 0.01:
+                rate_text = '历史不足' if change_rate is None else f"{change_rate:.4f}/小时"
+                logger.info(f"数据源 {source['name']} 爬取间隔调整: "
+                            f"{source['crawl_frequency']:.2f} -> {interval:.2f} 小时（变化率 {rate_text}）")
+            source['crawl_frequency'] = interval
+        except Exception as e:
+            logger.error(f"调整数据源 {source['name']} 爬取频率失败: {e}")
+    
+    def adapt_all_frequencies(self):
+        """加载数据源后，根据历史任务初始化各数据源的爬取间隔"""
+        if not ADAPTIVE_FREQUENCY_ENABLED:
+            return
+        
+        db = DatabaseManager()
+        try:
+            for source in self.data_sources:
+                if source['is_active']:
+                    self.adapt_crawl_frequency(source, db)
+        finally:
+            db.close()
+    
+    def get_source_host(self, source: Dict) -> str:
+        """数据源所在主机，用于按主机限制并发"""
+        return urlparse(source.get('url', '')).netloc.lower()
+    
+    def try_acquire_slot(self, source: Dict) -> bool:
+        """尝试为数据源占用运行槽位（数据源未在运行且主机未达到并发上限）"""
+        host = self.get_source_host(source)
+        with self.slot_lock:
+            if source['id'] in self.running_sources:
+                return False
+            if len(self.running_sources) >= self.max_workers:
+                return False
+            if self.host_counts.get(host, 0) >= self.max_per_host:
+                return False
+            self.running_sources.add(source['id'])
+            self.host_counts[host] = self.host_counts.get(host, 0) + 1
+            return True
+    
+    def release_slot(self, source: Dict):
+        """释放数据源占用的运行槽位"""
+        host = self.get_source_host(source)
+        with self.slot_lock:
+            self.running_sources.discard(source['id'])
+            self.host_counts[host] = max(self.host_counts.get(host, 1) - 1, 0)
+    
+    def get_executor(self) -> ThreadPoolExecutor:
+        """获取（必要时创建）爬取工作线程池"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawl-worker')
+        return self.executor
+    
+    def run_source_job(self, source: Dict, job_id: Optional[str] = None) -> Tuple[str, float]:
+        """工作线程入口：爬取数据源并记录耗时，结束后释放槽位，返回 (运行结果, 耗时)"""
+        start = time.perf_counter()
+        cancel_event = threading.Event()
+        with self.slot_lock:
+            self.cancel_events[source['id']] = cancel_event
+        try:
+            outcome = self.crawl_source(source, job_id, cancel_event)
+        finally:
+            with self.slot_lock:
+                self.cancel_events.pop(source['id'], None)
+            self.release_slot(source)
+        return outcome, time.perf_counter() - start
+    
+    def enqueue_source(self, source: Dict):
+        """分布式模式：为到期的数据源写入待认领任务（其他节点已写入时跳过）"""
+        db = DatabaseManager()
+        try:
+            job_id = CrawlJobQueue(db, self.worker_id).enqueue(source)
+            if job_id:
+                logger.info(f"数据源 {source['name']} 已加入任务队列: {job_id}")
+            else:
+                logger.info(f"数据源 {source['name']} 已有未完成的任务，跳过")
+        finally:
+            db.close()
+        
+        # 先按爬取间隔乐观地调度下一次；实际状态由执行节点写回 data_sources，重新加载时校正
+        self.schedule_source(source, datetime.now() + timedelta(hours=source['crawl_frequency']))
+    
+    def run_worker_loop(self):
+        """分布式工作线程：循环认领 crawl_jobs 中的任务并执行"""
+        db = DatabaseManager()
+        queue = CrawlJobQueue(db, self.worker_id)
+        try:
+            while self.running:
+                try:
+                    if not self.run_next_job(queue):
+                        self.stop_event.wait(JOB_POLL_SECONDS)
+                except Exception as e:
+                    # 单次认领或运行出错不结束工作线程，等待后继续认领
+                    logger.error(f"工作线程运行错误: {e}")
+                    self.stop_event.wait(JOB_POLL_SECONDS)
+        finally:
+            db.close()
+    
+    def run_next_job(self, queue: CrawlJobQueue) -> bool:
+        """认领并执行一个任务；没有可认领的任务或本节点槽位已满时返回 False"""
+        queue.reap_expired()
+        job = queue.claim()
+        if job is None:
+            return False
+        
+        source = self.get_source(job['data_source_id']) or {
+            'id': job['data_source_id'],
+            'name': job['data_source_name'],
+            'url': '',
+            'crawler_name': job['crawler_name'] or 'demo',
+            'crawl_frequency': 24,
+            'is_active': True,
+            'last_crawled': None,
+        }
+        if not self.try_acquire_slot(source):
+            # 本节点的并发上限已满，放回队列交给其他节点（退回本次认领计入的尝试次数）
+            queue.release(job['id'])
+            return False
+        
+        logger.info(f"认领任务 {job['id']}: {source['name']}（第 {job['attempts']} 次尝试）")
+        try:
+            queued_at = datetime.fromisoformat(job['created_at'])
+            metrics.SCHEDULER_LAG.observe(max((datetime.now() - queued_at).total_seconds(), 0))
+        except (TypeError, ValueError):
+            pass
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self.run_heartbeat, args=(job['id'], heartbeat_stop), daemon=True
+        )
+        heartbeat.start()
+        try:
+            outcome, elapsed = self.run_source_job(source, job['id'])
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+        self.finish_source(source, outcome, elapsed)
+        return True
+    
+    def run_heartbeat(self, job_id: str, stop: threading.Event):
+        """任务运行期间定时续约"""
+        db = DatabaseManager()
+        queue = CrawlJobQueue(db, self.worker_id)
+        try:
+            while not stop.wait(JOB_LEASE_SECONDS / 3):
+                if not queue.heartbeat(job_id):
+                    logger.warning(f"任务 {job_id} 的租约已丢失，可能已被其他节点重新认领")
+                    break
+        finally:
+            db.close()
+    
+    def get_source(self, source_id: str) -> Optional[Dict]:
+        """按ID查找数据源"""
+        for source in self.data_sources:
+            if source['id'] == source_id:
+                return source
+        return None
     
-    def update_source_last_crawled(self, source_id: str):
-        """更新数据源最后爬取时间"""
+    def get_next_due_time(self, source: Dict) -> Optional[datetime]:
+        """计算数据源的下次到期时间，未启用的数据源返回 None"""
+        if not source['is_active']:
+            return None
+        
+        # 持久化的下次到期时间（包含失败退避和启动错开）优先
+        if source.get('next_due_at'):
+            try:
+                return datetime.fromisoformat(source['next_due_at'])
+            except ValueError:
+                logger.error(f"解析下次到期时间失败: {source['next_due_at']}")
+        
+        if source['last_crawled'] is None:
+            return datetime.now()
+        
+        try:
+            last_crawled = datetime.fromisoformat(source['last_crawled'])
+            return last_crawled + timedelta(hours=source['crawl_frequency'])
+        except Exception as e:
+            logger.error(f"解析最后爬取时间失败: {e}")
+            return datetime.now()
+    
+    def push_entry(self, key: Tuple[str, str], due_at: datetime):
+        """加入（或替换）一个调度条目，并唤醒调度线程重新计算等待时间"""
+        with self.condition:
+            version = next(self.version_counter)
+            self.entry_versions[key] = version
+            heapq.heappush(self.heap, (due_at.timestamp(), version, key))
+            self.condition.notify()
+    
+    def remove_entry(self, key: Tuple[str, str]):
+        """取消调度条目（堆中的旧条目在弹出时丢弃）"""
+        with self.condition:
+            self.entry_versions.pop(key, None)
+            self.condition.notify()
+    
+    def schedule_source(self, source: Dict, due_at: Optional[datetime] = None):
+        """按下次到期时间调度数据源"""
+        due_at = due_at or self.get_next_due_time(source)
+        if due_at is None:
+            self.remove_entry(('source', source['id']))
+        else:
+            self.push_entry(('source', source['id']), due_at)
+    
+    def rebuild_schedule(self):
+        """根据当前数据源列表重建全部数据源的调度条目"""
+        with self.condition:
+            current_ids = {source['id'] for source in self.data_sources}
+            for key in list(self.entry_versions):
+                if key[0] == 'source' and key[1] not in current_ids:
+                    del self.entry_versions[key]
+            for source in self.data_sources:
+                if source['id'] not in self.running_sources:
+                    self.schedule_source(source)
+    
+    def trigger_source(self, source_id: str) -> bool:
+        """手动触发：立即调度指定数据源"""
+        source = self.get_source(source_id)
+        if source is None:
+            logger.warning(f"手动触发失败，数据源不存在: {source_id}")
+            return False
+        
+        logger.info(f"手动触发数据源: {source['name']}")
+        source['force'] = True
+        self.push_entry(('source', source_id), datetime.now())
+        return True
+    
+    def reload_sources(self):
+        """数据源配置变化：重新加载并立即重建调度"""
+        self.load_data_sources()
+        self.adapt_all_frequencies()
+        self.rebuild_schedule()
+    
+    def pop_due_entry(self) -> Optional[Tuple[float, Tuple[str, str]]]:
+        """等待直到最早的条目到期并返回 (到期时间戳, 键)；调度器停止时返回 None"""
+        with self.condition:
+            while self.running:
+                # 丢弃已被替换或取消的条目
+                while self.heap and self.entry_versions.get(self.heap[0][2]) != self.heap[0][1]:
+                    heapq.heappop(self.heap)
+                
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                
+                due_ts, version, key = self.heap[0]
+                delay = due_ts - time.time()
+                if delay > 0:
+                    self.condition.wait(timeout=delay)
+                    continue
+                
+                heapq.heappop(self.heap)
+                del self.entry_versions[key]
+                return due_ts, key
+        return None
+    
+    def dispatch_source(self, source: Dict, due_ts: float):
+        """将到期的数据源提交到工作线程池（分布式模式下写入任务队列）"""
+        forced = source.pop('force', False)
+        if not forced and not self.should_crawl_source(source):
+            # 已被其他途径（如手动全量检查）爬取过，按新的到期时间重新调度
+            self.schedule_source(source)
+            return
+        
+        if self.distributed:
+            # 只负责入队，并发控制在认领任务的工作线程中进行
+            self.enqueue_source(source)
+            return
+        
+        if not self.try_acquire_slot(source):
+            # 并发已满或同一数据源/主机正在运行，等槽位释放后再调度
+            with self.condition:
+                if forced:
+                    source['force'] = True
+                self.blocked_sources[source['id']] = source
+            return
+        
+        lag = max(time.time() - due_ts, 0)
+        metrics.SCHEDULER_LAG.observe(lag)
+        logger.info(f"调度数据源: {source['name']}（到期后 {lag * 1000:.0f} 毫秒启动）")
+        future = self.get_executor().submit(self.run_source_job, source)
+        future.add_done_callback(lambda f, s=source: self.on_source_finished(s, f))
+    
+    def on_source_finished(self, source: Dict, future):
+        """工作线程完成后的回调"""
+        try:
+            outcome, elapsed = future.result()
+        except Exception as e:
+            logger.error(f"数据源 {source['name']} 工作线程异常: {e}")
+            outcome, elapsed = 'failed', 0.0
+        self.finish_source(source, outcome, elapsed)
+    
+    def finish_source(self, source: Dict, outcome: str, elapsed: float):
+        """记录耗时，持久化调度状态，重新调度该数据源，并唤醒等待槽位的数据源"""
+        logger.info(f"数据源 {source['name']} {OUTCOME_LABELS[outcome]}，耗时 {elapsed:.2f} 秒")
+        metrics.SCHEDULER_RUNS.inc(result=OUTCOME_METRIC_RESULTS[outcome])
+        metrics.SCHEDULER_RUN_DURATION.observe(elapsed)
+        
+        # 计算下次到期时间：成功按爬取间隔，失败按连续失败次数指数退避；
+        # 提前结束（被取消或超出预算）不是失败，按爬取间隔调度，也不改变连续失败次数
+        now = datetime.now()
+        if outcome == 'completed':
+            source['failure_streak'] = 0
+            next_due = now + timedelta(hours=source['crawl_frequency'])
+        elif outcome == 'partial':
+            next_due = now + timedelta(hours=source['crawl_frequency'])
+        else:
+            source['failure_streak'] = source.get('failure_streak', 0) + 1
+            backoff = SCHEDULER_FAILURE_RETRY_SECONDS * 2 ** (source['failure_streak'] - 1)
+            next_due = now + timedelta(seconds=min(backoff, SCHEDULER_MAX_BACKOFF_SECONDS))
+        source['next_due_at'] = next_due.isoformat()
+        # data_sources.status 只允许 idle / running / completed / failed，提前结束与任务记录一样记为 completed
+        self.persist_source_state(source, 'failed' if outcome == 'failed' else 'completed')
+        
+        if not self.running:
+            return
+        
+        self.schedule_source(source, next_due)
+        
+        with self.condition:
+            blocked = list(self.blocked_sources.values())
+            self.blocked_sources.clear()
+        for waiting in blocked:
+            self.push_entry(('source', waiting['id']), datetime.now())
+    
+    def update_source_last_crawled(self, source_id: str, db: Optional[DatabaseManager] = None):
+        """更新数据源最后爬取时间（内存和 data_sources 表）"""
         try:
-            # 这里应该更新实际的数据库表
-            # 目前只更新内存中的数据
             for source in self.data_sources:
                 if source['id'] == source_id:
                     source['last_crawled'] = datetime.now().isoformat()
                     break
+            if db is not None:
+                db.update_data_source_last_crawled(source_id)
         except Exception as e:
             logger.error(f"更新数据源最后爬取时间失败: {e}")
     
     def check_and_crawl_sources(self):
-        """检查并爬取需要更新的数据源"""
+        """检查并爬取需要更新的数据源（分发到工作线程池并等待本轮完成）"""
         logger.info("检查需要爬取的数据源...")
         
-        crawled_count = 0
-        for source in self.data_sources:
-            if self.should_crawl_source(source):
-                self.crawl_source(source)
-                crawled_count += 1
-                
-                # 避免同时启动太多爬虫，添加延迟
-                time.sleep(2)
-        
-        if crawled_count > 0:
-            logger.info(f"本次检查爬取了 {crawled_count} 个数据源")
-        else:
+        pending = deque(source for source in self.data_sources if self.should_crawl_source(source))
+        if not pending:
             logger.info("本次检查无需爬取任何数据源")
+            return
+        
+        executor = self.get_executor()
+        futures = {}
+        wall_times = {}
+        cycle_start = time.perf_counter()
+        
+        while pending or futures:
+            # 在全局并发上限内提交可以运行的数据源，主机繁忙的数据源留待后续
+            deferred = deque()
+            while pending and len(futures) < self.max_workers:
+                source = pending.popleft()
+                if source['id'] in self.running_sources:
+                    logger.info(f"数据源 {source['name']} 正在运行，跳过")
+                elif self.try_acquire_slot(source):
+                    futures[executor.submit(self.run_source_job, source)] = source
+                else:
+                    deferred.append(source)
+            pending.extendleft(reversed(deferred))
+            
+            if not futures:
+                # 剩余数据源所在主机都被本轮之外的任务占用，留到下次检查
+                logger.info(f"{len(pending)} 个数据源的主机繁忙，推迟到下次检查")
+                break
+            
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = futures.pop(future)
+                try:
+                    outcome, elapsed = future.result()
+                except Exception as e:
+                    logger.error(f"数据源 {source['name']} 工作线程异常: {e}")
+                    outcome, elapsed = 'failed', 0.0
+                wall_times[source['name']] = elapsed
+                logger.info(f"数据源 {source['name']} {OUTCOME_LABELS[outcome]}，耗时 {elapsed:.2f} 秒")
+                metrics.SCHEDULER_RUNS.inc(result=OUTCOME_METRIC_RESULTS[outcome])
+                metrics.SCHEDULER_RUN_DURATION.observe(elapsed)
+        
+        cycle_time = time.perf_counter() - cycle_start
+        logger.info(f"本次检查爬取了 {len(wall_times)} 个数据源，总耗时 {cycle_time:.2f} 秒")
+        for name, elapsed in sorted(wall_times.items(), key=lambda entry: -entry[1]):
+            logger.info(f"  {name}: {elapsed:.2f} 秒")
     
     def setup_schedules(self):
         """设置定时任务"""
-        # 每10分钟检查一次是否有需要爬取的数据源
-        schedule.every(10).minutes.do(self.check_and_crawl_sources)
+        # 数据源按各自的到期时间调度，无需周期性全量检查
+        self.rebuild_schedule()
         
         # 每小时重新加载数据源配置
-        schedule.every().hour.do(self.load_data_sources)
+        self.push_entry(('task', 'reload_sources'), datetime.now() + timedelta(hours=1))
         
         # 每天凌晨2点清理旧的爬虫任务记录
-        schedule.every().day.at("02:00").do(self.cleanup_old_jobs)
+        self.push_entry(('task', 'cleanup_old_jobs'), self.get_next_daily_time(2))
         
         logger.info("定时任务设置完成")
     
+    def get_next_daily_time(self, hour: int) -> datetime:
+        """下一个每日固定时刻"""
+        now = datetime.now()
+        next_time = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_time <= now:
+            next_time += timedelta(days=1)
+        return next_time
+    
+    def run_task(self, name: str):
+        """执行周期任务并调度下一次"""
+        if name == 'reload_sources':
+            self.reload_sources()
+            self.push_entry(('task', name), datetime.now() + timedelta(hours=1))
+        elif name == 'cleanup_old_jobs':
+            self.cleanup_old_jobs()
+            self.push_entry(('task', name), self.get_next_daily_time(2))
+    
     def cleanup_old_jobs(self):
         """清理旧的爬虫任务记录"""
+        crawler_manager = CrawlerManager()
         try:
-            self.crawler_manager.cleanup_old_jobs(days=7)
+            crawler_manager.cleanup_old_jobs(days=7)
             logger.info("清理旧任务记录完成")
         except Exception as e:
             logger.error(f"清理旧任务记录失败: {e}")
+        finally:
+            crawler_manager.close()
     
     def run_scheduler(self):
-        """运行调度器主循环"""
+        """运行调度器主循环：休眠到最早的条目到期，配置变化或手动触发时立即唤醒"""
         logger.info("爬虫调度器启动")
         
         while self.running:
             try:
-                schedule.run_pending()
-                time.sleep(30)  # 每30秒检查一次待执行的任务
+                entry = self.pop_due_entry()
+                if entry is None:
+                    break
+                
+                due_ts, (kind, key) = entry
+                if kind == 'task':
+                    self.run_task(key)
+                    continue
+                
+                source = self.get_source(key)
+                if source is not None:
+                    self.dispatch_source(source, due_ts)
             except Exception as e:
                 logger.error(f"调度器运行错误: {e}")
-                time.sleep(60)  # 出错时等待1分钟再继续
+                time.sleep(1)
     
     def start(self):
         """启动调度器"""
@@ -191,9 +704,12 @@ class CrawlerScheduler:
             return
             
         self.running = True
+        self.start_time = datetime.now()
         
-        # 加载数据源
+        # 加载数据源和持久化的调度状态，已到期的数据源错开启动
         self.load_data_sources()
+        self.adapt_all_frequencies()
+        self.spread_overdue_sources()
         
         # 设置定时任务
         self.setup_schedules()
@@ -202,6 +718,17 @@ class CrawlerScheduler:
         self.scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
         self.scheduler_thread.start()
         
+        # 分布式模式下启动认领任务的工作线程
+        if self.distributed:
+            self.stop_event.clear()
+            for index in range(self.max_workers):
+                worker = threading.Thread(target=self.run_worker_loop, name=f"crawl-worker-{index}", daemon=True)
+                worker.start()
+                self.worker_threads.append(worker)
+            logger.info(f"分布式模式，节点 {self.worker_id}，工作线程 {self.max_workers} 个")
+        
+        self.start_metrics()
+        
         logger.info("爬虫调度器已启动")
     
     def stop(self):
@@ -210,32 +737,93 @@ class CrawlerScheduler:
             logger.warning("调度器未在运行")
             return
             
-        self.running = False
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.stop_event.set()
         
         if self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join(timeout=5)
         
+        # 通知正在运行的爬虫提前结束：保存已抓取的数据，任务标记为部分完成
+        self.cancel_running_sources()
+        grace_deadline = time.monotonic() + SCHEDULER_STOP_GRACE_SECONDS
+        while self.running_sources and time.monotonic() < grace_deadline:
+            time.sleep(0.1)
+        if self.running_sources:
+            logger.warning(f"以下数据源未在 {SCHEDULER_STOP_GRACE_SECONDS} 秒内结束: {sorted(self.running_sources)}")
+        
+        for worker in self.worker_threads:
+            worker.join(timeout=max(grace_deadline - time.monotonic(), 0.1))
+        self.worker_threads = []
+        
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+        
         logger.info("爬虫调度器已停止")
     
+    def start_metrics(self):
+        """注册调度器的仪表并在本地端口提供 /metrics（端口为 0 时不启动）"""
+        metrics.SCHEDULER_QUEUE_DEPTH.set_function(lambda: len(self.entry_versions))
+        metrics.SCHEDULER_BLOCKED.set_function(lambda: len(self.blocked_sources))
+        metrics.SCHEDULER_RUNNING.set_function(lambda: len(self.running_sources))
+        if self.distributed:
+            metrics.JOB_QUEUE_PENDING.set_function(self.count_pending_jobs)
+        
+        if SCHEDULER_METRICS_PORT and self.metrics_server is None:
+            try:
+                self.metrics_server = metrics.start_metrics_server(SCHEDULER_METRICS_PORT, METRICS_HOST)
+                logger.info(f"指标地址: http://{METRICS_HOST}:{SCHEDULER_METRICS_PORT}/metrics")
+            except OSError as e:
+                logger.warning(f"指标服务启动失败: {e}")
+    
+    def count_pending_jobs(self) -> int:
+        """crawl_jobs 中待认领的任务数（导出指标时查询）"""
+        db = DatabaseManager()
+        try:
+            db.ensure_job_queue_columns()
+            rows = db.execute_query(
+                "SELECT COUNT(*) AS count FROM crawl_jobs WHERE status = 'pending' AND data_source_id IS NOT NULL"
+            )
+            return rows[0]['count'] if rows else 0
+        finally:
+            db.close()
+    
+    def cancel_running_sources(self):
+        """请求所有正在运行的爬虫提前结束"""
+        with self.slot_lock:
+            events = list(self.cancel_events.items())
+        for source_id, event in events:
+            logger.info(f"请求取消数据源 {source_id} 的爬取")
+            event.set()
+    
     def get_status(self) -> Dict:
         """获取调度器状态"""
         return {
             'running': self.running,
             'data_sources_count': len(self.data_sources),
             'active_sources_count': len([s for s in self.data_sources if s['is_active']]),
+            'running_sources': sorted(self.running_sources),
+            'max_workers': self.max_workers,
+            'distributed': self.distributed,
+            'worker_id': self.worker_id if self.distributed else None,
             'next_check_time': self.get_next_check_time(),
+            'scheduled_entries': len(self.entry_versions),
             'uptime': self.get_uptime()
         }
     
     def get_next_check_time(self) -> Optional[str]:
-        """获取下次检查时间"""
-        try:
-            next_run = schedule.next_run()
-            if next_run:
-                return next_run.isoformat()
-        except:
-            pass
-        return None
+        """获取下次到期的调度时间"""
+        with self.condition:
+            valid = [entry for entry in self.heap if self.entry_versions.get(entry[2]) == entry[1]]
+        if not valid:
+            return None
+        return datetime.fromtimestamp(min(valid)[0]).isoformat()
     
     def get_uptime(self) -> str:
         """获取运行时间"""
@@ -246,10 +834,19 @@ class CrawlerScheduler:
 
 def main():
     """主函数 - 用于独立运行调度器"""
+    import argparse
     import signal
     import sys
     
-    scheduler = CrawlerScheduler()
+    parser = argparse.ArgumentParser(description='爬虫调度器')
+    parser.add_argument('--distributed', action='store_true',
+                        help='分布式模式：通过 crawl_jobs 租约在多个节点间分配任务（节点共享同一个 SQLite 数据库文件）')
+    parser.add_argument('--workers', type=int, default=SCHEDULER_MAX_WORKERS, help='工作线程数')
+    parser.add_argument('--worker-id', help='节点标识（默认 主机名:进程号:随机后缀）')
+    args = parser.parse_args()
+    
+    setup_logging('crawler_scheduler.log')
+    scheduler = CrawlerScheduler(max_workers=args.workers, distributed=args.distributed, worker_id=args.worker_id)
     
     def signal_handler(signum, frame):
         logger.info("收到停止信号，正在关闭调度器...")
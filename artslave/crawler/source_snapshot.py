@@ -0,0 +1,101 @@
+"""
+数据源快照
+记录每个数据源上次爬取看到的条目：item_key -> 内容指纹（8 字节整数）。
+本次运行中每条记录先与快照比较，新条目写入（insert）、指纹变化的写入（update），未变化的跳过，
+写入量因此只有真实的变化；完整运行结束后，快照中有而本次没有看到的条目即为已下架，标记为失效。
+
+只有完整的运行才判断下架：从检查点续爬、被取消或超出预算、抓取失败的页面或清洗失败的条目
+都会让本次看到的集合不完整，此时只更新看到的条目，不标记失效。
+写入失败的条目不影响其余条目：已有条目保留上次的指纹（下次仍会重试写入，也不会被判为下架），
+新条目不记入快照（下次仍按新增处理）
+"""
+
+import logging
+from datetime import datetime
+
+from config import SNAPSHOT_MAX_REMOVAL_RATIO, SNAPSHOT_MIN_ITEMS
+
+logger = logging.getLogger(__name__)
+
+
+class SourceSnapshot:
+    """一个数据源一次运行的快照比较（使用爬虫的数据库连接）"""
+
+    def __init__(self, db, source_name):
+        self.db = db
+        self.source_name = source_name
+        self.db.ensure_snapshot_table()
+        self.previous = self.db.get_source_snapshot(source_name)
+        self.seen = {}
+
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.failed = 0
+
+    def observe(self, record):
+        """记录看到的条目，返回需要写入的操作（insert / update），未变化时返回 None"""
+        key = record.item_key
+        fingerprint = record.fingerprint()
+        self.seen[key] = fingerprint
+        previous = self.previous.get(key)
+        if previous is None:
+            self.inserted += 1
+            return 'insert'
+        if previous != fingerprint:
+            self.updated += 1
+            return 'update'
+        self.unchanged += 1
+        return None
+
+    def keep(self, keys):
+        """页面未变化（页面缓存命中）时，页面中的条目视为看到且未变化"""
+        for key in keys:
+            if key in self.previous:
+                self.seen[key] = self.previous[key]
+                self.unchanged += 1
+
+    def discard(self, keys):
+        """写入失败的条目：已有条目恢复为上次的指纹，新条目从本次看到的集合中移除"""
+        for key in keys:
+            if key not in self.seen:
+                continue
+            previous = self.previous.get(key)
+            if previous is None:
+                del self.seen[key]
+                self.inserted -= 1
+            else:
+                self.seen[key] = previous
+                self.updated -= 1
+            self.failed += 1
+
+    def commit(self, complete):
+        """
+        保存本次的快照：更新新增和变化的条目；complete 为 True 时
+        把快照中本次没有看到的条目标记为失效并从快照中删除。返回失效的条数
+        """
+        changed = [(key, fingerprint) for key, fingerprint in self.seen.items()
+                   if self.previous.get(key) != fingerprint]
+        removed = []
+        if complete:
+            removed = [key for key in self.previous if key not in self.seen]
+            if (removed and len(self.previous) >= SNAPSHOT_MIN_ITEMS
+                    and len(removed) > len(self.previous) * SNAPSHOT_MAX_REMOVAL_RATIO):
+                # 大量条目同时消失通常是页面结构变化或数据源故障，不做下架处理
+                logger.warning(f"{self.source_name}: 本次有 {len(removed)}/{len(self.previous)} 条未出现，"
+                               f"超过 {SNAPSHOT_MAX_REMOVAL_RATIO:.0%}，跳过下架")
+                removed = []
+
+        if removed:
+            ids = self.db.get_submission_ids_by_item_keys(removed)
+            self.removed = self.db.deactivate_submissions(ids)
+        self.db.save_source_snapshot(self.source_name, changed, removed, datetime.now().isoformat())
+        return self.removed
+
+    def summary(self):
+        summary = (f"快照比较: 新增 {self.inserted} 条，变化 {self.updated} 条，未变化 {self.unchanged} 条，"
+                   f"下架 {self.removed} 条")
+        if self.failed:
+            summary += f"，写入失败 {self.failed} 条（下次重试）"
+        return summary
@@ -0,0 +1,256 @@
+"""
+结构化数据快速提取
+从页面中的 schema.org Event（JSON-LD / microdata）直接提取投稿信息，
+无需构建完整 DOM，提取失败时由爬虫回退到选择器提取
+"""
+
+import json
+import re
+from html import unescape
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+JSONLD_PATTERN = re.compile(
+    r'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+MICRODATA_EVENT_PATTERN = re.compile(r'itemtype\s*=\s*["\']?https?://schema\.org/\w*(Event|Festival)', re.IGNORECASE)
+
+# 包含下级节点的属性：@graph、列表页的 ItemList.itemListElement 以及其中 ListItem 的 item
+CHILD_NODE_KEYS = ('@graph', 'itemListElement', 'item')
+
+# schema.org 事件类型到投稿类型的映射，None 表示交给关键词分类
+EVENT_TYPES = {
+    'Event': None,
+    'ExhibitionEvent': 'EXHIBITION',
+    'VisualArtsEvent': 'EXHIBITION',
+    'Festival': 'EXHIBITION',
+    'ScreeningEvent': 'EXHIBITION',
+    'TheaterEvent': 'EXHIBITION',
+    'DanceEvent': 'EXHIBITION',
+    'MusicEvent': 'EXHIBITION',
+    'LiteraryEvent': 'EXHIBITION',
+    'EducationEvent': 'CONFERENCE',
+    'BusinessEvent': 'CONFERENCE',
+    'CourseInstance': 'CONFERENCE',
+    'SocialEvent': None,
+}
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+def _type_name(value):
+    """规范化 @type（可能是列表或完整 URL）"""
+    if isinstance(value, list):
+        for entry in value:
+            name = _type_name(entry)
+            if name in EVENT_TYPES:
+                return name
+        return _type_name(value[0]) if value else ''
+    if not isinstance(value, str):
+        return ''
+    return value.rstrip('/').rsplit('/', 1)[-1]
+
+
+def _first(value):
+    """取列表的第一个元素"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value):
+    """将 schema.org 属性值转为文本"""
+    value = _first(value)
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return _text(value.get('name') or value.get('@value') or '')
+    return unescape(str(value)).strip()
+
+
+def _date(value):
+    """ISO 8601 日期时间只保留日期部分，与 parse_date 的格式一致"""
+    text = _text(value)
+    match = re.match(r'\d{4}-\d{2}-\d{2}', text)
+    return match.group(0) if match else text or None
+
+
+def _address(value):
+    """将 PostalAddress 拼接为地址文本"""
+    value = _first(value)
+    if isinstance(value, dict):
+        parts = [value.get(key) for key in ('streetAddress', 'addressLocality', 'addressRegion', 'addressCountry')]
+        return ', '.join(_text(part) for part in parts if _text(part))
+    return _text(value)
+
+
+def _location(value):
+    """地点名称和地址"""
+    value = _first(value)
+    if not isinstance(value, dict):
+        return _text(value)
+    name = _text(value.get('name'))
+    address = _address(value.get('address'))
+    if name and address and address != name:
+        return f"{name}, {address}"
+    return name or address
+
+
+def _iter_nodes(data):
+    """遍历 JSON-LD 中的所有节点（含 @graph、ItemList 列表和嵌套列表）"""
+    if isinstance(data, list):
+        for entry in data:
+            yield from _iter_nodes(entry)
+    elif isinstance(data, dict):
+        yield data
+        for key in CHILD_NODE_KEYS:
+            if key in data:
+                yield from _iter_nodes(data[key])
+
+
+def event_to_item(event, page_url=''):
+    """将 schema.org Event 映射为 save_submission_info 的字段"""
+    title = _text(event.get('name'))
+    if not title:
+        return None
+
+    offers = _first(event.get('offers'))
+    offers = offers if isinstance(offers, dict) else {}
+    organizer = _first(event.get('organizer'))
+    organizer = organizer if isinstance(organizer, dict) else {'name': organizer}
+
+    # 报名截止优先取 offers.validThrough，其次是活动开始日期
+    deadline = _date(offers.get('validThrough')) or _date(event.get('startDate'))
+
+    fee = None
+    price = _text(offers.get('price'))
+    if price:
+        try:
+            fee = float(price)
+        except ValueError:
+            fee = None
+
+    contact = ' '.join(filter(None, [_text(organizer.get('email')), _text(organizer.get('telephone'))]))
+    website = _text(event.get('url')) or _text(offers.get('url'))
+    keywords = event.get('keywords') or []
+    if isinstance(keywords, str):
+        keywords = [word.strip() for word in keywords.split(',') if word.strip()]
+
+    return {
+        'title': title,
+        'description': _text(event.get('description')),
+        'type': EVENT_TYPES.get(_type_name(event.get('@type'))) or 'OTHER',
+        'organizer': _text(organizer.get('name')),
+        'deadline': deadline,
+        'location': _location(event.get('location')),
+        'website': urljoin(page_url, website) if website else page_url,
+        'contact': contact,
+        'fee': fee,
+        'prize': '',
+        'requirements': {},
+        'tags': [_text(word) for word in keywords if _text(word)],
+    }
+
+
+def extract_jsonld_events(html):
+    """扫描 JSON-LD 脚本块，返回其中的 Event 节点"""
+    events = []
+    for block in JSONLD_PATTERN.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for node in _iter_nodes(data):
+            if _type_name(node.get('@type')) in EVENT_TYPES:
+                events.append(node)
+    return events
+
+
+class MicrodataEventParser(HTMLParser):
+    """流式解析 microdata 中的 Event，不构建 DOM"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.scopes = []      # 当前打开的 itemscope
+        self.elements = []    # (标签, 是否打开了 scope, 文本属性名, 文本缓冲)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        prop = attrs.get('itemprop')
+        opens_scope = 'itemscope' in attrs
+        text_prop = None
+
+        if opens_scope:
+            scope = {'@type': _type_name(attrs.get('itemtype', '')), '_prop': prop}
+            self.scopes.append(scope)
+        elif prop and self.scopes:
+            value = attrs.get('content') or attrs.get('datetime')
+            if value is None and tag in ('a', 'link'):
+                value = attrs.get('href')
+            if value is None and tag in ('img', 'source'):
+                value = attrs.get('src')
+            if value is not None:
+                self.scopes[-1].setdefault(prop, value)
+            elif tag not in VOID_TAGS:
+                text_prop = prop
+
+        if tag not in VOID_TAGS:
+            self.elements.append((tag, opens_scope, text_prop, []))
+
+    def handle_data(self, data):
+        for _, _, text_prop, buffer in self.elements:
+            if text_prop:
+                buffer.append(data)
+
+    def handle_endtag(self, tag):
+        # 容忍不规范的嵌套：弹出直到匹配的标签
+        while self.elements:
+            open_tag, opens_scope, text_prop, buffer = self.elements.pop()
+            if text_prop and self.scopes:
+                self.scopes[-1].setdefault(text_prop, ' '.join(''.join(buffer).split()))
+            if opens_scope and self.scopes:
+                self._close_scope()
+            if open_tag == tag:
+                break
+
+    def _close_scope(self):
+        scope = self.scopes.pop()
+        prop = scope.pop('_prop', None)
+        if prop and self.scopes:
+            self.scopes[-1].setdefault(prop, scope)
+        if scope['@type'] in EVENT_TYPES:
+            self.events.append(scope)
+
+
+def extract_microdata_events(html):
+    """解析 microdata 中的 Event 节点"""
+    parser = MicrodataEventParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        return []
+    return parser.events
+
+
+def extract_structured_items(html, page_url=''):
+    """从页面结构化数据中提取投稿信息，没有可用数据时返回空列表"""
+    if not html:
+        return []
+
+    events = []
+    # 先做廉价的子串判断，没有结构化数据的页面几乎零开销（HTML 的属性名和属性值不区分大小写）
+    lowered = html.lower()
+    if 'application/ld+json' in lowered:
+        events = extract_jsonld_events(html)
+    if not events and 'itemscope' in lowered and MICRODATA_EVENT_PATTERN.search(html):
+        events = extract_microdata_events(html)
+
+    items = []
+    for event in events:
+        item = event_to_item(event, page_url)
+        if item:
+            items.append(item)
+    return items
@@ -0,0 +1,158 @@
+"""
+投稿信息记录类型
+爬虫入库路径上使用的紧凑记录（__slots__），类型和标签字符串驻留，
+序列化集中在 to_row 一处，直接生成批量写入所需的元组
+"""
+
+import hashlib
+import json
+import sys
+from collections import Counter
+from functools import lru_cache
+
+SUBMISSION_TYPE_VALUES = ('EXHIBITION', 'RESIDENCY', 'COMPETITION', 'GRANT', 'CONFERENCE', 'OTHER')
+
+# 类型取值固定且重复极多，统一使用驻留后的字符串对象
+_INTERNED_TYPES = {value: sys.intern(value) for value in SUBMISSION_TYPE_VALUES}
+
+EMPTY_REQUIREMENTS_JSON = '{}'
+EMPTY_TAGS_JSON = '[]'
+
+# 与 submissions 表的列顺序保持一致
+SUBMISSION_ROW_COLUMNS = (
+    'id', 'title', 'description', 'type', 'organizer', 'deadline',
+    'location', 'country', 'website', 'email', 'phone', 'fee', 'prize',
+    'requirements', 'tags', 'is_active', 'created_at', 'updated_at'
+)
+
+# 批量写入器使用的列：额外写入 item_key，按 item_key 更新已有记录
+SUBMISSION_ITEM_COLUMNS = SUBMISSION_ROW_COLUMNS + ('item_key',)
+
+
+def intern_type(value):
+    """规范化并驻留投稿类型"""
+    if not value:
+        return _INTERNED_TYPES['OTHER']
+    value = str(value).upper()
+    return _INTERNED_TYPES.get(value) or sys.intern(value)
+
+
+def intern_tags(tags):
+    """将标签转换为驻留字符串组成的元组"""
+    if not tags:
+        return ()
+    if isinstance(tags, str):
+        tags = [tags]
+    return tuple(sys.intern(str(tag)) for tag in tags if tag)
+
+
+def _identity_text(value):
+    """标识用的文本：清洗前的原始值，忽略空白和大小写"""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def make_item_keys(source, items):
+    """
+    条目的稳定标识：数据源 + 清洗前的标题和主办方（忽略空白和大小写），与条目所在的页面无关，
+    分页、排序变化或修改清洗规则后重新提取，标识都不变。
+    同一批中标题和主办方相同的条目再依次用条目自己的链接（url / link / website）和序号区分
+    """
+    names = [f"{_identity_text(item.get('title'))}\x1f{_identity_text(item.get('organizer'))}" for item in items]
+    counts = Counter(names)
+    seen = Counter()
+    keys = []
+    for item, name in zip(items, names):
+        if counts[name] > 1:
+            link = item.get('url') or item.get('link') or item.get('website')
+            if link:
+                name = f"{name}\x1f{_identity_text(link)}"
+            seen[name] += 1
+            if seen[name] > 1:
+                name = f"{name}#{seen[name]}"
+        keys.append(hashlib.sha1(f"{source}\x1f{name}".encode('utf-8')).hexdigest())
+    return keys
+
+
+@lru_cache(maxsize=4096)
+def _tags_json(tags):
+    """标签组合高度重复，序列化结果按元组缓存"""
+    return json.dumps(list(tags))
+
+
+class SubmissionRecord:
+    """投稿信息记录"""
+
+    __slots__ = (
+        'title', 'description', 'type', 'organizer', 'deadline', 'location', 'country',
+        'website', 'email', 'phone', 'fee', 'prize', 'requirements', 'tags', 'item_key'
+    )
+
+    def __init__(self, title='', description='', type='OTHER', organizer='', deadline=None,
+                 location='', country='', website='', email=None, phone=None, fee=None, prize='',
+                 requirements=None, tags=(), item_key=None):
+        self.title = title
+        self.description = description
+        self.type = intern_type(type)
+        self.organizer = organizer
+        self.deadline = deadline
+        self.location = location
+        # submissions.country 不允许为空，数据源没有提供国家时写入空字符串
+        self.country = country or ''
+        self.website = website
+        self.email = email
+        self.phone = phone
+        self.fee = fee
+        self.prize = prize
+        self.requirements = requirements or None
+        self.tags = intern_tags(tags)
+        self.item_key = item_key
+
+    @classmethod
+    def from_dict(cls, data):
+        """从已清洗的字典构建记录"""
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+    def to_dict(self):
+        """转换为字典（导出、调试用）"""
+        data = {field: getattr(self, field) for field in self.__slots__}
+        data['tags'] = list(self.tags)
+        data['requirements'] = self.requirements or {}
+        return data
+
+    def to_row(self, submission_id, now):
+        """序列化为 submissions 表的一行，顺序见 SUBMISSION_ROW_COLUMNS"""
+        deadline = self.deadline
+        if hasattr(deadline, 'isoformat'):
+            # 与 sqlite3 默认的 datetime 适配器输出一致
+            deadline = deadline.isoformat(' ')
+
+        requirements = EMPTY_REQUIREMENTS_JSON
+        if self.requirements:
+            requirements = json.dumps(self.requirements)
+
+        return (
+            submission_id,
+            self.title,
+            self.description,
+            self.type,
+            self.organizer,
+            deadline,
+            self.location,
+            self.country,
+            self.website,
+            self.email,
+            self.phone,
+            self.fee,
+            self.prize,
+            requirements,
+            _tags_json(self.tags) if self.tags else EMPTY_TAGS_JSON,
+            True,
+            now,
+            now
+        )
+
+    def fingerprint(self):
+        """内容指纹（有符号 64 位整数）：写入数据库的各字段不变时指纹不变，用于快照比较"""
+        content = self.to_row(None, None)[1:-3]
+        digest = hashlib.blake2b(repr(content).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
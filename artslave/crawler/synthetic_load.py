@@ -0,0 +1,374 @@
+"""
+合成数据源
+快速生成大量逼真的中英文投稿信息，用于压测数据库、去重和搜索：
+可配置完全重复与近似重复的比例、截止日期分布和标签基数，不做任何等待。
+数据可以经过正常的爬虫流程（清洗、分类、批量写入），也可以直接批量导入 submissions 表。
+两种方式写入的记录ID都以 SYNTHETIC_ID_PREFIX 开头，--purge 按前缀整体清除。
+
+模块名不以 _crawler 结尾，不会被爬虫注册表发现（不会出现在 list / run-all 中），只能通过本模块的命令行运行：
+
+    python synthetic_load.py --count 1000000 --bulk --seed 1
+    python synthetic_load.py --purge
+"""
+
+import argparse
+import itertools
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from base_crawler import BaseCrawler
+from config import (
+    SYNTHETIC_ITEM_COUNT, SYNTHETIC_DUPLICATE_RATE, SYNTHETIC_NEAR_DUPLICATE_RATE,
+    SYNTHETIC_TAG_CARDINALITY, SYNTHETIC_DEADLINE_DISTRIBUTION, SYNTHETIC_BULK_BATCH_SIZE,
+    SYNTHETIC_ID_PREFIX
+)
+from database import DatabaseManager
+from logging_setup import setup_logging
+from submission_record import SubmissionRecord
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_DISTRIBUTIONS = ('uniform', 'near', 'mixed')
+
+# (中文, 英文, 国家)
+CITIES = [
+    ('北京', 'Beijing', 'China'), ('上海', 'Shanghai', 'China'), ('广州', 'Guangzhou', 'China'),
+    ('深圳', 'Shenzhen', 'China'), ('杭州', 'Hangzhou', 'China'), ('成都', 'Chengdu', 'China'),
+    ('香港', 'Hong Kong', 'China'), ('台北', 'Taipei', 'China'), ('东京', 'Tokyo', 'Japan'),
+    ('首尔', 'Seoul', 'South Korea'), ('新加坡', 'Singapore', 'Singapore'), ('伦敦', 'London', 'United Kingdom'),
+    ('巴黎', 'Paris', 'France'), ('柏林', 'Berlin', 'Germany'), ('纽约', 'New York', 'United States'),
+    ('洛杉矶', 'Los Angeles', 'United States'), ('威尼斯', 'Venice', 'Italy'), ('阿姆斯特丹', 'Amsterdam', 'Netherlands'),
+]
+
+# 类型: (中文名称列表, 英文名称列表)，取值与 submissions.type 的约束一致
+TYPE_NAMES = {
+    'EXHIBITION': (['艺术展', '双年展', '群展', '影像展'], ['Exhibition', 'Biennale', 'Group Show', 'Photography Show']),
+    'RESIDENCY': (['驻地项目', '艺术家驻留计划'], ['Residency', 'Artist-in-Residence Program']),
+    'COMPETITION': (['大赛', '创作比赛', '设计竞赛'], ['Competition', 'Art Prize', 'Design Contest']),
+    'GRANT': (['创作资助', '青年艺术基金', '项目资助'], ['Grant', 'Young Artist Fund', 'Project Funding']),
+    'CONFERENCE': (['研讨会', '艺术论坛', '工作坊'], ['Symposium', 'Art Forum', 'Workshop']),
+}
+
+THEMES = [
+    ('当代', 'Contemporary'), ('青年', 'Emerging'), ('国际', 'International'), ('数字', 'Digital'),
+    ('水墨', 'Ink'), ('雕塑', 'Sculpture'), ('版画', 'Printmaking'), ('陶瓷', 'Ceramics'),
+    ('声音', 'Sound'), ('新媒体', 'New Media'), ('城市', 'Urban'), ('生态', 'Ecology'),
+    ('女性', "Women's"), ('摄影', 'Photography'), ('插画', 'Illustration'), ('公共艺术', 'Public Art'),
+]
+
+INSTITUTIONS = [
+    ('美术馆', 'Art Museum'), ('艺术中心', 'Art Center'), ('当代艺术基金会', 'Contemporary Art Foundation'),
+    ('画廊', 'Gallery'), ('艺术学院', 'Academy of Fine Arts'), ('文化中心', 'Cultural Center'),
+]
+
+DESCRIPTIONS_ZH = [
+    '面向全球艺术家公开征集作品，', '入选作品将在主展厅展出，', '项目提供工作室、材料费和生活补贴，',
+    '评审团由策展人和艺术家组成，', '欢迎跨学科和实验性的创作，', '优秀作品将获得奖金和出版机会，',
+    '申请者需提交作品集和创作陈述，', '本届主题关注技术与社会的关系，',
+]
+
+DESCRIPTIONS_EN = [
+    'Open call for artists worldwide. ', 'Selected works will be shown in the main hall. ',
+    'The program provides a studio, materials budget and a stipend. ',
+    'The jury consists of curators and practicing artists. ',
+    'Interdisciplinary and experimental practices are welcome. ',
+    'Outstanding works receive a cash prize and publication. ',
+    'Applicants submit a portfolio and an artist statement. ',
+    'This edition focuses on technology and society. ',
+]
+
+BASE_TAGS = [
+    '当代艺术', '绘画', '雕塑', '摄影', '装置', '影像', '新媒体', '版画', '陶瓷', '水墨',
+    'painting', 'sculpture', 'photography', 'installation', 'video', 'digital', 'performance',
+    'sound', 'illustration', 'design', '青年艺术家', '国际', 'open call', 'residency', 'grant',
+]
+
+NEAR_DUPLICATE_SUFFIXES = ['（第二轮）', '（延期）', ' (Extended)', ' - Second Call', '（更新）', ' 2nd Edition']
+
+
+def build_tag_pool(cardinality):
+    """生成指定大小的标签池：先用常见标签，不够时加编号"""
+    tags = BASE_TAGS[:cardinality]
+    for index in itertools.count(1):
+        if len(tags) >= cardinality:
+            break
+        tags.append(f"{BASE_TAGS[index % len(BASE_TAGS)]}-{index}")
+    return tags
+
+
+class SyntheticSubmissionGenerator:
+    """按种子可复现的投稿信息生成器，产出与爬虫提取结果相同结构的字典（另带 country）"""
+
+    # 近似重复时从最近生成的多少条中选取原件
+    RECENT_WINDOW = 10000
+
+    def __init__(self, seed=None, duplicate_rate=SYNTHETIC_DUPLICATE_RATE,
+                 near_duplicate_rate=SYNTHETIC_NEAR_DUPLICATE_RATE,
+                 tag_cardinality=SYNTHETIC_TAG_CARDINALITY,
+                 deadline_distribution=SYNTHETIC_DEADLINE_DISTRIBUTION, today=None):
+        if not 0 <= duplicate_rate <= 1 or not 0 <= near_duplicate_rate <= 1:
+            raise ValueError("重复比例必须在 0 到 1 之间")
+        if duplicate_rate + near_duplicate_rate > 1:
+            raise ValueError("完全重复与近似重复的比例之和不能超过 1")
+        if deadline_distribution not in DEADLINE_DISTRIBUTIONS:
+            raise ValueError(f"未知的截止日期分布: {deadline_distribution}（可选 {', '.join(DEADLINE_DISTRIBUTIONS)}）")
+        if tag_cardinality < 1:
+            raise ValueError("标签基数至少为 1")
+
+        self.random = random.Random(seed)
+        self.duplicate_rate = duplicate_rate
+        self.near_duplicate_rate = near_duplicate_rate
+        self.deadline_distribution = deadline_distribution
+        self.today = today or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        self.tags = build_tag_pool(tag_cardinality)
+        # Zipf 权重：少数标签很常见，大部分标签很少出现
+        self.tag_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.tags) + 1)))
+        self.types = list(TYPE_NAMES)
+        self.day_strings = {}
+        self.recent = []
+        self.generated = 0
+        self.duplicates = 0
+        self.near_duplicates = 0
+
+    def __iter__(self):
+        while True:
+            yield self.next_item()
+
+    def generate(self, count):
+        return itertools.islice(self, count)
+
+    def next_item(self):
+        roll = self.random.random()
+        if self.recent and roll < self.duplicate_rate:
+            item = dict(self.random.choice(self.recent))
+            self.duplicates += 1
+        elif self.recent and roll < self.duplicate_rate + self.near_duplicate_rate:
+            item = self.near_duplicate(self.random.choice(self.recent))
+            self.near_duplicates += 1
+        else:
+            item = self.new_item()
+            if len(self.recent) < self.RECENT_WINDOW:
+                self.recent.append(item)
+            else:
+                self.recent[self.generated % self.RECENT_WINDOW] = item
+        self.generated += 1
+        return item
+
+    def new_item(self):
+        rnd = self.random
+        submission_type = rnd.choice(self.types)
+        city_zh, city_en, country = rnd.choice(CITIES)
+        theme_zh, theme_en = rnd.choice(THEMES)
+        institution_zh, institution_en = rnd.choice(INSTITUTIONS)
+        names_zh, names_en = TYPE_NAMES[submission_type]
+        year = self.today.year + rnd.choice((0, 0, 0, 1))
+        serial = rnd.randrange(1, 100000)
+
+        # 约一半中文、一半英文，少数为双语标题
+        language = rnd.random()
+        if language < 0.45:
+            title = f"{year}{city_zh}{theme_zh}{rnd.choice(names_zh)}（第{serial % 30 + 1}届）"
+            organizer = f"{city_zh}{theme_zh}{institution_zh}"
+            description = ''.join(rnd.sample(DESCRIPTIONS_ZH, 3)).rstrip('，') + '。'
+            location = f"{city_zh}市"
+        elif language < 0.9:
+            title = f"{year} {city_en} {theme_en} {rnd.choice(names_en)} #{serial}"
+            organizer = f"{city_en} {theme_en} {institution_en}"
+            description = ''.join(rnd.sample(DESCRIPTIONS_EN, 3)).strip()
+            location = city_en
+        else:
+            title = f"{year}{city_zh}{theme_zh}{rnd.choice(names_zh)} / {city_en} {theme_en} {rnd.choice(names_en)}"
+            organizer = f"{city_zh}{institution_zh} / {city_en} {institution_en}"
+            description = rnd.choice(DESCRIPTIONS_ZH).rstrip('，') + '。' + rnd.choice(DESCRIPTIONS_EN).strip()
+            location = f"{city_zh} / {city_en}"
+
+        slug = f"{city_en.lower().replace(' ', '-')}-{serial}"
+        fee = rnd.choice((None, None, 0, 50, 100, 200, 350))
+        return {
+            'title': title,
+            'description': description,
+            'type': submission_type,
+            'organizer': organizer,
+            'location': location,
+            'country': country,
+            'website': f"https://synthetic.example.com/{submission_type.lower()}/{slug}",
+            'contact': f"info@{slug}.example.com, +86-10-{rnd.randrange(10000000, 99999999)}",
+            'fee': fee,
+            'prize': rnd.choice(('', '', '最佳作品奖5万元', 'Grand prize $10,000', '入选作品收藏')),
+            'deadline': self.random_deadline(),
+            'tags': self.random_tags(),
+        }
+
+    def near_duplicate(self, original):
+        """改写标题、偏移截止日期或替换一个标签，模拟同一条信息在不同来源或不同时间的版本"""
+        rnd = self.random
+        item = dict(original)
+        title = item['title']
+        variant = rnd.randrange(4)
+        if variant == 0:
+            title += rnd.choice(NEAR_DUPLICATE_SUFFIXES)
+        elif variant == 1:
+            title = title.upper() if title.isascii() else title.replace('（', '(').replace('）', ')')
+        elif variant == 2:
+            title = '  ' + title.replace(' ', '  ') + ' '
+        elif title[:4].isdigit():
+            title = title[4:].lstrip()
+        else:
+            title = title.replace('/', '|')
+        item['title'] = title
+
+        deadline = datetime.strptime(item['deadline'], '%Y-%m-%d') + timedelta(days=rnd.choice((-3, -1, 1, 2, 7)))
+        item['deadline'] = deadline.strftime('%Y-%m-%d')
+
+        tags = list(item['tags'])
+        if tags and rnd.random() < 0.5:
+            tags[rnd.randrange(len(tags))] = self.random_tags(1)[0]
+        item['tags'] = tags
+        return item
+
+    def random_deadline(self):
+        """按配置的分布生成截止日期（YYYY-MM-DD）"""
+        rnd = self.random
+        if self.deadline_distribution == 'near':
+            # 大部分集中在近期（平均 30 天）
+            days = min(int(rnd.expovariate(1 / 30)) + 1, 365)
+        elif self.deadline_distribution == 'mixed':
+            # 约 15% 已过期
+            days = rnd.randint(-60, -1) if rnd.random() < 0.15 else rnd.randint(1, 365)
+        else:
+            days = rnd.randint(1, 365)
+        return self.format_day(days)
+
+    def format_day(self, days):
+        # 日期取值有限，格式化结果按天数缓存
+        text = self.day_strings.get(days)
+        if text is None:
+            text = self.day_strings[days] = (self.today + timedelta(days=days)).strftime('%Y-%m-%d')
+        return text
+
+    def random_tags(self, count=None):
+        count = count or self.random.randint(1, 5)
+        return list(dict.fromkeys(self.random.choices(self.tags, cum_weights=self.tag_weights, k=count)))
+
+    def stats(self):
+        return {
+            'generated': self.generated,
+            'duplicates': self.duplicates,
+            'near_duplicates': self.near_duplicates,
+        }
+
+
+def bulk_load(db, generator, count, batch_size=SYNTHETIC_BULK_BATCH_SIZE, id_prefix=SYNTHETIC_ID_PREFIX,
+              seed=None):
+    """跳过清洗和分类，直接按批次写入 submissions（每批一个事务），返回写入条数"""
+    run_prefix = f"{id_prefix}{seed if seed is not None else int(time.time())}-"
+    now = datetime.now().isoformat()
+    written = 0
+    rows = []
+    start = time.perf_counter()
+
+    with db.bulk_load():
+        for index, item in enumerate(generator.generate(count)):
+            record = SubmissionRecord(
+                title=item['title'], description=item['description'], type=item['type'],
+                organizer=item['organizer'], deadline=f"{item['deadline']} 00:00:00", location=item['location'],
+                country=item['country'], website=item['website'], fee=item['fee'], prize=item['prize'], tags=item['tags'],
+            )
+            rows.append(record.to_row(f"{run_prefix}{index}", now))
+            if len(rows) >= batch_size:
+                written += db.insert_submission_rows(rows)
+                rows = []
+                elapsed = time.perf_counter() - start
+                logger.info(f"已导入 {written}/{count} 条（{written / elapsed:.0f} 条/秒）")
+        if rows:
+            written += db.insert_submission_rows(rows)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"导入完成: {written} 条，耗时 {elapsed:.2f} 秒（{written / max(elapsed, 1e-9):.0f} 条/秒）")
+    return written
+
+
+class SyntheticCrawler(BaseCrawler):
+    """合成数据源 - 生成大量模拟投稿信息（压测用）"""
+
+    # 每处理多少条上报一次进度
+    PROGRESS_EVERY = 1000
+
+    def __init__(self, count=None, seed=None, **generator_options):
+        super().__init__("合成数据源", "https://synthetic.example.com")
+        # 经过正常流程写入的记录同样带合成数据的ID前缀，--purge 可以一并清除
+        self.writer = self.db.create_batch_writer(id_prefix=SYNTHETIC_ID_PREFIX)
+        config = self.source_config
+        self.count = count or config.get('count', SYNTHETIC_ITEM_COUNT)
+        options = {
+            'duplicate_rate': config.get('duplicate_rate', SYNTHETIC_DUPLICATE_RATE),
+            'near_duplicate_rate': config.get('near_duplicate_rate', SYNTHETIC_NEAR_DUPLICATE_RATE),
+            'tag_cardinality': config.get('tag_cardinality', SYNTHETIC_TAG_CARDINALITY),
+            'deadline_distribution': config.get('deadline_distribution', SYNTHETIC_DEADLINE_DISTRIBUTION),
+        }
+        options.update(generator_options)
+        self.generator = SyntheticSubmissionGenerator(seed=seed if seed is not None else config.get('seed'), **options)
+
+    def crawl(self):
+        """经过正常流程：清洗、分类、批量写入，按条检查取消和预算"""
+        logger.info(f"开始生成合成数据: {self.count} 条")
+        for item in self.generator.generate(self.count):
+            self.items_found += 1
+            self.save_submission_info(item)
+            if self.items_found % self.PROGRESS_EVERY == 0:
+                self.report_progress('item', generated=self.items_found)
+
+        logger.info(f"合成数据生成完成: {self.generator.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成投稿信息生成器（压测用）')
+    parser.add_argument('--count', '-n', type=int, default=SYNTHETIC_ITEM_COUNT, help='生成条数')
+    parser.add_argument('--seed', type=int, help='随机种子（相同种子生成相同数据）')
+    parser.add_argument('--duplicate-rate', type=float, default=SYNTHETIC_DUPLICATE_RATE, help='完全重复比例')
+    parser.add_argument('--near-duplicate-rate', type=float, default=SYNTHETIC_NEAR_DUPLICATE_RATE,
+                        help='近似重复比例')
+    parser.add_argument('--tags', type=int, default=SYNTHETIC_TAG_CARDINALITY, help='标签基数')
+    parser.add_argument('--deadlines', choices=DEADLINE_DISTRIBUTIONS, default=SYNTHETIC_DEADLINE_DISTRIBUTION,
+                        help='截止日期分布')
+    parser.add_argument('--bulk', action='store_true', help='跳过清洗流程，直接批量导入 submissions')
+    parser.add_argument('--batch-size', type=int, default=SYNTHETIC_BULK_BATCH_SIZE, help='直接导入时每批条数')
+    parser.add_argument('--purge', action='store_true', help='删除此前生成的全部合成数据后退出')
+    args = parser.parse_args()
+
+    setup_logging()
+    options = {
+        'duplicate_rate': args.duplicate_rate,
+        'near_duplicate_rate': args.near_duplicate_rate,
+        'tag_cardinality': args.tags,
+        'deadline_distribution': args.deadlines,
+    }
+
+    if args.purge:
+        db = DatabaseManager()
+        try:
+            print(f"已删除 {db.delete_submissions_by_id_prefix(SYNTHETIC_ID_PREFIX) or 0} 条合成数据")
+        finally:
+            db.close()
+        return
+
+    if args.bulk:
+        db = DatabaseManager()
+        generator = SyntheticSubmissionGenerator(seed=args.seed, **options)
+        try:
+            written = bulk_load(db, generator, args.count, batch_size=args.batch_size, seed=args.seed)
+        finally:
+            db.close()
+        print(f"已导入 {written} 条合成数据: {generator.stats()}")
+        return
+
+    crawler = SyntheticCrawler(count=args.count, seed=args.seed, **options)
+    crawler.run()
+    print(f"处理 {crawler.items_found} 条，写入 {crawler.items_added} 条: {crawler.generator.stats()}")
+
+
+if __name__ == "__main__":
+    main()
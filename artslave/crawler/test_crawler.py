@@ -109,6 +109,39 @@ def test_crawl_jobs():
         print(f"✗ 任务记录检索错误: {e}")
         return False
 
+def test_snapshot_pagination_shift():
+    """测试数据源快照：列表顶部新增一条、其余条目整体后移一位时，只有 1 条新增、0 条下架"""
+    print("\n测试快照比较（分页位移）...")
+    import tempfile
+    from source_snapshot import SourceSnapshot
+    from submission_record import SubmissionRecord, make_item_keys
+
+    def crawl(db, titles, per_page=10):
+        snapshot = SourceSnapshot(db, '快照测试')
+        for start in range(0, len(titles), per_page):
+            items = [{'title': title, 'organizer': '测试主办方'} for title in titles[start:start + per_page]]
+            for item, item_key in zip(items, make_item_keys('快照测试', items)):
+                snapshot.observe(SubmissionRecord(title=item['title'], organizer=item['organizer'], item_key=item_key))
+        snapshot.commit(complete=True)
+        return snapshot
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, 'snapshot.db'))
+        try:
+            db.connection.execute("CREATE TABLE submissions (id TEXT PRIMARY KEY, is_active BOOLEAN DEFAULT TRUE, updated_at DATETIME)")
+            titles = [f"Open call {n}" for n in range(100)]
+            crawl(db, titles)
+            snapshot = crawl(db, ['Open call new'] + titles)
+        finally:
+            db.close()
+
+    result = (snapshot.inserted, snapshot.updated, snapshot.removed)
+    if result == (1, 0, 0):
+        print("✓ 新增 1 条，变化 0 条，下架 0 条")
+        return True
+    print(f"✗ 新增 {result[0]} 条，变化 {result[1]} 条，下架 {result[2]} 条（应为 1 / 0 / 0）")
+    return False
+
 def main():
     """主测试函数"""
     print("=" * 50)
@@ -120,6 +153,7 @@ def main():
         ("演示爬虫", test_demo_crawler),
         ("数据检索", test_data_retrieval),
         ("任务记录", test_crawl_jobs),
+        ("快照比较", test_snapshot_pagination_shift),
     ]
     
     passed = 0
@@ -0,0 +1,194 @@
+"""
+轻量追踪
+一次爬取（一个 crawl_jobs 任务）对应一条追踪，追踪ID由任务ID得出；爬取、页面、请求和各处理阶段
+记录为嵌套的片段（开始/结束时间、属性、状态）。按任务采样，同一任务在任何节点上的采样结果一致；
+任务结束时以 OpenTelemetry OTLP JSON 格式（ExportTraceServiceRequest）追加一行到 TRACE_FILE，
+可直接导入支持 OTLP 文件的工具，也可以用 jq 查找最慢的片段
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_MAX_SPANS
+
+SERVICE_NAME = 'artslave-crawler'
+SCOPE_NAME = 'artslave.crawler'
+
+# OTLP 中的 SpanKind 和 StatusCode
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_write_lock = threading.Lock()
+
+
+def trace_id_for_job(job_id):
+    """由任务ID得出 32 位十六进制的追踪ID（uuid 任务ID直接使用，旧的数字ID按十六进制编码，都可以反查任务）"""
+    if job_id is None:
+        return os.urandom(16).hex()
+    job_id = str(job_id)
+    if len(job_id) == 32 and all(char in '0123456789abcdef' for char in job_id):
+        return job_id
+    if job_id.isdigit() and int(job_id) < 2 ** 128:
+        return f"{int(job_id):032x}"
+    return hashlib.md5(job_id.encode('utf-8')).hexdigest()
+
+
+def is_sampled(trace_id, sample_rate):
+    """由追踪ID决定是否采样，结果与节点和进程无关"""
+    if sample_rate >= 1:
+        return True
+    if sample_rate <= 0:
+        return False
+    digest = hashlib.sha1(trace_id.encode('ascii')).digest()
+    return int.from_bytes(digest[:4], 'big') < sample_rate * 2 ** 32
+
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    """一个计时片段"""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'kind', 'start_ns', 'end_ns',
+                 '_start_perf', 'attributes', 'status', 'message')
+
+    def __init__(self, name, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = None
+        self.message = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = STATUS_ERROR
+        self.message = str(message)
+
+    def end(self):
+        # 结束时间按单调时钟计算，不受系统时间调整影响
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._start_perf
+
+    def to_otlp(self, trace_id):
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _attribute_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status is not None:
+            span['status'] = {'code': self.status}
+            if self.message:
+                span['status']['message'] = self.message
+        return span
+
+
+class _NoopSpan:
+    """未采样时使用，调用方无需判断"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """一条追踪的片段收集器（每个爬虫实例一个，只在爬虫所在线程中使用）"""
+
+    def __init__(self, trace_id, sampled=True, max_spans=TRACE_MAX_SPANS, resource=None):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.resource = {'service.name': SERVICE_NAME, **(resource or {})}
+        self.stack = []
+        self.finished = []
+        self.dropped = 0
+
+    @classmethod
+    def for_job(cls, job_id, sample_rate=TRACE_SAMPLE_RATE, **kwargs):
+        trace_id = trace_id_for_job(job_id)
+        return cls(trace_id, sampled=is_sampled(trace_id, sample_rate), **kwargs)
+
+    @contextmanager
+    def span(self, name, attributes=None, kind=SPAN_KIND_INTERNAL):
+        """记录一个嵌套在当前片段下的片段，异常时标记为错误后继续抛出"""
+        if not self.sampled:
+            yield NOOP_SPAN
+            return
+
+        parent_id = self.stack[-1].span_id if self.stack else None
+        span = Span(name, parent_id, kind, attributes)
+        self.stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            if span.status is None:
+                span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end()
+            self.stack.pop()
+            # 为尚未结束的上层片段（直到根片段 crawl）保留位置：超出上限时丢弃的是先结束的下层片段，
+            # 保留的片段的上层片段也一定保留
+            if len(self.finished) + len(self.stack) < self.max_spans:
+                self.finished.append(span)
+            else:
+                self.dropped += 1
+
+    def to_otlp(self):
+        resource_attributes = dict(self.resource)
+        if self.dropped:
+            resource_attributes['trace.dropped_spans'] = self.dropped
+        return {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': [{'key': key, 'value': _attribute_value(value)}
+                                   for key, value in resource_attributes.items()],
+                },
+                'scopeSpans': [{
+                    'scope': {'name': SCOPE_NAME},
+                    'spans': [span.to_otlp(self.trace_id) for span in self.finished],
+                }],
+            }],
+        }
+
+    def export(self, path=TRACE_FILE):
+        """把已结束的片段追加写入文件（一行），返回写入的片段数"""
+        if not self.sampled or not self.finished:
+            return 0
+        line = json.dumps(self.to_otlp(), ensure_ascii=False, separators=(',', ':'))
+        with _write_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        count = len(self.finished)
+        self.finished = []
+        return count
@@ -5,6 +5,27 @@ import path from 'path'
 // 爬虫状态管理
 const runningCrawlers = new Map<string, any>()
 
+// 常驻爬虫守护进程（python crawler_manager.py daemon），不可用时回退到按请求启动进程
+const CRAWLER_DAEMON_URL = process.env.CRAWLER_DAEMON_URL || 'http://127.0.0.1:8765'
+
+async function callDaemon(payload: Record<string, any>): Promise<{ status: number; body: any } | null> {
+  try {
+    const response = await fetch(CRAWLER_DAEMON_URL, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload),
+      signal: AbortSignal.timeout(5000),
+    })
+    return { status: response.status, body: await response.json() }
+  } catch {
+    return null
+  }
+}
+
+function daemonResponse(result: { status: number; body: any }): NextResponse {
+  return NextResponse.json(result.body, { status: result.status })
+}
+
 export async function GET(request: NextRequest) {
   const { searchParams } = new URL(request.url)
   const action = searchParams.get('action')
@@ -17,6 +38,10 @@ export async function GET(request: NextRequest) {
         return handleGetStats()
       case 'status':
         return handleGetStatus()
+      case 'events':
+        return handleGetEvents(searchParams.get('runId'))
+      case 'changes':
+        return handleGetChanges(searchParams.get('cursor'), searchParams.get('limit'))
       default:
         return NextResponse.json({ error: '无效的操作' }, { status: 400 })
     }
@@ -48,6 +73,11 @@ export async function POST(request: NextRequest) {
 }
 
 async function handleListCrawlers(): Promise<NextResponse> {
+  const result = await callDaemon({ action: 'list' })
+  if (result) {
+    return daemonResponse(result)
+  }
+  
   return new Promise((resolve) => {
     const crawlerPath = path.join(process.cwd(), 'crawler', 'crawler_manager.py')
     const pythonProcess = spawn('python', [crawlerPath, 'list'])
@@ -88,6 +118,11 @@ async function handleRunCrawler(crawlerName: string): Promise<NextResponse> {
     return NextResponse.json({ error: '爬虫已在运行中' }, { status: 409 })
   }
   
+  const result = await callDaemon({ action: 'run', crawler: crawlerName })
+  if (result) {
+    return daemonResponse(result)
+  }
+  
   return new Promise((resolve) => {
     const crawlerPath = path.join(process.cwd(), 'crawler', 'crawler_manager.py')
     const pythonProcess = spawn('python', [crawlerPath, 'run', '--crawler', crawlerName])
@@ -142,6 +177,18 @@ async function handleRunCrawler(crawlerName: string): Promise<NextResponse> {
 }
 
 async function handleRunAllCrawlers(): Promise<NextResponse> {
+  const list = await callDaemon({ action: 'list' })
+  if (list && list.status === 200) {
+    const runs = await Promise.all(
+      list.body.crawlers.map((crawler: { name: string }) => callDaemon({ action: 'run', crawler: crawler.name }))
+    )
+    return NextResponse.json({
+      success: true,
+      message: '所有爬虫已开始运行',
+      runs: runs.map((run) => run?.body)
+    })
+  }
+  
   return new Promise((resolve) => {
     const crawlerPath = path.join(process.cwd(), 'crawler', 'crawler_manager.py')
     const pythonProcess = spawn('python', [crawlerPath, 'run-all'])
@@ -180,6 +227,11 @@ async function handleStopCrawler(crawlerName: string): Promise<NextResponse> {
   const crawlerInfo = runningCrawlers.get(crawlerName)
   
   if (!crawlerInfo) {
+    const result = await callDaemon({ action: 'cancel', crawler: crawlerName })
+    if (result) {
+      return daemonResponse(result)
+    }
+
     return NextResponse.json({ error: '爬虫未在运行' }, { status: 404 })
   }
   
@@ -199,9 +251,15 @@ async function handleStopCrawler(crawlerName: string): Promise<NextResponse> {
 }
 
 async function handleGetStats(): Promise<NextResponse> {
+  const result = await callDaemon({ action: 'stats' })
+  if (result) {
+    return daemonResponse(result)
+  }
+  
   return new Promise((resolve) => {
     const crawlerPath = path.join(process.cwd(), 'crawler', 'crawler_manager.py')
-    const pythonProcess = spawn('python', [crawlerPath, 'stats'])
+    // --json 输出与守护进程相同的结构：{ stats: [{ status, count, total_found, total_added }] }
+    const pythonProcess = spawn('python', [crawlerPath, 'stats', '--json'])
     
     let output = ''
     let error = ''
@@ -216,7 +274,11 @@ async function handleGetStats(): Promise<NextResponse> {
     
     pythonProcess.on('close', (code) => {
       if (code === 0) {
-        resolve(NextResponse.json({ stats: output }))
+        try {
+          resolve(NextResponse.json(JSON.parse(output)))
+        } catch {
+          resolve(NextResponse.json({ error: '统计信息格式错误' }, { status: 500 }))
+        }
       } else {
         resolve(NextResponse.json({ error: error || '获取统计信息失败' }, { status: 500 }))
       }
@@ -232,5 +294,51 @@ async function handleGetStatus(): Promise<NextResponse> {
     duration: Date.now() - info.startTime.getTime()
   }))
   
+  const result = await callDaemon({ action: 'status' })
+  if (result && result.status === 200) {
+    const daemonRuns = result.body.runs
+      .filter((run: any) => run.status === 'queued' || run.status === 'running')
+      .map((run: any) => ({
+        name: run.crawler,
+        runId: run.run_id,
+        status: run.status,
+        startTime: run.created_at,
+        duration: Date.now() - new Date(run.created_at).getTime(),
+        progress: run.progress
+      }))
+    return NextResponse.json({ runningCrawlers: [...status, ...daemonRuns], runs: result.body.runs })
+  }
+  
   return NextResponse.json({ runningCrawlers: status })
 }
+
+// 转发守护进程的进度事件流（NDJSON，每行一个事件）
+async function handleGetEvents(runId: string | null): Promise<Response> {
+  if (!runId) {
+    return NextResponse.json({ error: '请指定运行ID' }, { status: 400 })
+  }
+  
+  try {
+    const response = await fetch(`${CRAWLER_DAEMON_URL}/events?run_id=${encodeURIComponent(runId)}`)
+    return new Response(response.body, {
+      status: response.status,
+      headers: { 'Content-Type': response.headers.get('Content-Type') || 'application/x-ndjson' }
+    })
+  } catch {
+    return NextResponse.json({ error: '爬虫守护进程未运行' }, { status: 503 })
+  }
+}
+
+// 轮询投稿信息变更事件：返回 cursor 之后的事件和下次轮询使用的 cursor
+async function handleGetChanges(cursor: string | null, limit: string | null): Promise<NextResponse> {
+  const payload: Record<string, any> = { action: 'changes', cursor: Number(cursor ?? 0) }
+  if (limit) {
+    payload.limit = Number(limit)
+  }
+  
+  const result = await callDaemon(payload)
+  if (result) {
+    return daemonResponse(result)
+  }
+  return NextResponse.json({ error: '爬虫守护进程未运行' }, { status: 503 })
+}